@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Contention benchmark for a thread safe :class:`OrderedHistory`.
+
+Mimics an IPython style kernel: one thread appends commands as they are
+entered, one thread keeps saving the history to disk, and a growing number
+of completion workers search it. For each reader count, the throughput of
+every role and the worst time a search waited to start are printed.
+
+With winreadline importable (see the README)::
+
+    python benchmarks/bench_contention.py --entries 100000 --seconds 2
+
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+from winreadline.history import OrderedHistory
+
+
+def _appender(history, stop, counts):
+    i = 0
+    while not stop.is_set():
+        history.add_history("appended command %d" % i)
+        i += 1
+    counts["appends"] = i
+
+
+def _saver(history, stop, counts, filename):
+    saves = 0
+    while not stop.is_set():
+        history.write_history_file(filename)
+        saves += 1
+    counts["saves"] = saves
+
+
+def _searcher(history, stop, counts, slot):
+    searches = 0
+    worst_wait = 0.0
+    while not stop.is_set():
+        started = time.perf_counter()
+        snapshot = history.snapshot()
+        worst_wait = max(worst_wait, time.perf_counter() - started)
+        # Search the newest part, like a reverse search usually does.
+        needle = "command %d" % searches
+        for index in range(len(snapshot) - 1, max(-1, len(snapshot) - 2000), -1):
+            if needle in snapshot[index]:
+                break
+        searches += 1
+    counts[slot] = (searches, worst_wait)
+
+
+def run(entries, readers, seconds):
+    history = OrderedHistory(
+        history=["seed command %d" % i for i in range(entries)],
+        history_length=entries,
+        threadsafe=True,
+    )
+    fd, filename = tempfile.mkstemp(prefix="bench_history")
+    os.close(fd)
+    stop = threading.Event()
+    counts = {}
+    threads = [
+        threading.Thread(target=_appender, args=(history, stop, counts)),
+        threading.Thread(target=_saver, args=(history, stop, counts, filename)),
+    ]
+    threads.extend(
+        threading.Thread(target=_searcher, args=(history, stop, counts, i))
+        for i in range(readers)
+    )
+    try:
+        for thread in threads:
+            thread.start()
+        time.sleep(seconds)
+        stop.set()
+        for thread in threads:
+            thread.join()
+    finally:
+        os.remove(filename)
+    searches = sum(counts[i][0] for i in range(readers))
+    worst_wait = max(counts[i][1] for i in range(readers))
+    return counts["appends"], counts["saves"], searches, worst_wait
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--entries", type=int, default=100000)
+    parser.add_argument("--seconds", type=float, default=2.0)
+    parser.add_argument("--readers", type=int, nargs="+", default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    print(
+        "%7s %12s %10s %12s %16s"
+        % ("readers", "appends/s", "saves/s", "searches/s", "worst wait (us)")
+    )
+    for readers in args.readers:
+        appends, saves, searches, worst_wait = run(
+            args.entries, readers, args.seconds
+        )
+        print(
+            "%7d %12.0f %10.1f %12.0f %16.1f"
+            % (
+                readers,
+                appends / args.seconds,
+                saves / args.seconds,
+                searches / args.seconds,
+                worst_wait * 1e6,
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
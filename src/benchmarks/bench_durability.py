@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Cost of each history durability policy.
+
+Saves a history the way ``OrderedHistory.write_history_file`` does,
+through :func:`winreadline.histfile.atomic_open`, once per policy and
+prints saves per second and the mean and worst save latency. Run it on
+the filesystem the history will live on, since fsync cost depends
+entirely on the device::
+
+    python benchmarks/bench_durability.py --entries 1000 --saves 200 --dir ~
+
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from winreadline.histfile import DurabilityPolicy, atomic_open, write_history_records
+
+POLICIES = ("never", "on-exit", "interval=0.05", "always")
+
+
+def run(policy, directory, entries, saves):
+    records = [(1589000000.0 + i, "print(%d)" % i) for i in range(entries)]
+    fd, filename = tempfile.mkstemp(prefix="bench_durability", dir=directory)
+    os.close(fd)
+    latencies = []
+    try:
+        for _ in range(saves):
+            started = time.perf_counter()
+            with atomic_open(filename, policy) as fp:
+                write_history_records(fp, records)
+            latencies.append(time.perf_counter() - started)
+        # Count the deferred syncs against the policy that deferred them.
+        started = time.perf_counter()
+        policy.sync_pending()
+        exit_cost = time.perf_counter() - started
+    finally:
+        os.remove(filename)
+    return latencies, exit_cost
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--entries", type=int, default=1000)
+    parser.add_argument("--saves", type=int, default=200)
+    parser.add_argument("--dir", default=None, help="Where to write. Defaults to the temp dir.")
+    parser.add_argument("--policies", nargs="+", default=list(POLICIES))
+    args = parser.parse_args()
+    directory = None if args.dir is None else os.path.expanduser(args.dir)
+
+    print(
+        "%-15s %10s %12s %12s %12s"
+        % ("policy", "saves/s", "mean (ms)", "worst (ms)", "exit (ms)")
+    )
+    for spec in args.policies:
+        # A fresh policy so state from a previous run doesn't leak in.
+        policy = DurabilityPolicy.parse(spec)
+        policy = DurabilityPolicy(policy.mode, policy.interval)
+        latencies, exit_cost = run(policy, directory, args.entries, args.saves)
+        total = sum(latencies)
+        print(
+            "%-15s %10.0f %12.3f %12.3f %12.3f"
+            % (
+                spec,
+                len(latencies) / total,
+                total / len(latencies) * 1e3,
+                max(latencies) * 1e3,
+                exit_cost * 1e3,
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
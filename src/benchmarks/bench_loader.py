@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Time loading a large history file.
+
+Compares :meth:`OrderedHistory.read_history_file`, which parses the whole
+buffer at once and appends through ``add_history_many``, with the line at
+a time loop it replaced: ``add_history(dedent(line))`` for every line.
+
+With winreadline importable (see the README)::
+
+    python benchmarks/bench_loader.py --lines 1000000
+
+"""
+import argparse
+import io
+import os
+import random
+import tempfile
+import time
+from textwrap import dedent
+
+from winreadline.history import OrderedHistory
+
+WORDS = ["import", "print", "len", "os.path", "sorted", "x", "df", "np", "for", "if"]
+
+
+def make_history(filename, lines):
+    rng = random.Random(0)
+    with io.open(filename, "w", encoding="utf-8") as fp:
+        for i in range(lines):
+            indent = "    " if i % 7 == 0 else ""
+            fp.write("%s%s(%d)\n" % (indent, rng.choice(WORDS), rng.randrange(lines)))
+            if i % 50 == 0:
+                fp.write("\n")
+
+
+def load_per_line(filename):
+    history = OrderedHistory(history=["seed"])
+    with io.open(filename, "rt", encoding="utf-8") as fd:
+        for line in fd:
+            history.add_history(dedent(line).rstrip("\n"))
+    return history
+
+
+def load_bulk(filename):
+    history = OrderedHistory(history=["seed"])
+    history.read_history_file(filename, encoding="utf-8")
+    return history
+
+
+def best_of(repeat, func, *args):
+    timings = []
+    result = None
+    for _ in range(repeat):
+        # Free the previous run's history first, outside the timing.
+        del result
+        started = time.perf_counter()
+        result = func(*args)
+        timings.append(time.perf_counter() - started)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lines", type=int, default=1000000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    fd, filename = tempfile.mkstemp(prefix="bench_loader")
+    os.close(fd)
+    try:
+        make_history(filename, args.lines)
+        per_line, expected = best_of(args.repeat, load_per_line, filename)
+        bulk, got = best_of(args.repeat, load_bulk, filename)
+    finally:
+        os.remove(filename)
+    if list(got.history) != list(expected.history):
+        raise SystemExit("Bulk loader disagrees with the per line loader")
+    print("entries loaded: %d" % len(got.history))
+    print("per line:  %8.3f s" % per_line)
+    print("bulk:      %8.3f s" % bulk)
+    print("speedup:   %8.1fx" % (per_line / bulk))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Memory used by large histories, checked against recorded budgets.
+
+Every scenario runs under :mod:`tracemalloc` on histories of 10k, 100k
+and 1M entries:
+
+load
+    :meth:`OrderedHistory.read_history_file` of a file with that many
+    entries.
+append
+    ``add_history`` of that many entries, one at a time.
+search
+    Incremental searches of a loaded history, including ones that match
+    nothing and so look at every entry.
+save
+    :meth:`OrderedHistory.write_history_file` of a loaded history.
+
+Two numbers are taken per scenario: the bytes still allocated once it
+finished (steady state) and the most allocated at any point during it
+(peak), both relative to what was allocated before it started. Either
+going over its budget in ``memory_budgets.json`` fails the run with exit
+status 1. The allocation sites holding the most steady state memory are
+printed for each scenario, so a regression points at the line that
+caused it.
+
+With winreadline importable (see the README)::
+
+    python benchmarks/bench_memory.py
+    python benchmarks/bench_memory.py --sizes 10000 --compact
+    # After an intended change, write the new budgets with some headroom:
+    python benchmarks/bench_memory.py --record
+
+"""
+import argparse
+import gc
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import tracemalloc
+
+from winreadline.compact import CompactHistory
+from winreadline.history import OrderedHistory
+from winreadline.isearch import BACKWARD, SearchSession
+
+SIZES = (10000, 100000, 1000000)
+BUDGETS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "memory_budgets.json")
+# Recorded budgets leave this much room over what was measured.
+HEADROOM = 1.25
+# Frames kept per allocation, enough to get from the builtins to our code.
+FRAMES = 8
+
+WORDS = ["import", "print", "len", "os.path", "sorted", "x", "df", "np", "for", "if"]
+
+
+def make_history_file(filename, entries):
+    rng = random.Random(0)
+    with io.open(filename, "w", encoding="utf-8") as fp:
+        for i in range(entries):
+            fp.write("%s(%d)\n" % (rng.choice(WORDS), i))
+
+
+def new_history(compact):
+    # A non empty history, or the constructor loads ~/.python_history.
+    seed = ["seed"]
+    return OrderedHistory(
+        history=CompactHistory(seed) if compact else seed, history_length=-1)
+
+
+def load(filename, entries, compact):
+    history = new_history(compact)
+    history.read_history_file(filename, encoding="utf-8")
+    return history
+
+
+def append(filename, entries, compact):
+    history = new_history(compact)
+    for i in range(entries):
+        history.add_history("appended(%d)" % i)
+    return history
+
+
+def search(filename, entries, compact, history=None):
+    session = SearchSession(history.history)
+    for query in ("print(1", "sorted", "no such entry"):
+        session.set_query(query, BACKWARD)
+        for _ in range(10):
+            session.next(BACKWARD)
+
+
+def save(filename, entries, compact, history=None):
+    history.write_history_file(filename + ".saved")
+
+
+SCENARIOS = {
+    "load": (load, False),
+    "append": (append, False),
+    "search": (search, True),
+    "save": (save, True),
+}
+
+
+def measure(name, filename, entries, compact, top):
+    """Steady state and peak bytes of one scenario, and its top sites."""
+    func, needs_history = SCENARIOS[name]
+    kwargs = {}
+    if needs_history:
+        kwargs["history"] = load(filename, entries, compact)
+    gc.collect()
+    tracemalloc.start(FRAMES)
+    try:
+        before = tracemalloc.take_snapshot()
+        baseline = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        result = func(filename, entries, compact, **kwargs)
+        gc.collect()
+        current, peak = tracemalloc.get_traced_memory()
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    del result, kwargs
+    # Leave out the snapshots' own bookkeeping.
+    filters = [tracemalloc.Filter(False, tracemalloc.__file__)]
+    sites = after.filter_traces(filters).compare_to(
+        before.filter_traces(filters), "traceback")
+    return current - baseline, peak - baseline, sites[:top]
+
+
+def format_site(stat):
+    # The innermost frame in this repository says most about the cause.
+    frames = [f for f in stat.traceback if "winreadline" in f.filename] or list(stat.traceback)
+    frame = frames[-1]
+    return "%10s  %8d blocks  %s:%d" % (
+        _bytes(stat.size_diff), stat.count_diff,
+        os.path.relpath(frame.filename), frame.lineno)
+
+
+def _bytes(size):
+    for unit in ("B", "KiB", "MiB"):
+        if abs(size) < 1024:
+            return "%.0f %s" % (size, unit)
+        size /= 1024.0
+    return "%.1f GiB" % size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(SIZES))
+    parser.add_argument("--scenarios", nargs="+", default=list(SCENARIOS), choices=list(SCENARIOS))
+    parser.add_argument("--compact", action="store_true",
+                        help="Keep the entries in a CompactHistory.")
+    parser.add_argument("--top", type=int, default=5, help="Allocation sites shown per scenario.")
+    parser.add_argument("--budgets", default=BUDGETS)
+    parser.add_argument("--record", action="store_true",
+                        help="Write what was measured, plus headroom, as the new budgets.")
+    args = parser.parse_args()
+
+    try:
+        with io.open(args.budgets, encoding="utf-8") as fp:
+            budgets = json.load(fp)
+    except FileNotFoundError:
+        budgets = {}
+    backend = "compact" if args.compact else "list"
+    failures = []
+    directory = tempfile.mkdtemp(prefix="bench_memory")
+    try:
+        for entries in args.sizes:
+            filename = os.path.join(directory, "history_%d" % entries)
+            make_history_file(filename, entries)
+            for name in args.scenarios:
+                steady, peak, sites = measure(name, filename, entries, args.compact, args.top)
+                key = "%s/%s/%d" % (backend, name, entries)
+                budget = budgets.get(key)
+                if args.record:
+                    budgets[key] = {
+                        "steady": int(max(steady, 0) * HEADROOM) + 4096,
+                        "peak": int(peak * HEADROOM) + 4096,
+                    }
+                    verdict = "recorded"
+                elif budget is None:
+                    verdict = "no budget"
+                elif steady > budget["steady"] or peak > budget["peak"]:
+                    verdict = "OVER BUDGET (steady %s, peak %s)" % (
+                        _bytes(budget["steady"]), _bytes(budget["peak"]))
+                    failures.append(key)
+                else:
+                    verdict = "ok"
+                print("%-28s steady %10s  peak %10s  %s" % (
+                    key, _bytes(steady), _bytes(peak), verdict))
+                for stat in sites:
+                    print("    " + format_site(stat))
+    finally:
+        for name in os.listdir(directory):
+            os.remove(os.path.join(directory, name))
+        os.rmdir(directory)
+
+    if args.record:
+        with io.open(args.budgets, "w", encoding="utf-8") as fp:
+            json.dump(budgets, fp, indent=2, sort_keys=True)
+            fp.write("\n")
+    if failures:
+        print("\n%d scenario(s) over budget: %s" % (len(failures), ", ".join(failures)))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,433 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""End to end latency and throughput of a session under a pseudo terminal.
+
+Starts an interactive session built on :mod:`winreadline.readline` in a
+Linux pty, replays scripted key streams and reports, as JSON:
+
+* latency: one key at a time, the time from writing the key to the first
+  screen update that follows it;
+* throughput: the whole stream written as fast as the session takes it,
+  until the session acknowledges the last line.
+
+The streams are :class:`~winreadline.keyboard_enum.Keys` sequences encoded
+with :func:`winreadline.vt100.encode_keys`:
+
+``typing``
+    Short assignments typed character by character.
+``search``
+    Ctrl-R searches of the seeded history, with a repeated Ctrl-R.
+``completion``
+    Tab completions of attribute names.
+``paste``
+    One long line pasted in a single write.
+
+With winreadline importable (see the README)::
+
+    python benchmarks/bench_pty.py --history-entries 100000 --output pty.json
+
+The session started by default is this script's ``--session`` mode, a small
+line editor wired to :mod:`winreadline.readline`. Another program can be
+driven with ``--command``, as long as it redraws after each key and writes
+``ESC ] mark ; <text> BEL`` when it accepts a line starting with ``#mark``.
+
+"""
+import argparse
+import fcntl
+import json
+import os
+import platform
+import pty
+import select
+import signal
+import statistics
+import struct
+import sys
+import tempfile
+import termios
+import time
+import tty
+
+from winreadline.isearch import BACKWARD, SearchSession
+from winreadline.keyboard_enum import Keys
+from winreadline.vt100 import KeyDecoder, encode_keys
+
+PROMPT = ">>> "
+
+#: Written by the session when it is ready, and when it accepts a line
+#: starting with ``#mark``.
+MARK = b"\x1b]mark;%s\x07"
+
+
+def typed(text):
+    """Keys for typing `text` one character at a time."""
+    return list(text)
+
+
+def _mark(name):
+    return typed("#mark %s" % name) + [Keys.Enter]
+
+
+def typing_stream(lines):
+    keys = []
+    for i in range(lines):
+        keys += typed("value_%d = %d * 2" % (i, i)) + [Keys.Enter]
+    return keys
+
+
+def search_stream(searches, entries):
+    keys = []
+    for i in range(searches):
+        query = "command %d" % ((i * 7919) % max(entries, 1))
+        keys += [Keys.ControlR] + typed(query) + [Keys.ControlR, Keys.Enter]
+    return keys
+
+
+def completion_stream(completions):
+    words = ["os.pa", "os.path.is", "sys.std", "str.is", "collections.O"]
+    keys = []
+    for i in range(completions):
+        keys += typed(words[i % len(words)]) + [Keys.Tab, Keys.ControlU]
+    return keys
+
+
+def paste_stream(size):
+    body = "x = [%s]" % ", ".join(str(i) for i in range(size // 8))
+    return [body[:size], Keys.Enter]
+
+
+# Session side ---------------------------------------------------------------
+
+
+class _Editor(object):
+    """Just enough of a line editor to exercise winreadline end to end."""
+
+    def __init__(self, readline, out_fd):
+        import collections
+        import rlcompleter
+
+        self.readline = readline
+        self.out_fd = out_fd
+        self.line = ""
+        # The Ctrl-R search in progress, on a snapshot of the history.
+        self.search = None
+        self.completer = rlcompleter.Completer(
+            {"os": os, "sys": sys, "collections": collections, "str": str}
+        )
+
+    def write(self, text):
+        os.write(self.out_fd, text.encode("utf-8"))
+
+    def redisplay(self):
+        if self.search is None:
+            self.write("\r%s%s\x1b[K" % (PROMPT, self.line))
+        else:
+            self.write(
+                "\r(reverse-i-search)`%s': %s\x1b[K"
+                % (self.search.query, self.search.match or "")
+            )
+
+    def complete(self):
+        start = max(self.line.rfind(" "), self.line.rfind("("), -1) + 1
+        text = self.line[start:]
+        matches = []
+        while True:
+            match = self.completer.complete(text, len(matches))
+            if match is None:
+                break
+            matches.append(match)
+        if not matches:
+            return
+        prefix = os.path.commonprefix(matches)
+        if len(matches) > 1 and prefix == text:
+            self.readline.completion_display(text, matches, max(map(len, matches)))
+        self.line = self.line[:start] + prefix
+
+    def accept(self, line):
+        self.write("\r\n")
+        if line.startswith("#mark "):
+            self.write((MARK % line[6:].encode("utf-8")).decode("utf-8"))
+        elif line:
+            self.readline.add_history(line)
+
+    def key(self, key):
+        if self.search is not None:
+            if key is Keys.ControlR:
+                self.search.next(BACKWARD)
+            elif key is Keys.Backspace:
+                self.search.backspace()
+            elif key is Keys.ControlG:
+                self.search = None
+            elif isinstance(key, Keys):
+                match = self.search.match or ""
+                self.search = None
+                if key is Keys.Enter:
+                    self.line = ""
+                    self.accept(match)
+                else:
+                    self.line = match
+            else:
+                self.search.extend(key, BACKWARD)
+        elif not isinstance(key, Keys):
+            self.line += key
+        elif key is Keys.Enter:
+            line, self.line = self.line, ""
+            self.accept(line)
+        elif key is Keys.Backspace:
+            self.line = self.line[:-1]
+        elif key is Keys.ControlU:
+            self.line = ""
+        elif key is Keys.ControlR:
+            # The search the history's reverse_search_history runs.
+            self.search = SearchSession(self.readline.rl.snapshot())
+        elif key is Keys.Tab:
+            self.complete()
+        elif key is Keys.ControlD and not self.line:
+            raise EOFError
+
+
+def run_session():
+    """The default session: a line editor on this process' terminal.
+
+    The history is whatever :mod:`winreadline.readline` loads at import.
+    """
+    import functools
+
+    from winreadline import readline
+    from winreadline.completion import display_matches
+
+    fd = sys.stdin.fileno()
+    out_fd = sys.stdout.fileno()
+    columns = os.get_terminal_size(out_fd).columns
+    saved = termios.tcgetattr(fd)
+    tty.setraw(fd)
+    # Keep "\n" -> "\r\n" for the completion listing.
+    attributes = termios.tcgetattr(fd)
+    attributes[1] |= termios.OPOST | termios.ONLCR
+    termios.tcsetattr(fd, termios.TCSANOW, attributes)
+    out = os.fdopen(os.dup(out_fd), "w")
+    readline.set_completion_display_matches_hook(
+        functools.partial(
+            display_matches, out=out, size=(columns, 1 << 20), query_items=-1
+        )
+    )
+    editor = _Editor(readline, out_fd)
+    decoder = KeyDecoder()
+    try:
+        editor.write(PROMPT + (MARK % b"ready").decode("ascii"))
+        while True:
+            data = os.read(fd, 1 << 16)
+            if not data:
+                break
+            keys = decoder.feed(data)
+            if decoder.pending and not select.select([fd], [], [], 0.05)[0]:
+                keys += decoder.flush()
+            for key in keys:
+                editor.key(key)
+            # One redraw per read, however many keys it held.
+            editor.redisplay()
+    except EOFError:
+        pass
+    finally:
+        termios.tcsetattr(fd, termios.TCSADRAIN, saved)
+
+
+# Harness side ---------------------------------------------------------------
+
+
+class PtySession(object):
+    """A child process on the slave side of a new pty."""
+
+    def __init__(self, argv, size=(80, 24), env=None):
+        self.pid, self.fd = pty.fork()
+        if self.pid == 0:
+            try:
+                os.execvpe(argv[0], argv, os.environ if env is None else env)
+            finally:
+                os._exit(127)
+        columns, lines = size
+        fcntl.ioctl(self.fd, termios.TIOCSWINSZ, struct.pack("HHHH", lines, columns, 0, 0))
+        os.set_blocking(self.fd, False)
+        self.output = bytearray()
+
+    def close(self):
+        try:
+            os.kill(self.pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+        os.waitpid(self.pid, 0)
+        os.close(self.fd)
+
+    def _read(self):
+        try:
+            data = os.read(self.fd, 1 << 16)
+        except BlockingIOError:
+            return 0
+        except OSError:  # EIO: the child is gone
+            raise EOFError(self.output[-2000:].decode("utf-8", "replace"))
+        if not data:
+            raise EOFError(self.output[-2000:].decode("utf-8", "replace"))
+        self.output += data
+        return len(data)
+
+    def wait_for(self, marker, timeout):
+        """Read until `marker` shows up in the output."""
+        deadline = time.perf_counter() + timeout
+        searched = 0
+        while True:
+            found = self.output.find(marker, searched)
+            if found != -1:
+                del self.output[: found + len(marker)]
+                return
+            searched = max(0, len(self.output) - len(marker))
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                raise TimeoutError("no %r from the session" % marker)
+            if select.select([self.fd], [], [], remaining)[0]:
+                self._read()
+
+    def write_all(self, data):
+        """Write `data` as fast as the session takes it, reading meanwhile."""
+        view = memoryview(data)
+        while view:
+            readable, writable, _ = select.select([self.fd], [self.fd], [])
+            if readable:
+                self._read()
+                # Only the marker matters while streaming.
+                del self.output[:-256]
+            if writable:
+                try:
+                    view = view[os.write(self.fd, view[:4096]):]
+                except BlockingIOError:
+                    pass
+
+    def write_and_time(self, data, timeout):
+        """Seconds from writing `data` to the first output after it."""
+        self.output.clear()
+        started = time.perf_counter()
+        os.write(self.fd, data)
+        if not select.select([self.fd], [], [], timeout)[0]:
+            return None
+        elapsed = time.perf_counter() - started
+        while select.select([self.fd], [], [], 0)[0] and self._read():
+            pass
+        return elapsed
+
+
+def _summary(latencies):
+    done = sorted(latency * 1e3 for latency in latencies if latency is not None)
+    if not done:
+        return {"keys": len(latencies), "timeouts": len(latencies)}
+
+    def percentile(p):
+        return done[min(len(done) - 1, int(p / 100.0 * len(done)))]
+
+    return {
+        "keys": len(latencies),
+        "timeouts": len(latencies) - len(done),
+        "mean_ms": statistics.mean(done),
+        "p50_ms": percentile(50),
+        "p90_ms": percentile(90),
+        "p99_ms": percentile(99),
+        "max_ms": done[-1],
+    }
+
+
+def measure_latency(session, keys, timeout):
+    latencies = []
+    for key in keys:
+        latencies.append(session.write_and_time(encode_keys([key]), timeout))
+    # Let the session finish with the stream before the next measurement.
+    session.write_all(encode_keys([Keys.ControlU] + _mark("latency")))
+    session.wait_for(MARK % b"latency", timeout)
+    return _summary(latencies)
+
+
+def measure_throughput(session, keys, timeout):
+    data = encode_keys([Keys.ControlU] + keys)
+    marker = encode_keys(_mark("throughput"))
+    session.output.clear()
+    started = time.perf_counter()
+    session.write_all(data + marker)
+    session.wait_for(MARK % b"throughput", timeout)
+    elapsed = time.perf_counter() - started
+    return {
+        "keys": len(keys),
+        "bytes": len(data),
+        "seconds": elapsed,
+        "keys_per_second": len(keys) / elapsed,
+        "bytes_per_second": len(data) / elapsed,
+    }
+
+
+def run(args):
+    # A scratch home directory keeps the user's own history out of it.
+    home = tempfile.TemporaryDirectory(prefix="bench_pty")
+    with open(os.path.join(home.name, ".python_history"), "w") as fp:
+        fp.writelines("command %d\n" % i for i in range(args.history_entries))
+    env = dict(os.environ, HOME=home.name, TERM="xterm")
+    command = args.command or [sys.executable, os.path.abspath(__file__), "--session"]
+    streams = {
+        "typing": typing_stream(args.lines),
+        "search": search_stream(args.searches, args.history_entries),
+        "completion": completion_stream(args.completions),
+        "paste": paste_stream(args.paste_size),
+    }
+    report = {
+        "command": command,
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "terminal": {"columns": args.columns, "lines": args.lines_on_screen},
+        "history_entries": args.history_entries,
+        "scenarios": {},
+    }
+    session = PtySession(command, (args.columns, args.lines_on_screen), env)
+    try:
+        session.wait_for(MARK % b"ready", args.timeout)
+        for name in args.scenarios:
+            keys = streams[name]
+            report["scenarios"][name] = {
+                "latency": measure_latency(session, keys, args.timeout),
+                "throughput": measure_throughput(session, keys, args.timeout),
+            }
+    finally:
+        session.close()
+        home.cleanup()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--session", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--command", nargs="+", help="session to drive")
+    parser.add_argument(
+        "--scenarios",
+        nargs="+",
+        default=["typing", "search", "completion", "paste"],
+        choices=["typing", "search", "completion", "paste"],
+    )
+    parser.add_argument("--history-entries", type=int, default=10000)
+    parser.add_argument("--lines", type=int, default=50)
+    parser.add_argument("--searches", type=int, default=50)
+    parser.add_argument("--completions", type=int, default=50)
+    parser.add_argument("--paste-size", type=int, default=100000)
+    parser.add_argument("--columns", type=int, default=120)
+    parser.add_argument("--lines-on-screen", type=int, default=40)
+    parser.add_argument("--timeout", type=float, default=10.0)
+    parser.add_argument("--output", help="JSON report file, stdout by default")
+    args = parser.parse_args()
+
+    if args.session:
+        run_session()
+        return
+    report = run(args)
+    if args.output:
+        with open(args.output, "w") as fp:
+            json.dump(report, fp, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+import asyncio
+import os
+import sys
+import unittest
+
+from winreadline import aio
+from winreadline.highlight import Highlighter
+from winreadline.hooks import HookRegistry
+from winreadline.keyboard_enum import Keys
+from winreadline.tracing import tracer
+from winreadline.vt100 import encode_keys
+
+
+def _run(coroutine):
+    # asyncio.run is new in Python 3.7.
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+@unittest.skipUnless(hasattr(os, "openpty"), "requires a pseudo terminal")
+class TestReadlineAsync(unittest.TestCase):
+    def setUp(self):
+        master, slave = os.openpty()
+        self.master = master
+        self.terminal = os.fdopen(slave, "w")
+
+    def tearDown(self):
+        self.terminal.close()
+        os.close(self.master)
+
+    def output(self):
+        chunks = []
+        os.set_blocking(self.master, False)
+        while True:
+            try:
+                chunks.append(os.read(self.master, 1 << 16))
+            except (BlockingIOError, OSError):
+                return b"".join(chunks)
+
+    def read_line(self, keys, history=None, during=None, **kwargs):
+        async def main():
+            async def typist():
+                await asyncio.sleep(0.01)
+                if during is not None:
+                    during()
+                os.write(self.master, encode_keys(keys))
+
+            asyncio.ensure_future(typist())
+            return await aio.readline_async(
+                "> ", history=history, stdin=self.terminal, stdout=self.terminal,
+                **kwargs
+            )
+
+        return _run(main())
+
+    def test_editing_keys(self):
+        keys = ["hello wrld", Keys.Left, Keys.Left, Keys.Left, "o",
+                Keys.End, " x", Keys.ControlW, Keys.Backspace, Keys.Enter]
+        self.assertEqual(self.read_line(keys), "hello world")
+
+    def test_escape_sequence_split_across_reads(self):
+        async def main():
+            async def typist():
+                os.write(self.master, b"ab\x1b[")
+                await asyncio.sleep(0.01)
+                os.write(self.master, b"DX\r")
+
+            asyncio.ensure_future(typist())
+            return await aio.readline_async(stdin=self.terminal, stdout=self.terminal)
+
+        self.assertEqual(_run(main()), "aXb")
+
+    def test_history(self):
+        keys = [Keys.Up, Keys.Up, Keys.Down, "!", Keys.Enter]
+        self.assertEqual(self.read_line(keys, history=["first", "second"]), "second!")
+
+    def test_control_d_and_c(self):
+        with self.assertRaises(EOFError):
+            self.read_line([Keys.ControlD])
+        with self.assertRaises(KeyboardInterrupt):
+            self.read_line(["abc", Keys.ControlC])
+
+    def test_other_tasks_run(self):
+        ticks = []
+
+        async def main():
+            async def ticker():
+                for i in range(3):
+                    ticks.append(i)
+                    await asyncio.sleep(0)
+                os.write(self.master, b"done\r")
+
+            asyncio.ensure_future(ticker())
+            return await aio.readline_async(stdin=self.terminal, stdout=self.terminal)
+
+        self.assertEqual(_run(main()), "done")
+        self.assertEqual(ticks, [0, 1, 2])
+
+    def test_print_above_redraws_prompt(self):
+        self.output()
+        line = self.read_line(
+            ["typed", Keys.Enter], during=lambda: aio.print_above("news")
+        )
+        self.assertEqual(line, "typed")
+        output = self.output()
+        self.assertIn(b"\r\x1b[Jnews\r\n> ", output)
+        self.assertNotIn(b"\r\r\n", output)
+        self.assertLess(output.index(b"news"), output.index(b"typed"))
+
+    def test_highlighter(self):
+        self.output()
+        highlighter = Highlighter(styles={"keyword": "\x1b[1m"})
+        self.assertEqual(self.read_line(["if x", Keys.Enter], highlighter=highlighter), "if x")
+        self.assertIn(b"> \x1b[1mif \x1b[0mx", self.output())
+
+    def test_hooks(self):
+        calls = []
+        hooks = HookRegistry()
+        hooks.add("startup", lambda: calls.append("startup"))
+        hooks.add("pre_input", lambda: calls.append("pre_input"))
+        self.read_line(["x", Keys.Enter], hooks=hooks)
+        self.assertEqual(calls, ["startup", "pre_input"])
+
+    def test_keystrokes_are_traced(self):
+        tracer.clear()
+        tracer.enable()
+        try:
+            self.read_line(["x", Keys.Enter])
+        finally:
+            tracer.disable()
+        categories = {row[1] for row in tracer.spans()}
+        self.assertEqual(categories, {"decode", "dispatch", "redisplay"})
+
+    def test_patch_stdout_holds_partial_lines(self):
+        written = []
+
+        class Stream(object):
+            encoding = "utf-8"
+
+            def write(self, text):
+                written.append(text)
+
+            def flush(self):
+                pass
+
+        original = sys.stdout
+        sys.stdout = Stream()
+        try:
+            with aio.patch_stdout() as proxy:
+                print("a", end="")
+                self.assertEqual(written, [])
+                print("b")
+                self.assertEqual(written, ["ab\n"])
+                proxy.write("tail")
+        finally:
+            sys.stdout = original
+        self.assertEqual(written[-1], "tail")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+import unittest
+from unittest import mock
+
+from winreadline import clipboard
+from winreadline.clipboard import (
+    FakeClipboard,
+    get_clipboard_text_and_convert,
+    get_provider,
+    iter_rows,
+    parse_tab_separated,
+    set_provider,
+)
+
+
+class TestClipboard(unittest.TestCase):
+    def tearDown(self):
+        set_provider(None)
+
+    def paste(self, text, paste_list=True):
+        return get_clipboard_text_and_convert(paste_list, FakeClipboard(text))
+
+    def test_set_provider(self):
+        fake = FakeClipboard("spam")
+        set_provider(fake)
+        self.assertIs(get_provider(), fake)
+        get_provider().set_text("eggs")
+        self.assertEqual(get_clipboard_text_and_convert(), "eggs")
+
+    def test_plain_text_untouched(self):
+        self.assertEqual(self.paste("a b\nc"), "a b\nc")
+        self.assertEqual(self.paste("1\t2", paste_list=False), "1\t2")
+
+    def test_iter_rows_converts_cells(self):
+        rows = iter_rows("1\t2.5\tx\r\n\r\n3j\t-4\ty\r\n")
+        self.assertEqual(next(rows), [1, 2.5, "x"])
+        self.assertEqual(next(rows), [3j, -4, "y"])
+        self.assertEqual(list(rows), [])
+
+    def test_mixed_paste_is_a_list_of_lists(self):
+        self.assertEqual(self.paste("a\t1\r\nb\t2\r\n"), "[['a',1],['b',2]]")
+
+    def test_numeric_paste_is_an_array(self):
+        self.assertEqual(self.paste("1\t2\r\n3\t-4\r\n"), "array([[1,2],[3,-4]])")
+        # Written as parsed: leading zeros would be a syntax error.
+        self.assertEqual(self.paste("007\t1"), "array([[7,1]])")
+        self.assertEqual(self.paste("1\t2\r\n3.5\t-4e2\r\n"), "array([[1.0,2.0],[3.5,-400.0]])")
+
+    def test_cells_keep_their_spaces(self):
+        self.assertEqual(self.paste("a b\t1"), "[['a b',1]]")
+
+    def test_same_result_without_numpy(self):
+        texts = [
+            "1\t2\n3\t4\n",
+            "1.5\t2\n3\t4\n",
+            "007\t1",
+            "1\t2j\n3\t4\n",
+            "1\t2\n3\n",
+            "1\t2\n" * (clipboard.SAMPLE_ROWS + 1) + "x\t3\n",
+        ]
+        with_numpy = [self.paste(text) for text in texts]
+        with mock.patch.object(clipboard, "numpy", None):
+            self.assertEqual([self.paste(text) for text in texts], with_numpy)
+        self.assertEqual(with_numpy[3], "[[1,2j],[3,4]]")
+        self.assertEqual(with_numpy[4], "[[1,2],[3]]")
+
+    def test_non_numeric_after_sample(self):
+        text = "1\t2\n" * (clipboard.SAMPLE_ROWS + 1) + "x\t3\n"
+        rows = parse_tab_separated(text)
+        self.assertIsInstance(rows, list)
+        self.assertEqual(rows[-1], ["x", 3])
+        self.assertTrue(self.paste(text).endswith("['x',3]]"))
+
+    @unittest.skipIf(clipboard.numpy is None, "requires numpy")
+    def test_numpy_array(self):
+        values = parse_tab_separated("1\t2\n3\t4\n")
+        self.assertEqual(values.dtype, clipboard.numpy.int64)
+        self.assertEqual(values.tolist(), [[1, 2], [3, 4]])
+        values = parse_tab_separated("1.5\t2\n3\t4\n")
+        self.assertEqual(values.dtype, float)
+        self.assertEqual(values.shape, (2, 2))
+
+
+if __name__ == "__main__":
+    unittest.main()
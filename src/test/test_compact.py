@@ -0,0 +1,69 @@
+import unittest
+
+from winreadline.compact import CompactHistory
+
+
+class TestCompactHistory(unittest.TestCase):
+    def setUp(self):
+        self.entries = ["ls", "", "git status", "café", "git log", "ls"]
+        self.history = CompactHistory(self.entries)
+
+    def test_sequence(self):
+        self.assertEqual(len(self.history), 6)
+        self.assertEqual(list(self.history), self.entries)
+        self.assertEqual(self.history[-3], "café")
+        self.assertEqual(self.history[1:4], self.entries[1:4])
+        with self.assertRaises(IndexError):
+            self.history[6]
+
+    def test_mutation_matches_list(self):
+        self.history[3] = "thé"
+        self.entries[3] = "thé"
+        self.history.insert(1, "pwd")
+        self.entries.insert(1, "pwd")
+        del self.history[0]
+        del self.entries[0]
+        del self.history[::2]
+        del self.entries[::2]
+        self.history[1:1] = ["a", "b"]
+        self.entries[1:1] = ["a", "b"]
+        self.assertEqual(self.history.pop(), self.entries.pop())
+        self.assertEqual(list(self.history), self.entries)
+        self.history[:] = []
+        self.assertEqual(len(self.history), 0)
+        self.assertEqual(len(self.history.blob), 0)
+
+    def test_search_newest_first(self):
+        self.assertEqual(list(self.history.search("git")), [4, 2])
+        self.assertEqual(list(self.history.search("git", start=3)), [2])
+        self.assertEqual(list(self.history.search("é")), [3])
+        self.assertEqual(list(self.history.search("nothing")), [])
+
+    def test_search_forward(self):
+        self.assertEqual(list(self.history.search("ls", reverse=False)), [0, 5])
+        self.assertEqual(list(self.history.search("ls", 1, reverse=False)), [5])
+        self.assertEqual(list(self.history.search("", 4, reverse=False)), [4, 5])
+
+    def test_search_ignores_matches_across_entries(self):
+        history = CompactHistory(["ab", "cd", "xbc"])
+        self.assertEqual(list(history.search("bc")), [2])
+        self.assertEqual(list(history.search("bc", reverse=False)), [2])
+
+    def test_contains(self):
+        self.assertIn("git log", self.history)
+        self.assertNotIn("git", self.history)
+        self.assertIn("", self.history)
+
+    def test_copy_is_independent(self):
+        copy = self.history.copy()
+        self.history.append("new")
+        self.assertEqual(list(copy), self.entries)
+
+    def test_undecodable_bytes_round_trip(self):
+        line = b"caf\xe9".decode("utf-8", "surrogateescape")
+        history = CompactHistory([line])
+        self.assertEqual(history[0], line)
+
+
+if __name__ == "__main__":
+    unittest.main()
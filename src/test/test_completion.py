@@ -0,0 +1,75 @@
+import io
+import unittest
+
+from winreadline.completion import CompletionDisplay, display_matches, page_layout
+
+
+class TestDisplayMatches(unittest.TestCase):
+    def display(self, matches, keys="", pressed=(), **kwargs):
+        out = io.StringIO()
+        keys = iter(keys)
+        pressed = iter(pressed)
+        printed = display_matches(
+            "",
+            matches,
+            max(map(len, matches)),
+            out=out,
+            read_key=lambda: next(keys, ""),
+            key_pressed=lambda: next(pressed, False),
+            **kwargs
+        )
+        return printed, out.getvalue().splitlines()
+
+    def test_page_layout_single_pass(self):
+        matches = ["a", "bb", "c" * 10, "d"]
+        self.assertEqual(page_layout(matches, 0, 20, 1), (2, 5, 4))
+        self.assertEqual(page_layout(matches, 2, 20, 1), (3, 1, 12))
+
+    def test_columns_run_down_then_across(self):
+        printed, lines = self.display(["a", "b", "c", "d", "e"], size=(6, 10))
+        self.assertEqual(printed, 5)
+        self.assertEqual(lines, ["", "a  d", "b  e", "c"])
+
+    def test_pager_stops_on_q(self):
+        matches = ["m%03d" % i for i in range(1000)]
+        printed, lines = self.display(
+            matches, keys=" q", size=(4, 5), query_items=-1
+        )
+        self.assertEqual(printed, 8)
+        # Each prompt is erased and the next row written over it; the
+        # carriage return splits the line here.
+        self.assertEqual(lines[5:], ["--More--", "\x1b[Km004", "m005", "m006", "m007",
+                                     "--More--", "\x1b[K"])
+
+    def test_pager_return_shows_one_more_line(self):
+        matches = ["m%03d" % i for i in range(1000)]
+        printed, lines = self.display(
+            matches, keys="\r\nq", size=(4, 5), query_items=-1
+        )
+        self.assertEqual(printed, 6)
+        self.assertEqual(lines[4:], ["m003", "--More--", "\x1b[Km004",
+                                     "--More--", "\x1b[Km005", "--More--", "\x1b[K"])
+
+    def test_query_declined(self):
+        printed, lines = self.display(["x"] * 200, keys="n", size=(80, 24))
+        self.assertEqual(printed, 0)
+        self.assertIn("Display all 200 possibilities? (y or n)", lines)
+
+    def test_typeahead_stops_listing(self):
+        printed, _ = self.display(
+            ["m%d" % i for i in range(50)], pressed=(False, True), size=(2, 100)
+        )
+        self.assertEqual(printed, 2)
+
+    def test_hook(self):
+        calls = []
+        display = CompletionDisplay()
+        display.set_completion_display_matches_hook(lambda *args: calls.append(args))
+        display("sub", ["a"], 1)
+        self.assertEqual(calls, [("sub", ["a"], 1)])
+        with self.assertRaises(TypeError):
+            display.set_completion_display_matches_hook(42)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,176 @@
+import os
+import stat
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+from winreadline import daemon
+from winreadline.daemon import HistoryClient, HistoryDaemon, RemoteHistory, default_socket_path
+from winreadline.histfile import iter_history
+from winreadline.history import OrderedHistory
+
+
+class TestHistoryDaemon(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.socket_path = os.path.join(self.tmpdir.name, "history.sock")
+        self.filename = os.path.join(self.tmpdir.name, "history")
+        with open(self.filename, "w") as fp:
+            fp.write("import os\nimport sys\n")
+        self.server = HistoryDaemon(self.socket_path, self.filename)
+        self.thread = threading.Thread(
+            target=self.server.serve_forever, kwargs={"poll_interval": 0.01}
+        )
+        self.thread.start()
+        self.history = RemoteHistory.connect(self.socket_path, spawn=False)
+
+    def tearDown(self):
+        self.history.client.close()
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+        self.tmpdir.cleanup()
+
+    def test_len_and_get(self):
+        self.assertEqual(len(self.history), 2)
+        self.assertEqual(self.history[-1], "import sys")
+        self.assertEqual(self.history[0:1], ["import os"])
+        with self.assertRaises(IndexError):
+            self.history[5]
+
+    def test_pipelined_adds_are_shared_and_saved(self):
+        for line in ["print(1)", "print(1)", "", "print(2)"]:
+            self.history.append(line)
+        other = RemoteHistory.connect(self.socket_path, spawn=False)
+        try:
+            self.assertEqual(len(self.history), 4)
+            self.assertEqual(other[-2:], ["print(1)", "print(2)"])
+        finally:
+            other.client.close()
+        self.assertEqual(list(iter_history(self.filename))[-1], "print(2)")
+        # No #<epoch> lines, which the standard readline would show.
+        with open(self.filename) as fp:
+            self.assertEqual(fp.read(), "import os\nimport sys\nprint(1)\nprint(2)\n")
+
+    def test_file_is_truncated_to_history_length(self):
+        store = daemon._Store(self.filename, history_length=3)
+        store.add("a")
+        self.assertEqual(list(iter_history(self.filename)), ["import os", "import sys", "a"])
+        store.add("b")
+        store.add("c")
+        self.assertEqual(list(iter_history(self.filename)), ["a", "b", "c"])
+        # Only the file is cut down.
+        self.assertEqual(store.entries, ["import os", "import sys", "a", "b", "c"])
+
+    def test_read_only(self):
+        with self.assertRaises(TypeError):
+            self.history[0] = "x"
+        with self.assertRaises(TypeError):
+            del self.history[0]
+        with self.assertRaises(TypeError):
+            self.history.insert(0, "x")
+
+    def test_iterates_in_chunks(self):
+        self.history.extend("print(%d)" % i for i in range(23))
+        self.history.chunk_size = 10
+        with mock.patch.object(self.history.client, "call", wraps=self.history.client.call) as call:
+            entries = list(self.history)
+        self.assertEqual(len(entries), 25)
+        self.assertEqual(entries[-1], "print(22)")
+        gets = [args for args, _ in call.call_args_list if args[0] == "get"]
+        self.assertEqual(len(gets), 3)
+
+    def test_ordered_history(self):
+        local = os.path.join(self.tmpdir.name, "local_history")
+        with open(local, "w") as fp:
+            fp.write("from_the_local_file\n")
+        with mock.patch.object(self.history.client, "call", wraps=self.history.client.call) as call:
+            history = OrderedHistory(history=self.history, filename=local, history_length=-1)
+            for line in ["a", "a", "b"]:
+                history.add_history(line)
+            # Appends don't wait for the daemon.
+            self.assertEqual(call.call_count, 0)
+        self.assertEqual(list(history), ["import os", "import sys", "a", "b"])
+        saved = os.path.join(self.tmpdir.name, "saved")
+        history.write_history_file(saved)
+        self.assertEqual(list(iter_history(saved)), ["import os", "import sys", "a", "b"])
+
+    def test_empty_daemon_doesnt_load_local_file(self):
+        self.server.store.entries.clear()
+        local = os.path.join(self.tmpdir.name, "local_history")
+        with open(local, "w") as fp:
+            fp.write("from_the_local_file\n")
+        history = OrderedHistory(history=self.history, filename=local)
+        self.assertEqual(len(history), 0)
+
+    def test_search(self):
+        self.history.extend(["import re", "x = 1", "import os"])
+        self.assertEqual(
+            self.history.search("import", prefix=True),
+            ["import os", "import re", "import sys"],
+        )
+        self.assertEqual(self.history.search("o", limit=2), ["import os", "import re"])
+
+    def test_call_many(self):
+        results = self.history.client.call_many(
+            [{"op": "len"}, {"op": "get", "index": 0}]
+        )
+        self.assertEqual(results, [2, "import os"])
+
+    def test_socket_is_private(self):
+        self.assertEqual(stat.S_IMODE(os.stat(self.socket_path).st_mode), 0o600)
+
+    def test_refuses_daemon_of_another_user(self):
+        with mock.patch.object(daemon.os, "getuid", return_value=os.getuid() + 1):
+            with self.assertRaises(PermissionError):
+                HistoryClient(self.socket_path)
+
+
+class TestSpawnDaemon(unittest.TestCase):
+    def test_early_exit_is_reported(self):
+        with tempfile.TemporaryDirectory() as directory:
+            # A directory can't be read as a history file.
+            with self.assertRaisesRegex(OSError, "exited with status 1:\n(.|\n)*IsADirectoryError"):
+                RemoteHistory.connect(os.path.join(directory, "history.sock"), directory)
+
+
+class TestDefaultSocketPath(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        patches = [
+            mock.patch.dict(os.environ),
+            mock.patch.object(tempfile, "tempdir", self.tmpdir.name),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        os.environ.pop("XDG_RUNTIME_DIR", None)
+        self.directory = os.path.join(self.tmpdir.name, "winreadline-%d" % os.getuid())
+
+    def test_runtime_dir(self):
+        os.environ["XDG_RUNTIME_DIR"] = self.tmpdir.name
+        self.assertEqual(os.path.dirname(default_socket_path()), self.tmpdir.name)
+
+    def test_private_directory_in_temp(self):
+        path = default_socket_path()
+        self.assertEqual(os.path.dirname(path), self.directory)
+        self.assertEqual(stat.S_IMODE(os.stat(self.directory).st_mode), 0o700)
+        self.assertEqual(default_socket_path(), path)
+
+    def test_refuses_open_directory(self):
+        os.mkdir(self.directory, 0o755)
+        os.chmod(self.directory, 0o755)
+        with self.assertRaises(PermissionError):
+            default_socket_path()
+
+    def test_refuses_symlink(self):
+        os.mkdir(os.path.join(self.tmpdir.name, "elsewhere"), 0o700)
+        os.symlink(os.path.join(self.tmpdir.name, "elsewhere"), self.directory)
+        with self.assertRaises(PermissionError):
+            default_socket_path()
+
+
+if __name__ == "__main__":
+    unittest.main()
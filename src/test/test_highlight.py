@@ -0,0 +1,92 @@
+import random
+import unittest
+
+from winreadline.highlight import Highlighter
+
+
+def fresh(text):
+    highlighter = Highlighter(budget=60)
+    highlighter.update(text)
+    return highlighter.runs()
+
+
+class TestHighlighter(unittest.TestCase):
+    def styles(self, text):
+        highlighter = Highlighter()
+        highlighter.update(text)
+        return [(text[start:stop], style) for start, stop, style in highlighter.runs()]
+
+    def test_styles(self):
+        self.assertEqual(
+            self.styles("def f(x): return len(x) + 1  # done"),
+            [
+                ("def ", "keyword"),
+                ("f", "definition"),
+                ("(x): ", None),
+                ("return ", "keyword"),
+                ("len", "builtin"),
+                ("(x) + ", None),
+                ("1  ", "number"),
+                ("# done", "comment"),
+            ],
+        )
+
+    def test_incomplete_strings(self):
+        self.assertEqual(self.styles("x = 'abc"), [("x = ", None), ("'abc", "string")])
+        self.assertEqual(self.styles('"""a\nb'), [('"""a\nb', "string")])
+
+    def test_typing_in_the_middle_relexes_little(self):
+        text = "print(%s)" % ", ".join("value_%d" % i for i in range(2000))
+        highlighter = Highlighter(budget=60)
+        highlighter.update(text)
+        middle = len(text) // 2
+        middle = text.index(",", middle)
+        edited = text[:middle] + " + 1" + text[middle:]
+        self.assertEqual(highlighter.update(edited), text.rindex(" ", 0, middle) + 1)
+        self.assertEqual(highlighter.runs(), fresh(edited))
+        self.assertLess(highlighter.lexed, 10)
+
+    def test_edit_that_changes_following_tokens(self):
+        highlighter = Highlighter()
+        highlighter.update("x = 'a' + b + 'c'")
+        edited = "x = a' + b + 'c'"
+        highlighter.update(edited)
+        self.assertEqual(highlighter.runs(), fresh(edited))
+        highlighter.update("def foo(): pass")
+        highlighter.update("deff foo(): pass")
+        self.assertEqual(highlighter.runs(), fresh("deff foo(): pass"))
+
+    def test_random_edits_match_a_fresh_lex(self):
+        rng = random.Random(44)
+        alphabet = "ab1 .'\"#()=\n\\"
+        highlighter = Highlighter(budget=60)
+        text = ""
+        for _ in range(2000):
+            at = rng.randint(0, len(text))
+            if text and rng.random() < 0.4:
+                text = text[:at] + text[at + rng.randint(1, 3):]
+            else:
+                text = text[:at] + "".join(rng.choice(alphabet) for _ in range(rng.randint(1, 3))) + text[at:]
+            highlighter.update(text)
+            self.assertEqual(highlighter.runs(), fresh(text), repr(text))
+
+    def test_budget(self):
+        text = "x + " * 5000
+        highlighter = Highlighter(budget=0)
+        highlighter.update(text)
+        self.assertFalse(highlighter.complete)
+        self.assertEqual(highlighter.runs()[-1][1:], (len(text), None))
+        highlighter.budget = 60
+        self.assertGreater(highlighter.update(text), 0)
+        self.assertTrue(highlighter.complete)
+        self.assertEqual(highlighter.runs(), fresh(text))
+
+    def test_runs_window_and_render(self):
+        highlighter = Highlighter(styles={"keyword": "<k>"})
+        highlighter.update("if x: pass")
+        self.assertEqual(highlighter.runs(1, 4), [(1, 3, "keyword"), (3, 4, None)])
+        self.assertEqual(highlighter.render(), "<k>if \x1b[0mx: <k>pass\x1b[0m")
+
+
+if __name__ == "__main__":
+    unittest.main()
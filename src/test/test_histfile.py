@@ -0,0 +1,237 @@
+import io
+import itertools
+import os
+import stat
+import subprocess
+import sys
+import tempfile
+import unittest
+
+import winreadline
+from winreadline.histfile import (
+    DurabilityPolicy,
+    atomic_open,
+    iter_history,
+    iter_history_records,
+    main,
+    merge_history_files,
+    parse_history_buffer,
+    write_history_records,
+)
+
+
+class TestIterHistory(unittest.TestCase):
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp()
+        self.entries = ["print(%d)" % i for i in range(500)] + ["'héllo wörld'"]
+        with os.fdopen(fd, "wb") as fp:
+            fp.write("\n".join(self.entries).encode("utf-8"))
+            fp.write(b"\r\n\n    indented\n")
+        self.entries.append("indented")
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_forward(self):
+        self.assertEqual(
+            list(iter_history(self.path, encoding="utf-8", block_size=7)),
+            self.entries,
+        )
+
+    def test_reverse_small_blocks(self):
+        # Blocks that split lines, and multibyte characters, mid way.
+        for block_size in (1, 3, 8, 4096):
+            got = list(
+                iter_history(
+                    self.path, reverse=True, encoding="utf-8", block_size=block_size
+                )
+            )
+            self.assertEqual(got, self.entries[::-1])
+
+    def test_last_n(self):
+        last = itertools.islice(iter_history(self.path, reverse=True), 3)
+        self.assertEqual(list(last), ["indented", "'héllo wörld'", "print(499)"])
+
+    def test_bulk_parser_agrees(self):
+        with open(self.path, "rb") as fp:
+            entries, timestamps = parse_history_buffer(fp.read(), "utf-8")
+        self.assertEqual(entries, self.entries)
+        self.assertIsNone(timestamps)
+
+    def test_bulk_parser_timestamps(self):
+        data = b"#100\nls\r\n\n  pwd\n#200\n\tmake\r"
+        self.assertEqual(
+            parse_history_buffer(data), (["ls", "pwd", "make"], [100.0, None, 200.0])
+        )
+        self.assertEqual(parse_history_buffer(b"# comment\nls"), (["# comment", "ls"], None))
+
+    def test_start_and_filter(self):
+        got = iter_history(
+            self.path, start=490, filter=lambda entry: entry.endswith("5)")
+        )
+        self.assertEqual(list(got), ["print(495)"])
+
+
+class TestMergeHistoryFiles(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.paths = []
+        hosts = {
+            "a": [(100, "ls"), (300, "make"), (500, "git push")],
+            "b": [(200, "cd src"), (300, "make"), (400, "ls")],
+        }
+        for name, records in sorted(hosts.items()):
+            path = os.path.join(self.tmpdir.name, name)
+            with open(path, "wb") as fp:
+                write_history_records(fp, records)
+            self.paths.append(path)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def merged(self, **kwargs):
+        out = io.BytesIO()
+        merge_history_files(self.paths, out, **kwargs)
+        path = os.path.join(self.tmpdir.name, "merged")
+        with open(path, "wb") as fp:
+            fp.write(out.getvalue())
+        return list(iter_history_records(path))
+
+    def test_records_round_trip(self):
+        self.assertEqual(
+            list(iter_history_records(self.paths[0], reverse=True)),
+            [(500.0, "git push"), (300.0, "make"), (100.0, "ls")],
+        )
+        self.assertEqual(list(iter_history(self.paths[0])), ["ls", "make", "git push"])
+
+    def test_merge_by_timestamp(self):
+        self.assertEqual(
+            self.merged(),
+            [
+                (100.0, "ls"),
+                (200.0, "cd src"),
+                (300.0, "make"),
+                (500.0, "git push"),
+            ],
+        )
+
+    def test_merge_without_dedupe(self):
+        entries = [entry for _, entry in self.merged(window=0)]
+        self.assertEqual(entries.count("make"), 2)
+        self.assertEqual(entries[-2:], ["ls", "git push"])
+
+    def test_merge_by_source(self):
+        self.assertEqual(
+            self.merged(order="source", window=0),
+            [
+                (100.0, "ls"),
+                (200.0, "cd src"),
+                (300.0, "make"),
+                (300.0, "make"),
+                (500.0, "git push"),
+                (400.0, "ls"),
+            ],
+        )
+
+    def test_cli(self):
+        output = os.path.join(self.tmpdir.name, "cli")
+        self.assertEqual(main(["merge", "-o", output] + self.paths), 0)
+        self.assertEqual(len(list(iter_history(output))), 4)
+        # Inputs are only replaced once fully read, so merging in place works.
+        main(["merge", "-o", self.paths[0]] + self.paths)
+        self.assertEqual(list(iter_history(self.paths[0])), list(iter_history(output)))
+
+    def test_cli_to_stdout(self):
+        output = subprocess.run(
+            [sys.executable, "-m", "winreadline.histfile", "merge"] + self.paths,
+            cwd=os.path.dirname(os.path.dirname(winreadline.__file__)),
+            check=True,
+            stdout=subprocess.PIPE,
+        ).stdout
+        self.assertEqual(output.count(b"\n"), 8)
+        self.assertTrue(output.endswith(b"git push\n"))
+
+    def test_cli_through_history_module(self):
+        output = os.path.join(self.tmpdir.name, "cli")
+        subprocess.run(
+            [sys.executable, "-m", "winreadline.history", "merge", "--order", "source",
+             "-o", output] + self.paths,
+            cwd=os.path.dirname(os.path.dirname(winreadline.__file__)),
+            check=True,
+        )
+        self.assertEqual(
+            list(iter_history_records(output)),
+            [(100.0, "ls"), (200.0, "cd src"), (300.0, "make"), (500.0, "git push")],
+        )
+
+
+class TestAtomicOpen(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "history")
+        with open(self.path, "wb") as fp:
+            write_history_records(fp, [(None, "old")])
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_replaces_target(self):
+        with atomic_open(self.path, "always") as fp:
+            write_history_records(fp, [(None, "new")])
+        self.assertEqual(list(iter_history(self.path)), ["new"])
+        self.assertEqual(os.listdir(self.tmpdir.name), ["history"])
+
+    def test_failed_write_keeps_old_contents(self):
+        with self.assertRaises(RuntimeError):
+            with atomic_open(self.path, "never") as fp:
+                fp.write(b"partial")
+                raise RuntimeError("crash mid write")
+        self.assertEqual(list(iter_history(self.path)), ["old"])
+        self.assertEqual(os.listdir(self.tmpdir.name), ["history"])
+
+    def test_keeps_symlink(self):
+        link = os.path.join(self.tmpdir.name, "link")
+        os.symlink(self.path, link)
+        with atomic_open(link, "never") as fp:
+            write_history_records(fp, [(None, "new")])
+        self.assertTrue(os.path.islink(link))
+        self.assertEqual(list(iter_history(self.path)), ["new"])
+
+    def test_keeps_mode_and_owner(self):
+        os.chmod(self.path, 0o640)
+        before = os.stat(self.path)
+        with atomic_open(self.path, "never") as fp:
+            write_history_records(fp, [(None, "new")])
+        after = os.stat(self.path)
+        self.assertEqual(stat.S_IMODE(after.st_mode), 0o640)
+        self.assertEqual((after.st_uid, after.st_gid), (before.st_uid, before.st_gid))
+
+    def test_new_file_is_private(self):
+        path = os.path.join(self.tmpdir.name, "new")
+        with atomic_open(path, "never") as fp:
+            write_history_records(fp, [(None, "new")])
+        self.assertEqual(stat.S_IMODE(os.stat(path).st_mode), 0o600)
+
+
+class TestDurabilityPolicy(unittest.TestCase):
+    def test_parse(self):
+        self.assertEqual(str(DurabilityPolicy.parse("interval=2.5s")), "interval=2.5s")
+        self.assertIs(DurabilityPolicy.parse("always"), DurabilityPolicy.parse("always"))
+        for spec in ("sometimes", "always=3", "interval=soon"):
+            with self.assertRaises(ValueError):
+                DurabilityPolicy.parse(spec)
+
+    def test_commit(self):
+        with tempfile.TemporaryFile() as fp:
+            self.assertTrue(DurabilityPolicy("always").commit(fp, "a"))
+            self.assertFalse(DurabilityPolicy("never").commit(fp, "a"))
+            interval = DurabilityPolicy("interval", 3600)
+            self.assertTrue(interval.commit(fp, "a"))
+            self.assertFalse(interval.commit(fp, "a"))
+            on_exit = DurabilityPolicy("on-exit")
+            self.assertFalse(on_exit.commit(fp, "a"))
+            self.assertEqual(on_exit._pending, {"a"})
+
+
+if __name__ == "__main__":
+    unittest.main()
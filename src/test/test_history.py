@@ -1,8 +1,24 @@
 #!
+import os
+import tempfile
+import threading
 import unittest
+from array import array
+from unittest import mock
+
+from winreadline.histfilter import HistoryFilter
+from winreadline.history import ACompletelyDifferentClass, OrderedHistory
+from winreadline.history import OrderedHistory as LineHistory
+from winreadline.stats import HistoryStatistics
 
 class TestLineHistoryDunderMethods(unittest.TestCase):
     def setUp(self):
+        # An empty history reads ~/.python_history; point it somewhere empty.
+        home = tempfile.TemporaryDirectory()
+        self.addCleanup(home.cleanup)
+        patcher = mock.patch.dict(os.environ, {"HOME": home.name, "USERPROFILE": home.name})
+        patcher.start()
+        self.addCleanup(patcher.stop)
         self.buf = LineHistory()
 
     def test_index(self):
@@ -27,7 +43,7 @@ def test_getitem(self):
     def test_add(self):
         self.adding_buffer = LineHistory()
         self.adding_buffer + "Cross your fingers"
-        self.assertEqual(self.buf[0], "Cross your fingers")
+        self.assertEqual(self.adding_buffer[0], "Cross your fingers")
 
     def test_len(self):
         self.buf2 = LineHistory()
@@ -40,5 +56,363 @@ def test_a_new_one(self):
         self.assertLess(len(self.new_buffer), 1)
 
 
+class TestOrderedHistory(unittest.TestCase):
+    def test_iter(self):
+        history = OrderedHistory(history=["a", "b"])
+        self.assertEqual(list(history), ["a", "b"])
+        self.assertIn("b", history)
+
+    def test_history_length(self):
+        history = OrderedHistory(history=["a"])
+        self.assertEqual(history.get_history_length(), 100)
+        history.set_history_length(-1)
+        self.assertEqual(history.history_length, -1)
+        with self.assertRaises(TypeError):
+            history.history_length = "1"
+
+    def test_saves_to_filename_by_default(self):
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, "history")
+            history = OrderedHistory(history=["a", "b"], filename=filename)
+            history.write_history_file()
+            history.add_history("c")
+            history.append_history_file(1)
+            history.flush(full=True)
+            with open(filename) as fp:
+                self.assertEqual(fp.read(), "a\nb\nc\n")
+
+
+class TestAddHistoryMany(unittest.TestCase):
+    def test_drops_empty_lines_and_repeats(self):
+        history = OrderedHistory(history=["ls"], statistics=HistoryStatistics())
+        added = history.add_history_many(["ls", "", "make", "make", "ls", "", "ls", "vim"])
+        self.assertEqual(added, 3)
+        self.assertEqual(history.history, ["ls", "make", "ls", "vim"])
+        self.assertEqual(history.statistics.count("ls"), 2)
+
+    def test_same_as_add_history(self):
+        lines = ["a", "a", "", "b", "a", "b", "b", "", "c"]
+        one_by_one = OrderedHistory(history=["a"])
+        for line in lines:
+            one_by_one.add_history(line)
+        bulk = OrderedHistory(history=["a"])
+        bulk.extend(iter(lines))
+        self.assertEqual(bulk.history, one_by_one.history)
+
+    def test_timestamps(self):
+        history = OrderedHistory(history=["ls"], timestamps=True)
+        history.add_history_many(["ls", "make", "make", "vim"], [100.0, 200.0, 300.0, 150.0])
+        self.assertEqual(history.history, ["ls", "make", "vim"])
+        # The repeat keeps the first time; the late one is raised.
+        self.assertEqual(list(history.timestamps), [0.0, 200.0, 200.0])
+        history.add_history_many(["cd"])
+        self.assertGreater(history.timestamps[-1], 1e9)
+
+
+class TestThreadSafe(unittest.TestCase):
+    def setUp(self):
+        self.history = OrderedHistory(
+            history=["seed"], timestamps=True, threadsafe=True, history_length=-1)
+
+    def test_snapshot_is_unaffected_by_later_writes(self):
+        snapshot = self.history.snapshot()
+        self.history.add_history("ls")
+        self.history[0] = "changed"
+        del self.history[0]
+        self.assertEqual(list(snapshot), ["seed"])
+        self.assertEqual(list(self.history.snapshot()), ["ls"])
+        self.assertGreater(self.history.snapshot().version, snapshot.version)
+
+    def test_add_history_saves_the_merged_entries(self):
+        with tempfile.TemporaryDirectory() as directory:
+            self.history.filename = os.path.join(directory, "history")
+            self.history.snapshot()
+            self.history + OrderedHistory(history=["y", "z"], history_length=-1)
+            with open(self.history.filename) as fp:
+                self.assertEqual(
+                    [line for line in fp.read().splitlines() if not line.startswith("#")],
+                    ["seed", "y", "z"])
+        self.assertEqual(list(self.history.snapshot()), ["seed", "y", "z"])
+
+    def test_concurrent_writers_and_readers(self):
+        writers, lines_each = 4, 300
+        stop = threading.Event()
+        errors = []
+
+        def write(number):
+            for index in range(lines_each):
+                if index % 2:
+                    self.history.add_history("w%d-%d" % (number, index))
+                else:
+                    self.history.add_history_many(["w%d-%d" % (number, index)])
+
+        def read():
+            while not stop.is_set():
+                snapshot = self.history.snapshot()
+                try:
+                    entries = list(snapshot)
+                    self.assertEqual(len(entries), len(snapshot))
+                    self.assertGreaterEqual(len(snapshot.timestamps), len(snapshot))
+                    self.assertEqual(snapshot[-1], entries[-1])
+                    # The column stays sorted under contention.
+                    stamps = snapshot.timestamps[:len(snapshot)]
+                    self.assertEqual(list(stamps), sorted(stamps))
+                except Exception as error:
+                    errors.append(error)
+                    return
+
+        readers = [threading.Thread(target=read) for _ in range(2)]
+        threads = [threading.Thread(target=write, args=(number,)) for number in range(writers)]
+        for thread in readers + threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        stop.set()
+        for thread in readers:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(len(self.history), 1 + writers * lines_each)
+        self.assertEqual(len(self.history.timestamps), len(self.history))
+        self.assertEqual(len(set(self.history)), len(self.history))
+
+
+class TestHistoryFilter(unittest.TestCase):
+    def setUp(self):
+        self.history = OrderedHistory(
+            history=["ls"], timestamps=True, statistics=HistoryStatistics(),
+            history_filter=HistoryFilter(histignore="exit", redact=["hunter2"], replacement="*"))
+
+    def test_every_way_in(self):
+        self.history.add_history("exit")
+        self.history.add_history("login hunter2")
+        self.history.add_history_many(["exit", "su hunter2"])
+        self.history + "exit"
+        self.history + "echo hunter2"
+        self.history.insert("exit", 0)
+        self.history.insert("hunter2", 0)
+        self.assertEqual(
+            self.history.history, ["*", "ls", "login *", "su *", "echo *"])
+        self.assertEqual(len(self.history.timestamps), len(self.history))
+        self.assertEqual(self.history.statistics.count("exit"), 0)
+
+    def test_setitem(self):
+        self.history.add_history_many(["make", "vim"])
+        self.history[0] = "cat hunter2"
+        self.assertEqual(self.history.history, ["cat *", "make", "vim"])
+        # A dropped replacement leaves nothing in the entry's place.
+        self.history[-1] = "exit"
+        self.history[1:] = ["exit", "hunter2", "exit"]
+        self.assertEqual(self.history.history, ["cat *", "*"])
+        self.assertEqual(len(self.history.timestamps), 2)
+        self.assertEqual(self.history.statistics.count("cat *"), 1)
+
+    def test_add_another_history(self):
+        other = OrderedHistory(history=["exit", "cd", "hunter2"], timestamps=True)
+        other.timestamps[:] = array("d", [100.0, 200.0, 300.0])
+        with tempfile.TemporaryDirectory() as directory:
+            self.history.filename = os.path.join(directory, "history")
+            self.history + other
+        self.assertEqual(self.history.history, ["ls", "cd", "*"])
+        self.assertEqual(list(self.history.timestamps), [0.0, 200.0, 300.0])
+
+    def test_loaded_and_saved(self):
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, "history")
+            with open(filename, "w") as fp:
+                fp.write("exit\nmake hunter2\n")
+            self.history.read_history_file(filename)
+            self.assertEqual(self.history.history, ["ls", "make *"])
+            # Entries given up front are kept, but never saved.
+            history = OrderedHistory(
+                history=["exit", "ls"], filename=filename,
+                history_filter=self.history.history_filter)
+            history.write_history_file()
+            with open(filename) as fp:
+                self.assertEqual(fp.read(), "ls\n")
+
+
+class TestStatistics(unittest.TestCase):
+    def setUp(self):
+        self.history = OrderedHistory(
+            history=["ls", "make", "ls"], statistics=HistoryStatistics())
+        self.stats = self.history.statistics
+
+    def test_setitem(self):
+        self.history[0] = "make"
+        self.assertEqual((self.stats.count("ls"), self.stats.count("make")), (1, 2))
+        self.history[1:] = ["vim", "vim", "vim"]
+        self.assertEqual(self.history.history, ["make", "vim", "vim", "vim"])
+        self.assertEqual(
+            [self.stats.count(line) for line in ("ls", "make", "vim")], [0, 1, 3])
+
+    def test_add_and_insert(self):
+        self.history + "make"
+        self.history.insert("ls", 0)
+        self.assertEqual((self.stats.count("ls"), self.stats.count("make")), (3, 2))
+        other = OrderedHistory(history=["vim"], history_length=-1)
+        with tempfile.TemporaryDirectory() as directory:
+            self.history.filename = os.path.join(directory, "history")
+            self.history + other
+        self.assertEqual(self.stats.count("vim"), 1)
+
+    def test_delitem(self):
+        del self.history[:2]
+        self.assertEqual((self.stats.count("ls"), self.stats.count("make")), (1, 0))
+
+
+class TestTimestamps(unittest.TestCase):
+    def setUp(self):
+        self.history = OrderedHistory(history=["seed"], timestamps=True, history_length=-1)
+
+    def test_column_stays_sorted(self):
+        self.history.add_history("a", timestamp=100.0)
+        self.history.add_history("b", timestamp=50.0)
+        self.history.add_history_many(["c", "d", "e"], [300.0, 200.0, 400.0])
+        self.assertEqual(list(self.history.timestamps), [0.0, 100.0, 100.0, 300.0, 300.0, 400.0])
+        self.assertEqual(self.history.entries_between(100.0, 300.0), ["a", "b", "c", "d"])
+        self.assertEqual(self.history.entries_between(350.0, 500.0), ["e"])
+
+    def test_fractions_survive_a_save(self):
+        self.history.add_history("a", timestamp=1700000000.25)
+        self.history.add_history("b", timestamp=1700000001.0)
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, "history")
+            self.history.write_history_file(filename)
+            with open(filename) as fp:
+                self.assertEqual(
+                    fp.read(), "seed\n#1700000000.250000\na\n#1700000001\nb\n")
+            loaded = OrderedHistory(history=["seed"], timestamps=True)
+            loaded.read_history_file(filename)
+        self.assertEqual(list(loaded.timestamps), [0.0, 1700000000.25, 1700000001.0])
+
+    def test_loaded_from_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, "history")
+            with open(filename, "w") as fp:
+                fp.write("#100\nls\n#300\nmake\n#200\nvim\n")
+            self.history.read_history_file(filename)
+        self.assertEqual(self.history.history, ["seed", "ls", "make", "vim"])
+        self.assertEqual(list(self.history.timestamps), [0.0, 100.0, 300.0, 300.0])
+        self.assertEqual(self.history.entries_between(250.0, 300.0), ["make", "vim"])
+
+    def test_not_recorded(self):
+        history = OrderedHistory(history=["ls"])
+        self.assertIsNone(history.timestamps)
+        history.add_history("make", timestamp=100.0)
+        with self.assertRaises(ValueError):
+            history.entries_between(0.0, 200.0)
+
+    def test_add_updates_everything(self):
+        self.history.statistics = HistoryStatistics()
+        self.history.enable_autosuggestions()
+        self.history + "git status"
+        self.assertEqual(len(self.history.timestamps), 2)
+        self.assertEqual(self.history.statistics.count("git status"), 1)
+        self.assertEqual(self.history.suggester.suggest("git"), "git status")
+
+
+class FakeBuffer(object):
+    """The parts of a line buffer the bindable commands use."""
+
+    def __init__(self, text):
+        self.text = text
+        self.point = len(text)
+
+    def get_line_text(self):
+        return self.text
+
+    def set_line(self, text):
+        self.text = text
+
+
+class TestAutosuggestions(unittest.TestCase):
+    def setUp(self):
+        self.history = ACompletelyDifferentClass(history=["git status", "git commit -m x"])
+        self.history.enable_autosuggestions()
+
+    def test_accept(self):
+        current = FakeBuffer("git c")
+        self.history.accept_autosuggestion_word(current)
+        self.assertEqual((current.text, current.point), ("git commit", 10))
+        self.history.accept_autosuggestion(current)
+        self.assertEqual((current.text, current.point), ("git commit -m x", 15))
+
+    def test_deleted_entries_are_not_suggested(self):
+        self.history.add_history("git status")
+        self.history.add_history("git stash")
+        del self.history[-1]
+        self.assertEqual(self.history.suggester.suggest("git st"), "git status")
+        # Still in the history once more.
+        del self.history[-1]
+        self.assertEqual(self.history.suggester.suggest("git st"), "git status")
+        del self.history[0]
+        self.assertIsNone(self.history.suggester.suggest("git st"))
+
+
+class TestIncrementalSearch(unittest.TestCase):
+    def setUp(self):
+        self.history = ACompletelyDifferentClass(
+            history=["git status", "ls", "git commit", "make", "git push"])
+
+    def test_reverse_steps_back_through_hits(self):
+        search = self.history.reverse_search_history
+        self.assertEqual(search("git"), "git push")
+        self.assertEqual(search("git"), "git commit")
+        self.assertEqual(self.history.history_cursor, 2)
+        # A longer query only looks at the hits so far and further back.
+        self.assertEqual(search("git s"), "git status")
+        self.assertEqual(search("git s"), "git status")
+        self.assertTrue(self.history.isearch.failed)
+
+    def test_forward_from_a_hit(self):
+        self.history.reverse_search_history("git", startpos=0)
+        self.assertEqual(self.history.forward_search_history("git"), "git commit")
+        self.assertEqual(self.history.forward_search_history("git"), "git push")
+        self.assertEqual(self.history.history_cursor, 4)
+
+    def test_no_hit(self):
+        self.assertEqual(self.history.reverse_search_history("nope"), "")
+        self.assertEqual(self.history.last_search_for, "nope")
+
+    def test_resumes_after_an_append(self):
+        self.assertEqual(self.history.reverse_search_history("git"), "git push")
+        session = self.history.isearch
+        self.history.add_history("git stash")
+        self.assertEqual(self.history.reverse_search_history("git"), "git commit")
+        self.assertIs(self.history.isearch, session)
+        # Moving the cursor starts over, now seeing the new entry.
+        self.history.history_cursor = None
+        self.assertEqual(self.history.reverse_search_history("git st"), "git stash")
+        self.assertIsNot(self.history.isearch, session)
+
+    def test_restarts_after_an_assignment(self):
+        self.history.reverse_search_history("git")
+        self.history.reverse_search_history("git")
+        mutations = self.history.mutations
+        self.history[4] = "make clean"
+        self.assertGreater(self.history.mutations, mutations)
+        self.assertEqual(self.history.forward_search_history("git"), "git commit")
+        self.assertEqual(self.history.forward_search_history("git"), "git commit")
+        self.assertTrue(self.history.isearch.failed)
+
+    def test_restarts_after_an_insert(self):
+        self.history.reverse_search_history("git")
+        self.history.reverse_search_history("git")
+        self.history.insert("vim", 3)
+        self.assertEqual(self.history.forward_search_history("git"), "git commit")
+        self.assertEqual(self.history.forward_search_history("git"), "git push")
+        self.assertEqual(self.history.history_cursor, 5)
+
+    def test_restarts_after_a_removal(self):
+        self.history.reverse_search_history("git")
+        self.assertEqual(self.history.reverse_search_history("git"), "git commit")
+        session = self.history.isearch
+        del self.history[0]
+        # The hits found so far are stale: search again from the cursor.
+        self.assertEqual(self.history.reverse_search_history("git"), "git commit")
+        self.assertEqual(self.history.history_cursor, 1)
+        self.assertIsNot(self.history.isearch, session)
+
+
 if __name__ == "__main__":
     unittest.main()
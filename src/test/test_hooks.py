@@ -0,0 +1,126 @@
+import threading
+import unittest
+from unittest import mock
+
+from winreadline import hooks as hooks_module
+from winreadline.hooks import HookRegistry
+
+
+class FakeClock(object):
+    """perf_counter stand in, moved on by the hooks themselves."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class TestHookRegistry(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = mock.patch.object(hooks_module, "_clock", self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.registry = HookRegistry(budget=0.01)
+        self.addCleanup(self.registry.shutdown)
+
+    def test_hooks_run_in_order(self):
+        calls = []
+        self.registry.add("startup", lambda: calls.append(1))
+        self.registry.add("startup", lambda: calls.append(2))
+        self.registry.add("pre_input", lambda: calls.append(3))
+        self.registry.run("startup")
+        self.assertEqual(calls, [1, 2])
+
+    def test_unknown_event_and_uncallable(self):
+        with self.assertRaises(ValueError):
+            self.registry.add("shutdown", print)
+        with self.assertRaises(TypeError):
+            self.registry.add("startup", "not callable")
+
+    def test_set_hook_replaces_others(self):
+        self.registry.add("startup", print)
+        self.registry.add("startup", repr)
+        self.registry.set_startup_hook(len)
+        self.assertEqual([hook.function for hook in self.registry.hooks("startup")], [len])
+        self.registry.set_startup_hook()
+        self.assertEqual(self.registry.hooks("startup"), [])
+        with self.assertRaises(TypeError):
+            self.registry.set_pre_input_hook(1)
+
+    def test_remove(self):
+        self.registry.add("startup", print)
+        self.registry.remove("startup", print)
+        with self.assertRaises(ValueError):
+            self.registry.remove("startup", print)
+
+    def test_stats(self):
+        hook = self.registry.add("startup", lambda: self.clock.sleep(0.002), name="quick")
+        for _ in range(4):
+            self.registry.run("startup")
+        stats = self.registry.stats()["startup:quick"]
+        self.assertIs(stats, hook.stats)
+        self.assertEqual(stats.calls, 4)
+        self.assertAlmostEqual(stats.mean, 0.002)
+        self.assertAlmostEqual(stats.worst, 0.002)
+        self.assertEqual(stats.slow, 0)
+
+    def test_failing_hook_is_logged_and_others_still_run(self):
+        calls = []
+        self.registry.add("startup", lambda: 1 / 0, name="broken")
+        self.registry.add("startup", lambda: calls.append(1))
+        with self.assertLogs("winreadline.hooks", "ERROR"):
+            self.registry.run("startup")
+        self.assertEqual(calls, [1])
+        self.assertEqual(self.registry.stats()["startup:broken"].failures, 1)
+
+    def test_slow_hook_warns_once(self):
+        hook = self.registry.add("startup", lambda: self.clock.sleep(0.05), name="git")
+        with self.assertLogs("winreadline.hooks", "WARNING") as logs:
+            for _ in range(5):
+                self.registry.run("startup")
+        self.assertEqual(len(logs.records), 1)
+        self.assertIn("git", logs.output[0])
+        self.assertTrue(hook.enabled)
+        self.assertEqual(hook.stats.slow, 5)
+
+    def test_slow_hook_disabled_after_strikes(self):
+        registry = HookRegistry(budget=0.01, on_slow="disable", strikes=2)
+        durations = iter([0.05, 0.001, 0.05, 0.05, 0.05])
+        hook = registry.add("startup", lambda: self.clock.sleep(next(durations)))
+        with self.assertLogs("winreadline.hooks", "WARNING") as logs:
+            for _ in range(5):
+                registry.run("startup")
+        self.assertFalse(hook.enabled)
+        # The fast call broke the first streak; disabled on the fourth.
+        self.assertEqual(hook.stats.calls, 4)
+        self.assertIn("Disabled", logs.output[-1])
+        with self.assertRaises(ValueError):
+            HookRegistry(on_slow="ignore")
+
+    def test_background_hook_does_not_block(self):
+        release = threading.Event()
+        started = threading.Event()
+
+        def slow():
+            started.set()
+            release.wait(5)
+
+        hook = self.registry.add("pre_input", slow, background=True)
+        self.registry.run("pre_input")
+        self.assertTrue(started.wait(5))
+        self.assertTrue(hook.running())
+        # Still running: the next prompt doesn't queue another call.
+        self.registry.run("pre_input")
+        release.set()
+        self.registry.shutdown()
+        self.assertEqual(hook.stats.calls, 1)
+        self.assertEqual(hook.stats.slow, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,116 @@
+import random
+import unittest
+
+from winreadline.compact import CompactHistory
+from winreadline.isearch import BACKWARD, FORWARD, SearchSession
+
+HISTORY = ["git status", "ls", "git log", "make", "git push", "vim"]
+
+
+class LoggingList(list):
+    """Counts the entries looked at."""
+
+    looked_at = 0
+
+    def __getitem__(self, index):
+        self.looked_at += 1
+        return list.__getitem__(self, index)
+
+
+class TestSearchSession(unittest.TestCase):
+    def setUp(self):
+        self.session = SearchSession(HISTORY)
+
+    def test_extend_keeps_matching_hit(self):
+        self.assertEqual(self.session.extend("g"), 4)
+        self.assertEqual(self.session.extend("it"), 4)
+        self.assertEqual(list(self.session.candidates), [4])
+        self.assertEqual(self.session.extend(" l"), 2)
+        self.assertEqual(self.session.match, "git log")
+
+    def test_next_resumes_from_last_hit(self):
+        self.session.extend("git")
+        self.assertEqual(self.session.next(), 2)
+        self.assertEqual(self.session.next(), 0)
+        self.assertIsNone(self.session.next())
+        self.assertTrue(self.session.failed)
+        self.assertEqual(self.session.position, 0)
+        self.assertEqual(self.session.next(FORWARD), 2)
+
+    def test_backspace_restores_earlier_state(self):
+        self.session.extend("g")
+        self.session.next()
+        # Backwards from "git log" there is no "git p".
+        self.assertIsNone(self.session.extend("it p"))
+        self.assertTrue(self.session.failed)
+        self.assertEqual(self.session.backspace(), 2)
+        self.assertFalse(self.session.failed)
+        self.assertEqual(self.session.query, "g")
+        self.assertEqual(list(self.session.candidates), [2, 4])
+        self.session.backspace()
+        self.assertEqual(self.session.query, "")
+        self.assertIsNone(self.session.candidates)
+
+    def test_set_query(self):
+        self.assertEqual(self.session.set_query("git"), 4)
+        self.assertEqual(self.session.set_query("gi"), 4)
+        self.assertEqual(self.session.set_query("ls"), 1)
+        self.assertIsNone(self.session.set_query("nothing"))
+
+    def test_forward_from_start(self):
+        session = SearchSession(HISTORY, start=1)
+        self.assertEqual(session.extend("git", FORWARD), 2)
+        self.assertEqual(session.next(FORWARD), 4)
+
+    def test_compact_backend(self):
+        session = SearchSession(CompactHistory(HISTORY))
+        self.assertEqual(session.extend("m", BACKWARD), 5)
+        self.assertEqual(session.next(), 3)
+        self.assertEqual(list(session.candidates), [3, 5])
+        self.assertIsNone(session.next())
+
+    def test_scans_lazily(self):
+        history = LoggingList(HISTORY * 1000)
+        session = SearchSession(history)
+        self.assertEqual(session.extend("git"), len(history) - 2)
+        # Stopped at the first hit.
+        self.assertEqual(history.looked_at, 2)
+        self.assertEqual(session.extend(" p"), len(history) - 2)
+        self.assertEqual(history.looked_at, 3)
+        self.assertEqual(session.next(), len(history) - 8)
+        self.assertEqual(list(session.candidates), [len(history) - 8, len(history) - 2])
+
+    def test_matches_a_full_scan(self):
+        rng = random.Random(40)
+        for _ in range(300):
+            history = ["".join(rng.choice("ab") for _ in range(rng.randint(0, 3)))
+                       for _ in range(rng.randint(1, 12))]
+            query = rng.choice(["a", "b", "ab", "ba"])
+            direction = rng.choice([BACKWARD, FORWARD])
+            start = rng.randrange(len(history))
+            session = SearchSession(history, start)
+            hits = [session.extend(query, direction)]
+            while hits[-1] is not None:
+                hits.append(session.next(direction))
+            order = range(start, -1, -1) if direction == BACKWARD else range(start, len(history))
+            self.assertEqual(hits[:-1], [i for i in order if query in history[i]])
+
+    def test_is_over(self):
+        self.assertTrue(self.session.is_over(HISTORY))
+        self.assertFalse(self.session.is_over(HISTORY + ["new"]))
+
+    def test_resume_after_append(self):
+        history = list(HISTORY)
+        session = SearchSession(history[:])
+        self.assertFalse(session.resume(history))
+        session = SearchSession(history)
+        session.extend("git")
+        history.append("git commit")
+        self.assertTrue(session.resume(history))
+        self.assertEqual(session.next(FORWARD), 6)
+        del history[:3]
+        self.assertFalse(session.resume(history))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from winreadline.pathcomplete import DirectoryListing, PathCompleter
+
+
+class TestPathCompleter(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        for name in ["alpha.py", "alps.txt", "beta", ".hidden", ".hdir/", "alpine/"]:
+            path = os.path.join(self.root, name)
+            if name.endswith("/"):
+                os.mkdir(path)
+            else:
+                open(path, "w").close()
+        self.completer = PathCompleter()
+        self.prefix = os.path.join(self.root, "")
+
+    def tearDown(self):
+        self.completer.clear()
+        shutil.rmtree(self.root)
+
+    def complete(self, text, completer=None):
+        completer = completer or self.completer
+        return [m[len(self.prefix):] for m in completer.matches(self.prefix + text)]
+
+    def test_prefix(self):
+        self.assertEqual(self.complete("alp"), ["alpha.py", "alpine/", "alps.txt"])
+        self.assertEqual(self.complete("z"), [])
+
+    def test_hidden(self):
+        self.assertEqual(self.complete(""), ["alpha.py", "alpine/", "alps.txt", "beta"])
+        self.assertEqual(self.complete("."), [".hdir/", ".hidden"])
+        self.assertIn(".hidden", self.complete("", PathCompleter(show_hidden=True)))
+
+    def test_dirs_only(self):
+        self.assertEqual(self.complete("", PathCompleter(dirs_only=True)), ["alpine/"])
+
+    def test_state_protocol(self):
+        text = self.prefix + "alp"
+        results = []
+        state = 0
+        while True:
+            match = self.completer(text, state)
+            if match is None:
+                break
+            results.append(match)
+            state += 1
+        self.assertEqual(len(results), 3)
+
+    def test_listing_is_cached_until_directory_changes(self):
+        listing = self.completer.listing(self.root)
+        self.assertIs(self.completer.listing(self.root), listing)
+        open(os.path.join(self.root, "alpaca"), "w").close()
+        os.utime(self.root, ns=(0, listing.mtime + 10 ** 9))
+        self.assertIsNot(self.completer.listing(self.root), listing)
+        self.assertIn("alpaca", self.complete("alpa"))
+
+    def test_lru_eviction(self):
+        completer = PathCompleter(cache_size=1)
+        completer.listing(self.root)
+        completer.listing(os.path.join(self.root, "alpine"))
+        self.assertEqual(len(completer._cache), 1)
+
+    def test_missing_directory(self):
+        self.assertEqual(self.complete("nope/x"), [])
+
+    def test_progressive_scan(self):
+        for i in range(2000):
+            open(os.path.join(self.root, "f%04d" % i), "w").close()
+        listing = DirectoryListing(self.root, 0)
+        listing.scan(deadline=0)
+        self.assertFalse(listing.complete)
+        partial = len(listing.files)
+        self.assertGreater(partial, 0)
+        self.assertEqual(listing.files, sorted(listing.files))
+        listing.scan()
+        self.assertTrue(listing.complete)
+        self.assertEqual(len(listing.files), 2003)
+        self.assertEqual(listing.files, sorted(listing.files))
+
+
+if __name__ == "__main__":
+    unittest.main()
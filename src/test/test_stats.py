@@ -0,0 +1,43 @@
+import unittest
+
+from winreadline.stats import CountMinSketch, HistoryStatistics
+
+
+class TestHistoryStatistics(unittest.TestCase):
+    def setUp(self):
+        self.stats = HistoryStatistics(half_life=2)
+        self.stats.update(["ls", "git  status", "ls", "git status", "ls", "pwd"])
+
+    def test_counts_are_normalized(self):
+        self.assertEqual(self.stats.count("git status"), 2)
+        self.assertEqual(self.stats.last_use["ls"], 4)
+
+    def test_most_common(self):
+        self.assertEqual(
+            self.stats.most_common(2), [("ls", 3), ("git status", 2)]
+        )
+        # Asking twice must not lose entries from the lazy heap.
+        self.assertEqual(self.stats.most_common(3)[2], ("pwd", 1))
+
+    def test_most_frecent_prefers_recent_use(self):
+        stats = HistoryStatistics(half_life=1)
+        stats.update(["old"] * 3 + ["x%d" % i for i in range(10)] + ["new"])
+        self.assertEqual(stats.most_frecent(1)[0][0], "new")
+        self.assertAlmostEqual(stats.frecency("new"), 1.0)
+
+    def test_evict(self):
+        self.stats.evict("pwd")
+        self.assertNotIn("pwd", self.stats)
+        self.stats.evict("ls")
+        self.assertIn(("ls", 2), self.stats.most_common(2))
+
+    def test_sketch_never_undercounts(self):
+        stats = HistoryStatistics(sketch=CountMinSketch(width=64), max_tracked=4)
+        for i in range(100):
+            stats.add("cmd%d" % (i % 10))
+        self.assertLessEqual(len(stats), 8)
+        self.assertGreaterEqual(stats.count("cmd3"), 10)
+
+
+if __name__ == "__main__":
+    unittest.main()
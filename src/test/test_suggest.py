@@ -0,0 +1,78 @@
+import bisect
+import random
+import unittest
+
+from winreadline.stats import HistoryStatistics
+from winreadline.suggest import (
+    Autosuggester,
+    PrefixIndex,
+    accept_suggestion,
+    accept_suggestion_word,
+)
+
+
+class TestAutosuggester(unittest.TestCase):
+    def setUp(self):
+        self.lines = ["git status", "git commit -m 'x'", "git stash", "ls -la"]
+        self.suggester = Autosuggester(self.lines)
+
+    def test_most_recent_match_wins(self):
+        self.assertEqual(self.suggester.suggest("git st"), "git stash")
+        self.suggester.add("git status")
+        self.assertEqual(self.suggester.suggest("git st"), "git status")
+
+    def test_no_match(self):
+        self.assertIsNone(self.suggester.suggest("python"))
+        self.assertIsNone(self.suggester.suggest(""))
+        self.assertEqual(self.suggester.ghost_text("ls -la"), "")
+
+    def test_typing_along_reuses_suggestion(self):
+        self.assertEqual(self.suggester.ghost_text("l"), "s -la")
+        self.suggester.index.keys = []  # a fresh lookup would find nothing
+        self.assertEqual(self.suggester.ghost_text("ls"), " -la")
+
+    def test_frecency_ranking(self):
+        stats = HistoryStatistics()
+        stats.update(["git status"] * 5 + ["git stash"])
+        suggester = Autosuggester(["git status", "git stash"], statistics=stats)
+        self.assertEqual(suggester.suggest("git st"), "git status")
+
+    def test_large_prefix_block_walks_recent(self):
+        lines = ["cmd %d" % i for i in range(5000)]
+        suggester = Autosuggester(lines, scan_limit=10)
+        self.assertEqual(suggester.suggest("cmd"), "cmd 4999")
+
+    def test_accept_actions(self):
+        suggestion = "git commit -m 'x'"
+        self.assertEqual(accept_suggestion("git", suggestion), suggestion)
+        self.assertEqual(accept_suggestion_word("git", suggestion), "git commit")
+        self.assertEqual(
+            accept_suggestion_word("git commit", suggestion), "git commit -m"
+        )
+        self.assertEqual(accept_suggestion_word("ls", suggestion), "ls")
+
+
+class TestPrefixIndex(unittest.TestCase):
+    def test_matches_a_sorted_list(self):
+        rng = random.Random(28)
+        index = PrefixIndex()
+        index.keys._load = 4  # many chunks for a small test
+        expected = []
+        for _ in range(2000):
+            line = "".join(rng.choice("abc") for _ in range(rng.randint(1, 5)))
+            if line in index and rng.random() < 0.4:
+                index.discard(line)
+                expected.remove(line)
+            else:
+                if line not in index:
+                    bisect.insort(expected, line)
+                index.add(line)
+            prefix = line[:2]
+            lo, hi = index.prefix_range(prefix)
+            self.assertEqual(index.keys[lo:hi], [k for k in expected if k.startswith(prefix)])
+        self.assertEqual(list(index.keys), expected)
+        self.assertEqual(len(index), len(expected))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+import io
+import json
+import unittest
+
+from winreadline.tracing import Tracer, traced, tracer
+from winreadline.vt100 import KeyDecoder
+
+
+class TestTracer(unittest.TestCase):
+    def setUp(self):
+        self.tracer = Tracer(capacity=4)
+        self.tracer.enable()
+
+    def test_disabled_records_nothing(self):
+        self.tracer.disable()
+        with self.tracer.span("previous_history"):
+            pass
+        self.assertEqual(len(self.tracer), 0)
+
+    def test_ring_buffer_keeps_newest(self):
+        for i in range(6):
+            self.tracer.record("cmd%d" % i, "command", float(i), i + 0.5)
+        names = [row[0] for row in self.tracer.spans()]
+        self.assertEqual(names, ["cmd2", "cmd3", "cmd4", "cmd5"])
+
+    def test_chrome_trace_is_json(self):
+        with self.tracer.span("redisplay", "redisplay"):
+            pass
+        trace = json.loads(json.dumps(self.tracer.to_chrome_trace()))
+        (event,) = trace["traceEvents"]
+        self.assertEqual(event["ph"], "X")
+        self.assertEqual(event["cat"], "redisplay")
+
+    def test_histograms(self):
+        for i in range(1, 5):
+            self.tracer.record("reverse_search_history", "command", 0.0, i * 1e-6)
+        summary = self.tracer.percentiles()["reverse_search_history"]
+        self.assertEqual(summary["count"], 4)
+        self.assertLessEqual(summary["p50"], summary["p99"])
+        out = io.StringIO()
+        self.tracer.print_histograms(file=out)
+        self.assertIn("reverse_search_history: n=4", out.getvalue())
+
+    def test_traced_decorator(self):
+        @traced("completion")
+        def complete():
+            return 42
+
+        tracer.clear()
+        self.assertEqual(complete(), 42)
+        self.assertEqual(len(tracer), 0)
+        tracer.enable()
+        try:
+            complete()
+        finally:
+            tracer.disable()
+        self.assertEqual(next(tracer.spans())[:2], ("complete", "completion"))
+
+
+    def test_key_decoding_is_traced(self):
+        decoder = KeyDecoder()
+        tracer.clear()
+        tracer.enable()
+        try:
+            decoder.feed(b"a\x1b")
+            decoder.flush()
+        finally:
+            tracer.disable()
+        self.assertEqual([row[:2] for row in tracer.spans()],
+                         [("feed", "decode"), ("flush", "decode")])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,44 @@
+import unittest
+
+from winreadline.keyboard_enum import Keys
+from winreadline.vt100 import KeyDecoder, encode_keys
+
+
+class TestKeyDecoder(unittest.TestCase):
+    def test_round_trip(self):
+        keys = ["print(1)", Keys.ControlR, Keys.Up, Keys.ControlLeft, Keys.F5, Keys.Tab]
+        decoder = KeyDecoder()
+        self.assertEqual(decoder.feed(encode_keys(keys)), keys)
+        self.assertFalse(decoder.pending)
+
+    def test_text_comes_in_runs(self):
+        self.assertEqual(KeyDecoder().feed(b"abc\rdef"), ["abc", Keys.Enter, "def"])
+
+    def test_split_sequence_is_held_back(self):
+        decoder = KeyDecoder()
+        self.assertEqual(decoder.feed(b"x\x1b[1;"), ["x"])
+        self.assertTrue(decoder.pending)
+        self.assertEqual(decoder.feed(b"5C"), [Keys.ControlRight])
+
+    def test_split_utf8(self):
+        data = "é".encode("utf-8")
+        decoder = KeyDecoder()
+        self.assertEqual(decoder.feed(data[:1]), [])
+        self.assertEqual(decoder.feed(data[1:]), ["é"])
+
+    def test_lone_escape_needs_flush(self):
+        decoder = KeyDecoder()
+        self.assertEqual(decoder.feed(b"\x1b"), [])
+        self.assertEqual(decoder.flush(), [Keys.Escape])
+        self.assertEqual(decoder.feed(b"\x1b["), [])
+        self.assertEqual(decoder.flush(), [Keys.Escape, "["])
+
+    def test_unknown_sequence(self):
+        self.assertEqual(KeyDecoder().feed(b"\x1b[9x"), [Keys.Escape, "[9x"])
+
+    def test_backspace(self):
+        self.assertEqual(KeyDecoder().feed(b"\x7f"), [Keys.Backspace])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+import unittest
+
+from winreadline import wcwidth
+from winreadline.wcwidth import LineWidths, char_width, str_width
+
+COMBINING_ACUTE = "\u0301"
+
+
+class TestWidths(unittest.TestCase):
+    def test_char_width(self):
+        self.assertEqual(char_width("a"), 1)
+        self.assertEqual(char_width("中"), 2)
+        self.assertEqual(char_width("\uff21"), 2)  # fullwidth A
+        self.assertEqual(char_width("\U0001f600"), 2)
+        self.assertEqual(char_width(COMBINING_ACUTE), 0)
+        self.assertEqual(char_width("\u200d"), 0)  # zero width joiner
+        self.assertEqual(char_width("\x01"), 0)
+        self.assertEqual(char_width("\u00ad"), 1)  # soft hyphen
+        self.assertEqual(char_width("\U000e0100"), 0)  # variation selector
+        self.assertEqual(char_width("\U00100000"), 1)  # private use
+
+    def test_blocks_are_scanned_on_first_use(self):
+        wcwidth._blocks.pop(0x4E, None)
+        wcwidth._blocks.pop(0x4F, None)
+        self.assertEqual(char_width("\u4e2d"), 2)
+        self.assertIn(0x4E, wcwidth._blocks)
+        self.assertNotIn(0x4F, wcwidth._blocks)
+
+    def test_str_width(self):
+        self.assertEqual(str_width("print(1)"), 8)
+        self.assertEqual(str_width("日本語abc"), 9)
+        self.assertEqual(str_width("e" + COMBINING_ACUTE), 1)
+
+
+class TestLineWidths(unittest.TestCase):
+    def setUp(self):
+        # a b 中 文 e ◌́ f
+        self.line = LineWidths("ab中文e" + COMBINING_ACUTE + "f")
+
+    def test_prefix(self):
+        self.assertEqual(list(self.line.prefix), [0, 1, 2, 4, 6, 7, 7, 8])
+        self.assertEqual(self.line.width, 8)
+        self.assertEqual(self.line.column(3), 4)
+
+    def test_index_at(self):
+        self.assertEqual(
+            [self.line.index_at(column) for column in range(9)],
+            [0, 1, 2, 2, 3, 3, 4, 6, 7],
+        )
+
+    def test_set_text_recomputes_from_change(self):
+        self.assertEqual(self.line.set_text("ab中x"), 3)
+        self.assertEqual(list(self.line.prefix), [0, 1, 2, 4, 5])
+        self.assertEqual(self.line.set_text("ab中x" + "y" * 3), 4)
+        self.assertEqual(self.line.width, 8)
+        self.assertEqual(list(self.line.prefix), list(LineWidths(self.line.text).prefix))
+
+    def test_rows(self):
+        self.assertEqual(self.line.rows(4), [0, 3])
+        # The prompt leaves 2 columns; 文 can't share a row with 中.
+        self.assertEqual(self.line.rows(3, offset=1), [0, 2, 3, 6])
+
+    def test_cursor(self):
+        self.assertEqual(self.line.cursor(1, 4, offset=0), (0, 1))
+        self.assertEqual(self.line.cursor(4, 4), (1, 2))
+        self.assertEqual(self.line.cursor(7, 4), (2, 0))
+        self.assertEqual(self.line.cursor(0, 3, offset=1), (0, 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,397 @@
+# -*- coding: utf-8 -*-
+"""Read a line inside an asyncio application without blocking the loop.
+
+:func:`readline_async` puts the terminal in raw mode and registers stdin
+with the running loop's :meth:`~asyncio.AbstractEventLoop.add_reader`
+(epoll on Linux). Each read is decoded incrementally into
+:class:`~winreadline.keyboard_enum.Keys` by a
+:class:`~winreadline.vt100.KeyDecoder`, and the awaiting task resumes
+once Enter is pressed. Other tasks keep running in the meantime.
+
+Output from other tasks would land in the middle of the line being typed.
+:func:`print_above` erases the prompt, prints, and draws the prompt again
+below the output. :func:`patch_stdout` does the same for every ``print``
+while it is active.
+
+Usage::
+
+    import asyncio
+    from winreadline.aio import patch_stdout, readline_async
+
+    async def ticker():
+        while True:
+            await asyncio.sleep(1)
+            print("tick")
+
+    async def main():
+        asyncio.ensure_future(ticker())
+        with patch_stdout():
+            while True:
+                line = await readline_async(">>> ")
+
+    asyncio.get_event_loop().run_until_complete(main())
+
+Keys understood: printable text, Backspace, Delete, Left, Right, Home and
+End (or Ctrl-A and Ctrl-E), Ctrl-U, Ctrl-K, Ctrl-W, Up and Down through
+`history`, Enter, Ctrl-C (raises :exc:`KeyboardInterrupt`) and Ctrl-D on
+an empty line (raises :exc:`EOFError`).
+
+"""
+import asyncio
+import contextlib
+import io
+import os
+import re
+import shutil
+import sys
+import termios
+import tty
+from typing import Sequence
+
+from .keyboard_enum import Keys
+from .tracing import traced
+from .vt100 import KeyDecoder
+from .wcwidth import LineWidths, str_width
+
+__all__ = [
+    "patch_stdout",
+    "print_above",
+    "readline_async",
+]
+
+#: Seconds to wait for the rest of an escape sequence before taking a lone
+#: escape key.
+ESCAPE_TIMEOUT = 0.05
+
+_WORD = re.compile(r"\S+\s*$")
+
+# The prompt currently shown, if any.
+_active = None
+
+
+class _PromptSession(object):
+    """One line being read: the buffer, its display, and the key handling."""
+
+    def __init__(self, prompt: str, out_fd: int, history: Sequence[str], highlighter=None):
+        self.prompt = prompt
+        self.prompt_width = str_width(prompt)
+        self.out_fd = out_fd
+        self.history = history
+        self.history_index = len(history)
+        self.saved_line = ""
+        self.buffer = ""
+        self.point = 0
+        self.widths = LineWidths()
+        self.decoder = KeyDecoder()
+        self.highlighter = highlighter
+        # Screen row of the terminal cursor, counted from the prompt's row.
+        self.cursor_row = 0
+        self.future = asyncio.get_event_loop().create_future()
+        self._escape_timer = None
+
+    def write(self, text: str):
+        data = text.encode("utf-8", "replace")
+        while data:
+            data = data[os.write(self.out_fd, data):]
+
+    def _columns(self) -> int:
+        try:
+            columns = os.get_terminal_size(self.out_fd).columns
+        except OSError:
+            columns = 0
+        # A pty nobody has sized yet reports 0.
+        return columns or shutil.get_terminal_size().columns
+
+    def erase(self) -> str:
+        """Escape codes taking the cursor back and clearing the prompt."""
+        up = "\x1b[%dA" % self.cursor_row if self.cursor_row else ""
+        self.cursor_row = 0
+        return up + "\r\x1b[J"
+
+    def render(self) -> str:
+        """Escape codes drawing the prompt and line from the prompt's row."""
+        columns = self._columns()
+        self.widths.set_text(self.buffer)
+        end_row, end_column = self.widths.cursor(
+            len(self.buffer), columns, self.prompt_width)
+        row, column = self.widths.cursor(self.point, columns, self.prompt_width)
+        if self.highlighter is not None:
+            self.highlighter.update(self.buffer)
+            line = self.highlighter.render()
+        else:
+            line = self.buffer
+        parts = [self.prompt, line]
+        if end_column == 0 and end_row:
+            # Force the pending wrap so the cursor really is on the next row.
+            parts.append(" \r")
+        if end_row > row:
+            parts.append("\x1b[%dA" % (end_row - row))
+        parts.append("\r")
+        if column:
+            parts.append("\x1b[%dC" % column)
+        self.cursor_row = row
+        return "".join(parts)
+
+    @traced("redisplay")
+    def redraw(self):
+        self.write(self.erase() + self.render())
+
+    def print_above(self, text: str):
+        if text and not text.endswith("\n"):
+            text += "\n"
+        self.write(self.erase() + text + self.render())
+
+    def _flush_escape(self):
+        self._escape_timer = None
+        self.handle(self.decoder.flush())
+
+    def feed(self, data: bytes):
+        if self._escape_timer is not None:
+            self._escape_timer.cancel()
+            self._escape_timer = None
+        if not data:
+            self.handle(self.decoder.flush() + [Keys.ControlD])
+            return
+        self.handle(self.decoder.feed(data))
+        if self.decoder.pending and not self.future.done():
+            self._escape_timer = asyncio.get_event_loop().call_later(
+                ESCAPE_TIMEOUT, self._flush_escape)
+
+    def handle(self, keys):
+        for key in keys:
+            if self.future.done():
+                return
+            self.key(key)
+        if not self.future.done():
+            self.redraw()
+
+    def _set_line(self, line: str):
+        self.buffer = line
+        self.point = len(line)
+
+    @traced("dispatch")
+    def key(self, key):
+        buffer = self.buffer
+        point = self.point
+        if not isinstance(key, Keys):
+            self.buffer = buffer[:point] + key + buffer[point:]
+            self.point += len(key)
+        elif key in (Keys.Enter, Keys.ControlJ):
+            self.redraw()
+            self.write("\n")
+            self.cursor_row = 0
+            self.future.set_result(buffer)
+        elif key is Keys.ControlC:
+            self.write("^C\n")
+            self.future.set_exception(KeyboardInterrupt())
+        elif key is Keys.ControlD:
+            if not buffer:
+                self.write("\n")
+                self.future.set_exception(EOFError())
+            else:
+                self.buffer = buffer[:point] + buffer[point + 1:]
+        elif key is Keys.Backspace:
+            if point:
+                self.buffer = buffer[:point - 1] + buffer[point:]
+                self.point -= 1
+        elif key is Keys.Delete:
+            self.buffer = buffer[:point] + buffer[point + 1:]
+        elif key is Keys.Left:
+            self.point = max(0, point - 1)
+        elif key is Keys.Right:
+            self.point = min(len(buffer), point + 1)
+        elif key in (Keys.Home, Keys.ControlA):
+            self.point = 0
+        elif key in (Keys.End, Keys.ControlE):
+            self.point = len(buffer)
+        elif key is Keys.ControlU:
+            self.buffer = buffer[point:]
+            self.point = 0
+        elif key is Keys.ControlK:
+            self.buffer = buffer[:point]
+        elif key is Keys.ControlW:
+            match = _WORD.search(buffer, 0, point)
+            start = match.start() if match else point
+            self.buffer = buffer[:start] + buffer[point:]
+            self.point = start
+        elif key is Keys.Up:
+            if self.history_index > 0:
+                if self.history_index == len(self.history):
+                    self.saved_line = buffer
+                self.history_index -= 1
+                self._set_line(self.history[self.history_index])
+        elif key is Keys.Down:
+            if self.history_index < len(self.history):
+                self.history_index += 1
+                if self.history_index == len(self.history):
+                    self._set_line(self.saved_line)
+                else:
+                    self._set_line(self.history[self.history_index])
+
+
+@contextlib.contextmanager
+def _raw_mode(fd: int):
+    try:
+        saved = termios.tcgetattr(fd)
+    except termios.error:
+        # Not a terminal, e.g. a pipe: nothing to set up.
+        yield False
+        return
+    try:
+        tty.setraw(fd, termios.TCSANOW)
+        # Keep the output side cooked so "\n" still returns the carriage.
+        attributes = termios.tcgetattr(fd)
+        attributes[1] |= termios.OPOST | termios.ONLCR
+        termios.tcsetattr(fd, termios.TCSANOW, attributes)
+        yield True
+    finally:
+        termios.tcsetattr(fd, termios.TCSADRAIN, saved)
+
+
+async def readline_async(
+    prompt: str = "",
+    history=None,
+    stdin=None,
+    stdout=None,
+    highlighter=None,
+    hooks=None,
+) -> str:
+    """Show `prompt` and return the line typed, without the newline.
+
+    Parameters
+    ----------
+    prompt : str, optional
+    history : OrderedHistory or sequence of str, optional
+        Browsed with Up and Down. An
+        :class:`~winreadline.history.OrderedHistory` also gets the line
+        added, unless it is empty.
+    stdin, stdout : file, optional
+        Default to :data:`sys.stdin` and :data:`sys.__stdout__`.
+    highlighter : Highlighter, optional
+        Colours the line as it is typed, e.g. a
+        :class:`~winreadline.highlight.Highlighter`.
+    hooks : HookRegistry, optional
+        Its ``startup`` hooks run before the prompt is shown, and its
+        ``pre_input`` hooks after, before any key is read.
+
+    Raises
+    ------
+    EOFError
+        Ctrl-D on an empty line, or the end of stdin.
+    KeyboardInterrupt
+        Ctrl-C.
+    RuntimeError
+        Another :func:`readline_async` is already waiting.
+    """
+    global _active
+    if _active is not None:
+        raise RuntimeError("readline_async() is already reading a line")
+    stdin = sys.stdin if stdin is None else stdin
+    stdout = sys.__stdout__ if stdout is None else stdout
+    in_fd = stdin.fileno()
+    out_fd = stdout.fileno()
+    if hasattr(history, "snapshot"):
+        entries = history.snapshot()
+    else:
+        entries = [] if history is None else history
+    loop = asyncio.get_event_loop()
+    session = _PromptSession(prompt, out_fd, entries, highlighter)
+    sys.stdout.flush()
+    stdout.flush()
+
+    def on_readable():
+        try:
+            data = os.read(in_fd, 1 << 16)
+        except BlockingIOError:
+            return
+        except OSError as error:
+            if not session.future.done():
+                session.future.set_exception(error)
+            return
+        session.feed(data)
+
+    if hooks is not None:
+        hooks.run("startup")
+    with _raw_mode(in_fd):
+        _active = session
+        loop.add_reader(in_fd, on_readable)
+        try:
+            session.redraw()
+            if hooks is not None:
+                hooks.run("pre_input")
+            line = await session.future
+        finally:
+            loop.remove_reader(in_fd)
+            if session._escape_timer is not None:
+                session._escape_timer.cancel()
+            _active = None
+    if line and hasattr(history, "add_history"):
+        history.add_history(line)
+    return line
+
+
+def print_above(*args, sep: str = " ", end: str = "\n", file=None):
+    """``print`` that keeps a pending :func:`readline_async` prompt intact."""
+    text = sep.join(map(str, args)) + end
+    if _active is None:
+        stream = sys.__stdout__ if file is None else file
+        stream.write(text)
+        stream.flush()
+        return
+    _active.print_above(text)
+
+
+class _PromptAwareStream(io.TextIOBase):
+    """Write complete lines above the prompt, holding back partial ones."""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self._partial = ""
+
+    @property
+    def encoding(self):
+        return self.stream.encoding
+
+    def writable(self):
+        return True
+
+    def isatty(self):
+        return self.stream.isatty()
+
+    def fileno(self):
+        return self.stream.fileno()
+
+    def write(self, text: str) -> int:
+        complete, newline, self._partial = (self._partial + text).rpartition("\n")
+        if newline:
+            self._emit(complete + newline)
+        return len(text)
+
+    def flush(self):
+        if self._partial and _active is None:
+            # No prompt to protect: a partial line can go out as is.
+            self._emit(self._partial)
+            self._partial = ""
+        self.stream.flush()
+
+    def _emit(self, text: str):
+        if _active is None:
+            self.stream.write(text)
+            self.stream.flush()
+        else:
+            _active.print_above(text)
+
+
+@contextlib.contextmanager
+def patch_stdout():
+    """Route ``print`` and :data:`sys.stdout` writes above the prompt."""
+    original = sys.stdout
+    proxy = _PromptAwareStream(original)
+    sys.stdout = proxy
+    try:
+        yield proxy
+    finally:
+        sys.stdout = original
+        if proxy._partial:
+            original.write(proxy._partial)
+        original.flush()
@@ -0,0 +1,311 @@
+# -*- coding: utf-8 -*-
+"""Clipboard access and the ``IPython_paste`` conversion of pasted tables.
+
+Spreadsheet cells copied to the clipboard arrive as tab separated lines.
+With ``IPython_paste`` enabled they are pasted as a list of lists, or as a
+NumPy ``array(...)`` when every cell is numeric.
+
+Parsing a 100k row paste one cell at a time in Python is slow, so
+:func:`parse_tab_separated` looks at a sample of rows first. If the sample
+is numeric and NumPy is installed, the whole block is converted by
+:func:`numpy.loadtxt` in one call. Otherwise the rows are produced by a
+generator that converts one row at a time.
+
+Where the clipboard comes from is pluggable. :func:`set_provider` accepts
+any :class:`ClipboardProvider`; tests use :class:`FakeClipboard`.
+
+"""
+import io
+import re
+import shutil
+import subprocess
+from typing import Iterator, List, Optional, Sequence, Union
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+try:
+    import win32clipboard
+except ImportError:
+    win32clipboard = None
+
+__all__ = [
+    "ClipboardProvider",
+    "CommandClipboard",
+    "FakeClipboard",
+    "Win32Clipboard",
+    "get_clipboard_text_and_convert",
+    "get_provider",
+    "iter_rows",
+    "parse_tab_separated",
+    "set_provider",
+]
+
+_INTEGER = re.compile(r"[-+]?\d+\Z")
+_FLOAT = re.compile(r"[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?\Z")
+
+#: Rows examined to decide whether a paste is numeric.
+SAMPLE_ROWS = 64
+
+
+class ClipboardProvider(object):
+    """Where pasted text comes from and copied text goes."""
+
+    @classmethod
+    def available(cls) -> bool:
+        """Whether the provider can work on this machine."""
+        return False
+
+    def get_text(self) -> str:
+        raise NotImplementedError
+
+    def set_text(self, text: str):
+        raise NotImplementedError
+
+    def __repr__(self):
+        return "<%s>" % self.__class__.__name__
+
+
+class FakeClipboard(ClipboardProvider):
+    """An in memory clipboard."""
+
+    def __init__(self, text: str = ""):
+        self.text = text
+
+    @classmethod
+    def available(cls) -> bool:
+        return True
+
+    def get_text(self) -> str:
+        return self.text
+
+    def set_text(self, text: str):
+        self.text = text
+
+
+class Win32Clipboard(ClipboardProvider):
+    """The Windows clipboard through pywin32."""
+
+    @classmethod
+    def available(cls) -> bool:
+        return win32clipboard is not None
+
+    def get_text(self) -> str:
+        win32clipboard.OpenClipboard()
+        try:
+            if not win32clipboard.IsClipboardFormatAvailable(
+                win32clipboard.CF_UNICODETEXT
+            ):
+                return ""
+            return win32clipboard.GetClipboardData(win32clipboard.CF_UNICODETEXT)
+        finally:
+            win32clipboard.CloseClipboard()
+
+    def set_text(self, text: str):
+        win32clipboard.OpenClipboard()
+        try:
+            win32clipboard.EmptyClipboard()
+            win32clipboard.SetClipboardData(win32clipboard.CF_UNICODETEXT, text)
+        finally:
+            win32clipboard.CloseClipboard()
+
+
+class CommandClipboard(ClipboardProvider):
+    """A clipboard behind a pair of command line tools.
+
+    Parameters
+    ----------
+    paste : list of str
+        Command printing the clipboard, e.g. ``["xclip", "-o"]``.
+    copy : list of str
+        Command reading the new clipboard contents from stdin.
+    """
+
+    #: Tried in order by :meth:`detect`.
+    COMMANDS = (
+        (["wl-paste", "--no-newline"], ["wl-copy"]),
+        (["xclip", "-selection", "clipboard", "-o"], ["xclip", "-selection", "clipboard", "-i"]),
+        (["xsel", "--clipboard", "--output"], ["xsel", "--clipboard", "--input"]),
+        (["pbpaste"], ["pbcopy"]),
+    )
+
+    def __init__(self, paste: Sequence[str], copy: Sequence[str]):
+        self.paste = list(paste)
+        self.copy = list(copy)
+
+    def __repr__(self):
+        return "<%s: %s>" % (self.__class__.__name__, self.paste[0])
+
+    @classmethod
+    def available(cls) -> bool:
+        return cls.detect() is not None
+
+    @classmethod
+    def detect(cls) -> Optional["CommandClipboard"]:
+        for paste, copy in cls.COMMANDS:
+            if shutil.which(paste[0]) is not None:
+                return cls(paste, copy)
+        return None
+
+    def get_text(self) -> str:
+        return subprocess.run(
+            self.paste, stdout=subprocess.PIPE, check=True
+        ).stdout.decode("utf-8", "replace")
+
+    def set_text(self, text: str):
+        subprocess.run(self.copy, input=text.encode("utf-8"), check=True)
+
+
+_provider = None  # type: Optional[ClipboardProvider]
+
+
+def set_provider(provider: Optional[ClipboardProvider]):
+    """Use `provider` from now on. None goes back to autodetection."""
+    global _provider
+    _provider = provider
+
+
+def get_provider() -> ClipboardProvider:
+    """The provider set with :func:`set_provider`, or the first available."""
+    global _provider
+    if _provider is None:
+        if Win32Clipboard.available():
+            _provider = Win32Clipboard()
+        else:
+            _provider = CommandClipboard.detect()
+        if _provider is None:
+            raise OSError("No clipboard available. Install xclip, xsel or wl-clipboard.")
+    return _provider
+
+
+def _make_num(cell: str) -> Union[int, float, complex, str]:
+    try:
+        return int(cell)
+    except ValueError:
+        try:
+            return float(cell)
+        except ValueError:
+            try:
+                return complex(cell)
+            except ValueError:
+                return cell
+
+
+def _lines(text: str) -> Iterator[str]:
+    """Yield non empty lines without building a list of all of them."""
+    start = 0
+    end = len(text)
+    while start < end:
+        stop = text.find("\n", start)
+        if stop == -1:
+            stop = end
+        line = text[start:stop].rstrip("\r")
+        if line:
+            yield line
+        start = stop + 1
+
+
+def iter_rows(text: str) -> Iterator[List[Union[int, float, complex, str]]]:
+    """Yield each tab separated row with numeric cells converted."""
+    for line in _lines(text):
+        yield [_make_num(cell) for cell in line.split("\t")]
+
+
+def _numeric_kind(text: str, sample_rows: int) -> Optional[str]:
+    """``'int'``, ``'float'`` or None judging by the first rows."""
+    kind = "int"
+    columns = None
+    for count, line in enumerate(_lines(text)):
+        if count >= sample_rows:
+            break
+        cells = line.split("\t")
+        if columns is None:
+            columns = len(cells)
+        elif len(cells) != columns:
+            return None
+        for cell in cells:
+            if _INTEGER.match(cell):
+                continue
+            if not _FLOAT.match(cell):
+                return None
+            kind = "float"
+    return None if columns is None else kind
+
+
+def parse_tab_separated(text: str, sample_rows: int = SAMPLE_ROWS):
+    """Turn pasted tab separated text into rows.
+
+    Returns
+    -------
+    numpy.ndarray or list of lists
+        A two dimensional array if NumPy is installed and every cell is
+        numeric, a list of rows otherwise.
+    """
+    kind = None if numpy is None else _numeric_kind(text, sample_rows)
+    if kind is not None:
+        try:
+            return numpy.loadtxt(
+                io.StringIO(text),
+                delimiter="\t",
+                dtype=numpy.int64 if kind == "int" else float,
+                ndmin=2,
+            )
+        except (ValueError, OverflowError):
+            # A row past the sample wasn't numeric after all, or too large.
+            pass
+    return list(iter_rows(text))
+
+
+def _is_numeric(rows: Sequence[Sequence[object]]) -> bool:
+    """Whether `rows` make a two dimensional array of ints and floats."""
+    if not rows:
+        return False
+    columns = len(rows[0])
+    return all(
+        len(row) == columns and all(type(cell) in (int, float) for cell in row)
+        for row in rows
+    )
+
+
+def _source(values) -> str:
+    """Python source for what :func:`parse_tab_separated` returned.
+
+    ``array([[...]])`` if every cell is an int or a float, a list of lists
+    otherwise. Cells are written with their ``repr``, so ``007`` becomes
+    ``7`` and a string keeps its spaces.
+    """
+    if numpy is not None and isinstance(values, numpy.ndarray):
+        rows = values.tolist()
+        numeric = True
+    else:
+        rows = values
+        numeric = _is_numeric(rows)
+        if numeric and any(type(cell) is float for row in rows for cell in row):
+            # Like the array loadtxt makes: one float makes every cell a float.
+            rows = [[float(cell) for cell in row] for row in rows]
+    source = "[%s]" % ",".join("[%s]" % ",".join(map(repr, row)) for row in rows)
+    return "array(%s)" % source if numeric else source
+
+
+def get_clipboard_text_and_convert(
+    paste_list: bool = False, provider: Optional[ClipboardProvider] = None
+) -> str:
+    """Return the clipboard as text to insert into the line buffer.
+
+    Parameters
+    ----------
+    paste_list : bool, optional
+        The ``IPython_paste`` option. Tab separated text becomes the source
+        of an ``array(...)`` if numeric and of a list of lists otherwise.
+        The result is the same whether or not NumPy is installed.
+    provider : ClipboardProvider, optional
+        Defaults to :func:`get_provider`.
+    """
+    if provider is None:
+        provider = get_provider()
+    text = provider.get_text()
+    if not text or not paste_list or "\t" not in text:
+        return text
+    return _source(parse_tab_separated(text))
@@ -0,0 +1,271 @@
+# -*- coding: utf-8 -*-
+"""History entries packed into one buffer.
+
+A list of a million short commands spends most of its memory on the 50 odd
+bytes of header of every ``str``. :class:`CompactHistory` keeps the UTF-8
+bytes of all entries back to back in one ``bytearray`` and where each one
+ends in an ``array('Q')``, about 8 bytes of overhead per entry. Entries are
+decoded when they are accessed.
+
+Substring searches don't decode anything: the query is encoded once and
+looked for in the whole buffer with ``bytearray.find``, and every hit is
+mapped back to its entry by bisecting the offsets.
+
+Usage::
+
+    from winreadline.compact import CompactHistory
+    from winreadline.history import OrderedHistory
+    history = OrderedHistory(history=CompactHistory())
+
+"""
+import bisect
+import collections.abc
+from array import array
+from typing import Iterable, Iterator, Optional
+
+__all__ = [
+    "CompactHistory",
+]
+
+
+class CompactHistory(collections.abc.MutableSequence):
+    """A mutable sequence of str stored as one UTF-8 buffer.
+
+    Appending is amortized O(1). Replacing, inserting or deleting anywhere
+    but at the end moves every later entry, like it would in a list.
+
+    Parameters
+    ----------
+    entries : iterable of str, optional
+    encoding : str, optional
+    errors : str, optional
+        The default, ``'surrogateescape'``, round trips lines read from a
+        file that wasn't valid UTF-8.
+
+    Attributes
+    ----------
+    blob : bytearray
+        Every entry's bytes, back to back.
+    offsets : array.array
+        ``offsets[i]`` and ``offsets[i + 1]`` delimit entry `i` in `blob`.
+    """
+
+    def __init__(
+        self,
+        entries: Iterable[str] = (),
+        encoding: str = "utf-8",
+        errors: str = "surrogateescape",
+    ):
+        self.encoding = encoding
+        self.errors = errors
+        self.blob = bytearray()
+        self.offsets = array("Q", [0])
+        self.extend(entries)
+
+    def __repr__(self):
+        return "<%s: %d entries, %d bytes>" % (
+            self.__class__.__name__, len(self), self.nbytes)
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes used by the buffer and the offsets."""
+        return len(self.blob) + self.offsets.itemsize * len(self.offsets)
+
+    def _encode(self, line: str) -> bytes:
+        return line.encode(self.encoding, self.errors)
+
+    def _decode(self, data) -> str:
+        return data.decode(self.encoding, self.errors)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def _index(self, index: int) -> int:
+        length = len(self.offsets) - 1
+        if index < 0:
+            index += length
+        if not 0 <= index < length:
+            raise IndexError("history index out of range")
+        return index
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        index = self._index(index)
+        offsets = self.offsets
+        return self._decode(self.blob[offsets[index]:offsets[index + 1]])
+
+    def __iter__(self) -> Iterator[str]:
+        blob = self.blob
+        offsets = self.offsets
+        decode = self._decode
+        for index in range(len(offsets) - 1):
+            yield decode(blob[offsets[index]:offsets[index + 1]])
+
+    def _replace(self, start: int, stop: int, lines: Iterable[str]):
+        """Replace entries `start` to `stop` by `lines`."""
+        encoded = [self._encode(line) for line in lines]
+        offsets = self.offsets
+        begin = offsets[start]
+        end = offsets[stop]
+        self.blob[begin:end] = b"".join(encoded)
+        shift = sum(map(len, encoded)) - (end - begin)
+        added = array("Q")
+        position = begin
+        for data in encoded:
+            position += len(data)
+            added.append(position)
+        offsets[start + 1:] = added + array(
+            "Q", [offset + shift for offset in offsets[stop + 1:]]
+        )
+
+    def _range(self, index: slice):
+        start, stop, step = index.indices(len(self))
+        if step != 1:
+            return None
+        return start, max(start, stop)
+
+    def __setitem__(self, index, value):
+        if isinstance(index, slice):
+            bounds = self._range(index)
+            if bounds is None:
+                # Extended slices: rare enough to go through a list.
+                entries = list(self)
+                entries[index] = value
+                self._replace(0, len(self), entries)
+            else:
+                self._replace(bounds[0], bounds[1], value)
+            return
+        index = self._index(index)
+        self._replace(index, index + 1, [value])
+
+    def __delitem__(self, index):
+        if isinstance(index, slice):
+            bounds = self._range(index)
+            if bounds is None:
+                entries = list(self)
+                del entries[index]
+                self._replace(0, len(self), entries)
+            else:
+                self._replace(bounds[0], bounds[1], ())
+            return
+        index = self._index(index)
+        self._replace(index, index + 1, ())
+
+    def insert(self, index: int, value: str):
+        length = len(self)
+        if index < 0:
+            index = max(0, index + length)
+        index = min(index, length)
+        if index == length:
+            self.append(value)
+        else:
+            self._replace(index, index, [value])
+
+    def append(self, value: str):
+        self.blob += self._encode(value)
+        self.offsets.append(len(self.blob))
+
+    def extend(self, values: Iterable[str]):
+        blob = self.blob
+        offsets = self.offsets
+        encode = self._encode
+        for value in values:
+            blob += encode(value)
+            offsets.append(len(blob))
+
+    def pop(self, index: int = -1) -> str:
+        index = self._index(index)
+        value = self[index]
+        if index == len(self) - 1:
+            del self.blob[self.offsets[index]:]
+            self.offsets.pop()
+        else:
+            self._replace(index, index + 1, ())
+        return value
+
+    def clear(self):
+        self.blob = bytearray()
+        self.offsets = array("Q", [0])
+
+    def copy(self) -> "CompactHistory":
+        other = self.__class__.__new__(self.__class__)
+        other.encoding = self.encoding
+        other.errors = self.errors
+        other.blob = bytearray(self.blob)
+        other.offsets = array("Q", self.offsets)
+        return other
+
+    def __contains__(self, value) -> bool:
+        if not isinstance(value, str):
+            return False
+        return self.find_entry(value) != -1
+
+    def find_entry(self, value: str) -> int:
+        """Index of the first entry equal to `value`, -1 if there is none."""
+        needle = self._encode(value)
+        offsets = self.offsets
+        for index in self.search(value, reverse=False):
+            if offsets[index + 1] - offsets[index] == len(needle):
+                return index
+        return -1
+
+    def search(
+        self,
+        query: str,
+        start: Optional[int] = None,
+        reverse: bool = True,
+    ) -> Iterator[int]:
+        """Yield the index of every entry containing `query`.
+
+        Parameters
+        ----------
+        query : str
+        start : int, optional
+            First entry looked at. Defaults to the last entry when searching
+            backwards and to the first one otherwise.
+        reverse : bool, optional
+            Newest entries first.
+        """
+        needle = self._encode(query)
+        size = len(needle)
+        blob = self.blob
+        offsets = self.offsets
+        length = len(offsets) - 1
+        if reverse:
+            start = length - 1 if start is None else min(start, length - 1)
+        else:
+            start = 0 if start is None else max(start, 0)
+        if not size:
+            # Every entry contains the empty string.
+            yield from (range(start, -1, -1) if reverse else range(start, length))
+            return
+        if reverse:
+            if start < 0:
+                return
+            end = offsets[start + 1]
+            while True:
+                hit = blob.rfind(needle, 0, end)
+                if hit == -1:
+                    return
+                index = bisect.bisect_right(offsets, hit) - 1
+                if hit + size <= offsets[index + 1]:
+                    yield index
+                    end = offsets[index]
+                else:
+                    # Straddles two entries; look for an earlier start.
+                    end = hit + size - 1
+        else:
+            if start >= length:
+                return
+            position = offsets[start]
+            while True:
+                hit = blob.find(needle, position)
+                if hit == -1:
+                    return
+                index = bisect.bisect_right(offsets, hit) - 1
+                if hit + size <= offsets[index + 1]:
+                    yield index
+                    position = offsets[index + 1]
+                else:
+                    position = hit + 1
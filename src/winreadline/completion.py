@@ -0,0 +1,249 @@
+# -*- coding: utf-8 -*-
+"""Display of completion matches.
+
+When a completer returns tens of thousands of matches, laying all of them
+out in columns before printing anything freezes the terminal. The default
+display here only ever looks at one screenful at a time:
+
+* A page is filled in a single pass over its matches, tracking the widest
+  one seen so far and the number of columns that leaves room for.
+* Each row is written as soon as it is formatted. The full listing is never
+  built as one string.
+* Between pages a ``--More--`` prompt waits for a key: space shows the
+  next page, return one more line, and ``q`` stops. The prompt is erased
+  before anything else is written. A key typed while a page is printing
+  stops the listing.
+
+Like GNU readline, more than `query_items` matches are only listed after
+the user answers yes to ``Display all N possibilities?``.
+
+"""
+import os
+import shutil
+import sys
+from typing import Callable, Optional, Sequence, TextIO, Tuple
+
+from .tracing import traced
+
+__all__ = [
+    "CompletionDisplay",
+    "display_matches",
+    "page_layout",
+]
+
+#: Spaces between columns.
+COLUMN_PADDING = 2
+
+
+if os.name == "nt":
+    import msvcrt
+
+    def _read_key() -> str:
+        return msvcrt.getwch()
+
+    def _key_pressed() -> bool:
+        return msvcrt.kbhit()
+
+else:
+    import select
+    import termios
+    import tty
+
+    def _read_key() -> str:
+        fd = sys.stdin.fileno()
+        try:
+            old = termios.tcgetattr(fd)
+        except termios.error:
+            # Not a terminal: whatever comes next on stdin is the answer.
+            return sys.stdin.read(1)
+        try:
+            tty.setcbreak(fd)
+            return sys.stdin.read(1)
+        finally:
+            termios.tcsetattr(fd, termios.TCSADRAIN, old)
+
+    def _key_pressed() -> bool:
+        try:
+            ready, _, _ = select.select([sys.stdin], [], [], 0)
+        except (OSError, ValueError):
+            return False
+        return bool(ready)
+
+
+def page_layout(
+    matches: Sequence[str], start: int, width: int, rows: int
+) -> Tuple[int, int, int]:
+    """Decide how many matches from `start` fit on one page.
+
+    Walks the matches once, widening the column as longer matches appear
+    and stopping as soon as the page is full.
+
+    Returns
+    -------
+    stop : int
+        Index after the last match on the page.
+    columns : int
+    column_width : int
+        Including padding.
+    """
+    widest = 0
+    index = start
+    end = len(matches)
+    while index < end:
+        candidate = max(widest, len(matches[index]))
+        columns = max(1, (width + COLUMN_PADDING) // (candidate + COLUMN_PADDING))
+        if index - start + 1 > columns * rows:
+            break
+        widest = candidate
+        index += 1
+    columns = max(1, (width + COLUMN_PADDING) // (widest + COLUMN_PADDING))
+    return index, columns, widest + COLUMN_PADDING
+
+
+def _ask(out: TextIO, question: str, read_key: Callable[[], str]) -> bool:
+    out.write(question)
+    out.flush()
+    while True:
+        key = read_key()
+        if key in ("y", "Y", " "):
+            answer = True
+        elif key in ("n", "N", "q", "Q", "\x7f", "\x03", "\x07", ""):
+            answer = False
+        else:
+            continue
+        out.write("\n")
+        return answer
+
+
+def _more(out: TextIO, rows: int, read_key: Callable[[], str]) -> int:
+    """Ask at a ``--More--`` prompt how many rows to show next.
+
+    Space gives a page of `rows`, return a single row, and the keys that
+    decline in :func:`_ask` none. The prompt is erased either way.
+    """
+    out.write("--More--")
+    out.flush()
+    while True:
+        key = read_key()
+        if key in ("y", "Y", " "):
+            answer = rows
+        elif key in ("\r", "\n"):
+            answer = 1
+        elif key in ("n", "N", "q", "Q", "\x7f", "\x03", "\x07", ""):
+            answer = 0
+        else:
+            continue
+        out.write("\r\x1b[K")
+        return answer
+
+
+@traced("completion")
+def display_matches(
+    substitution: str,
+    matches: Sequence[str],
+    longest_match_length: int,
+    out: Optional[TextIO] = None,
+    size: Optional[Tuple[int, int]] = None,
+    query_items: int = 100,
+    read_key: Optional[Callable[[], str]] = None,
+    key_pressed: Optional[Callable[[], bool]] = None,
+) -> int:
+    """List `matches` in columns, one page at a time.
+
+    The first three parameters are those of a completion display hook;
+    `longest_match_length` isn't needed since widths are worked out per page.
+
+    Parameters
+    ----------
+    substitution : str
+    matches : sequence of str
+    longest_match_length : int
+    out : file, optional
+        Defaults to :data:`sys.stdout`.
+    size : (int, int), optional
+        Terminal columns and lines. Asked of the terminal by default.
+    query_items : int, optional
+        Ask before listing more matches than this. Negative never asks.
+    read_key : callable, optional
+        Blocks for one key press and returns it.
+    key_pressed : callable, optional
+        Returns whether a key is waiting, without blocking.
+
+    Returns
+    -------
+    int
+        Number of matches printed.
+    """
+    if out is None:
+        out = sys.stdout
+    if read_key is None:
+        read_key = _read_key
+    if key_pressed is None:
+        key_pressed = _key_pressed
+    if size is None:
+        size = tuple(shutil.get_terminal_size())
+    width, height = size
+    total = len(matches)
+    out.write("\n")
+    if 0 <= query_items < total and not _ask(
+        out, "Display all %d possibilities? (y or n)" % total, read_key
+    ):
+        return 0
+    # One line is kept free for the --More-- prompt.
+    rows = page = max(1, height - 1)
+    shown = printed = 0
+    while shown < total:
+        stop, columns, column_width = page_layout(matches, shown, width, page)
+        count = stop - shown
+        page_rows = -(-count // columns)
+        for row in range(page_rows):
+            cells = []
+            for column in range(columns):
+                index = shown + row + column * page_rows
+                if index >= stop:
+                    break
+                cells.append(matches[index].ljust(column_width))
+            out.write("".join(cells).rstrip() + "\n")
+            printed += len(cells)
+            if key_pressed():
+                # Typeahead means the user has seen enough.
+                out.flush()
+                return printed
+        shown = stop
+        if shown < total:
+            page = _more(out, rows, read_key)
+            if not page:
+                break
+    out.flush()
+    return printed
+
+
+class CompletionDisplay(object):
+    """Shows completion matches through a hook or :func:`display_matches`.
+
+    Attributes
+    ----------
+    hook : callable or None
+        Called as ``hook(substitution, matches, longest_match_length)``.
+    """
+
+    def __init__(self):
+        self.hook = None
+
+    def __repr__(self):
+        return "<%s: hook=%r>" % (self.__class__.__name__, self.hook)
+
+    def set_completion_display_matches_hook(self, function=None):
+        """Set or remove the completion display function."""
+        if function is not None and not callable(function):
+            raise TypeError(
+                "set_completion_display_matches_hook(func): func must be callable"
+            )
+        self.hook = function
+
+    def __call__(
+        self, substitution: str, matches: Sequence[str], longest_match_length: int
+    ):
+        if self.hook is not None:
+            return self.hook(substitution, matches, longest_match_length)
+        return display_matches(substitution, matches, longest_match_length)
@@ -0,0 +1,606 @@
+# -*- coding: utf-8 -*-
+"""Share one history between every session on a machine.
+
+Instead of each REPL loading, indexing and holding its own copy of the
+history, a single daemon owns it and sessions talk to it over a Unix domain
+socket. Sessions start without reading the history file and see each
+other's commands as soon as they are entered.
+
+Protocol
+--------
+Every message is a 4 byte big endian length followed by that many bytes of
+UTF-8 encoded JSON. Requests are objects with an ``"op"`` key:
+
+``{"op": "add", "line": str}``
+    Append a line, skipping empty lines and repeats of the last line.
+``{"op": "get", "index": int}`` or ``{"op": "get", "start": int, "stop": int}``
+    One entry, or a list of entries, indexed like a Python list.
+``{"op": "search", "query": str, "limit": int, "prefix": bool}``
+    Up to `limit` entries containing (or starting with) `query`, newest
+    first. Prefix searches return unique entries.
+``{"op": "len"}``
+    Number of entries.
+
+Replies are ``{"ok": true, "result": ...}`` or ``{"ok": false, "error": str}``
+and come back in request order, so clients may send several requests
+before reading any reply.
+
+Usage::
+
+    from winreadline.daemon import RemoteHistory
+    history = RemoteHistory.connect()  # starts the daemon if needed
+    history.append("import this")
+
+The daemon can also be started by hand::
+
+    python -m winreadline.daemon --socket /tmp/history.sock
+
+"""
+import argparse
+import collections
+import io
+import json
+import logging
+import os
+import socket
+import socketserver
+import stat
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from .histfile import atomic_open, iter_history_records, write_history_records
+from .suggest import PrefixIndex
+
+__all__ = [
+    "HistoryClient",
+    "HistoryDaemon",
+    "ProtocolError",
+    "RemoteHistory",
+    "default_socket_path",
+]
+
+logger = logging.getLogger(name=__name__)
+
+_HEADER = struct.Struct("!I")
+
+#: Largest message either side accepts.
+MAX_MESSAGE = 16 << 20
+
+
+class ProtocolError(Exception):
+    """A malformed message, or an error reported by the daemon."""
+
+
+def _private_directory(directory: str) -> str:
+    """Create `directory` for this user alone, or check that it is.
+
+    Raises
+    ------
+    PermissionError
+        If it exists but isn't a directory owned by this user, closed to
+        everyone else. Anyone could have created it in a shared directory.
+    """
+    try:
+        os.mkdir(directory, 0o700)
+    except FileExistsError:
+        pass
+    info = os.lstat(directory)
+    if (
+        not stat.S_ISDIR(info.st_mode)
+        or info.st_uid != os.getuid()
+        or info.st_mode & 0o077
+    ):
+        raise PermissionError(
+            "%s must be a directory owned by and only open to uid %d"
+            % (directory, os.getuid())
+        )
+    return directory
+
+
+def default_socket_path() -> str:
+    """A per user socket in ``$XDG_RUNTIME_DIR`` or the temp directory.
+
+    ``$XDG_RUNTIME_DIR`` is private to the user already. In the shared temp
+    directory the socket goes in a ``winreadline-<uid>`` directory that
+    only the user can enter, created if need be.
+    """
+    runtime = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime:
+        return os.path.join(runtime, "winreadline-%d.sock" % os.getuid())
+    directory = os.path.join(tempfile.gettempdir(), "winreadline-%d" % os.getuid())
+    return os.path.join(_private_directory(directory), "history.sock")
+
+
+#: struct xucred of BSD and macOS: version, uid, group count, groups.
+_XUCRED = struct.Struct("IIh16I")
+
+
+def _peer_uid(sock: socket.socket, path: str) -> int:
+    """The user id of the process at the other end of a Unix socket."""
+    if hasattr(socket, "SO_PEERCRED"):
+        pid_uid_gid = struct.Struct("3i")
+        credentials = sock.getsockopt(
+            socket.SOL_SOCKET, socket.SO_PEERCRED, pid_uid_gid.size)
+        return pid_uid_gid.unpack(credentials)[1]
+    if hasattr(socket, "LOCAL_PEERCRED"):
+        credentials = sock.getsockopt(0, socket.LOCAL_PEERCRED, _XUCRED.size)
+        return _XUCRED.unpack(credentials)[1]
+    # No way to ask the kernel: trust whoever owns the socket file.
+    return os.stat(path).st_uid
+
+
+def _send(sock: socket.socket, message: Dict[str, Any]):
+    payload = json.dumps(message, separators=(",", ":")).encode("utf-8")
+    sock.sendall(_HEADER.pack(len(payload)) + payload)
+
+
+def _recv_exactly(stream, size: int) -> bytes:
+    data = stream.read(size)
+    if len(data) != size:
+        raise EOFError("connection closed mid message")
+    return data
+
+
+def _recv(stream) -> Optional[Dict[str, Any]]:
+    """Read one message from a buffered binary stream. None at EOF."""
+    header = stream.read(_HEADER.size)
+    if not header:
+        return None
+    if len(header) != _HEADER.size:
+        raise EOFError("connection closed mid message")
+    (size,) = _HEADER.unpack(header)
+    if size > MAX_MESSAGE:
+        raise ProtocolError("message of %d bytes exceeds the limit" % size)
+    return json.loads(_recv_exactly(stream, size).decode("utf-8"))
+
+
+class _Store(object):
+    """The daemon's history and its prefix index."""
+
+    def __init__(
+        self,
+        filename: Optional[str] = None,
+        timestamps: bool = False,
+        history_length: Optional[int] = 100,
+    ):
+        self.filename = filename
+        self.timestamps = timestamps
+        self.history_length = history_length
+        self.lock = threading.Lock()
+        self.entries = []  # type: List[str]
+        # The newest records of the file, kept to rewrite it once it grows
+        # past `history_length`, and how many records it holds.
+        self._tail = None  # type: Optional[collections.deque]
+        if history_length is not None and history_length >= 0:
+            self._tail = collections.deque(maxlen=history_length)
+        self._written = 0
+        if filename is not None and os.path.exists(filename):
+            for timestamp, line in iter_history_records(filename):
+                self._written += 1
+                if self._tail is not None:
+                    self._tail.append((timestamp, line))
+                if not self.entries or self.entries[-1] != line:
+                    self.entries.append(line)
+        self.index = PrefixIndex(self.entries)
+
+    def add(self, line: str) -> bool:
+        with self.lock:
+            if not line or (self.entries and self.entries[-1] == line):
+                return False
+            self.entries.append(line)
+            self.index.add(line)
+            if self.filename is not None:
+                self._save((time.time() if self.timestamps else None, line))
+        return True
+
+    def _save(self, record: Tuple[Optional[float], str]):
+        """Append `record` to the file, truncating it to `history_length`."""
+        self._written += 1
+        if self._tail is not None:
+            self._tail.append(record)
+            if self._written > self.history_length:
+                # Replaced whole, as OrderedHistory.write_history_file does.
+                with atomic_open(self.filename) as fp:
+                    self._written = write_history_records(fp, self._tail)
+                return
+        with io.open(self.filename, "ab") as fp:
+            write_history_records(fp, [record])
+
+    def get(self, request: Dict[str, Any]):
+        if "index" in request:
+            return self.entries[request["index"]]
+        return self.entries[request.get("start"):request.get("stop")]
+
+    def search(self, query: str, limit: int = 50, prefix: bool = False):
+        if prefix:
+            with self.lock:
+                lo, hi = self.index.prefix_range(query)
+                recent = self.index.recent
+                found = sorted(self.index.keys[lo:hi], key=recent.__getitem__)
+            return found[::-1][:limit]
+        found = []
+        entries = self.entries
+        for index in range(len(entries) - 1, -1, -1):
+            if query in entries[index]:
+                found.append(entries[index])
+                if len(found) >= limit:
+                    break
+        return found
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        store = self.server.store
+        while True:
+            try:
+                request = _recv(self.rfile)
+            except (EOFError, ProtocolError, ValueError) as error:
+                logger.warning("Dropping client: %s", error)
+                return
+            if request is None:
+                return
+            try:
+                reply = {"ok": True, "result": self.dispatch(store, request)}
+            except Exception as error:  # reported to the client
+                reply = {"ok": False, "error": "%s: %s" % (type(error).__name__, error)}
+            _send(self.connection, reply)
+
+    @staticmethod
+    def dispatch(store: _Store, request: Dict[str, Any]):
+        op = request.get("op")
+        if op == "add":
+            return store.add(request["line"])
+        if op == "get":
+            return store.get(request)
+        if op == "search":
+            return store.search(
+                request["query"],
+                limit=request.get("limit", 50),
+                prefix=request.get("prefix", False),
+            )
+        if op == "len":
+            return len(store.entries)
+        raise ProtocolError("unknown op %r" % op)
+
+
+class HistoryDaemon(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Serve one history to every client of a Unix socket.
+
+    Parameters
+    ----------
+    path : str
+        Socket to listen on. A stale socket left by a dead daemon is
+        replaced.
+    filename : str, optional
+        History file loaded at startup. Every added line is appended to it
+        right away.
+    timestamps : bool, optional
+        Write a bash style ``#<epoch>`` line before each appended line.
+        Off by default: the standard library's readline, which reads
+        ``~/.python_history`` too, would show them as entries.
+    history_length : int, optional
+        Most entries kept in the file, which is cut down to the newest
+        ones once it grows past it. None or a negative length keeps them
+        all. The daemon itself keeps every entry.
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        path: str,
+        filename: Optional[str] = None,
+        timestamps: bool = False,
+        history_length: Optional[int] = 100,
+    ):
+        self.path = path
+        self.store = _Store(filename, timestamps, history_length)
+        if os.path.exists(path):
+            try:
+                with socket.socket(socket.AF_UNIX) as probe:
+                    probe.connect(path)
+            except OSError:
+                os.remove(path)
+            else:
+                raise OSError("A history daemon is already listening on %s" % path)
+        # Created without permissions for anyone else, rather than
+        # changed after it is already accepting connections.
+        umask = os.umask(0o177)
+        try:
+            socketserver.UnixStreamServer.__init__(self, path, _Handler)
+        finally:
+            os.umask(umask)
+
+    def __repr__(self):
+        return "<%s: %s>" % (self.__class__.__name__, self.path)
+
+    def server_close(self):
+        socketserver.UnixStreamServer.server_close(self)
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class HistoryClient(object):
+    """A connection to a :class:`HistoryDaemon`.
+
+    Requests can be pipelined: :meth:`send` queues a request without
+    waiting, :meth:`call` waits for its own reply after collecting the
+    replies to everything sent before it.
+
+    Raises
+    ------
+    PermissionError
+        If the daemon runs as another user, who would see every command.
+    """
+
+    def __init__(self, path: Optional[str] = None, timeout: float = 5.0):
+        self.path = default_socket_path() if path is None else path
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            self.sock.settimeout(timeout)
+            self.sock.connect(self.path)
+            uid = _peer_uid(self.sock, self.path)
+            if uid != os.getuid():
+                raise PermissionError(
+                    "The history daemon on %s runs as uid %d, not %d"
+                    % (self.path, uid, os.getuid())
+                )
+        except BaseException:
+            self.sock.close()
+            raise
+        self.rfile = self.sock.makefile("rb")
+        self._pending = collections.deque()
+
+    def __repr__(self):
+        return "<%s: %s>" % (self.__class__.__name__, self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            self.rfile.close()
+            self.sock.close()
+
+    def send(self, op: str, **arguments):
+        """Queue a request whose reply only needs checking for errors."""
+        arguments["op"] = op
+        _send(self.sock, arguments)
+        self._pending.append(op)
+
+    def _reply(self):
+        reply = _recv(self.rfile)
+        if reply is None:
+            raise EOFError("history daemon closed the connection")
+        if not reply.get("ok"):
+            raise ProtocolError(reply.get("error"))
+        return reply.get("result")
+
+    def flush(self):
+        """Wait for the replies to every queued request."""
+        while self._pending:
+            self._pending.popleft()
+            self._reply()
+
+    def call(self, op: str, **arguments):
+        """Send a request and return its result."""
+        arguments["op"] = op
+        _send(self.sock, arguments)
+        self.flush()
+        return self._reply()
+
+    def call_many(self, requests: List[Dict[str, Any]]) -> List[Any]:
+        """Send every request before reading any reply."""
+        for request in requests:
+            _send(self.sock, request)
+        self.flush()
+        return [self._reply() for _ in requests]
+
+
+def spawn_daemon(path: str, filename: Optional[str] = None) -> subprocess.Popen:
+    """Start ``python -m winreadline.daemon`` detached from this session.
+
+    The child imports winreadline from wherever this process does. Its
+    standard error goes to an unnamed temporary file, left as the
+    ``stderr`` of the returned process for reporting an early exit.
+    """
+    command = [sys.executable, "-m", "winreadline.daemon", "--socket", path]
+    if filename is not None:
+        command += ["--history-file", filename]
+    environment = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+    errors = tempfile.TemporaryFile()
+    try:
+        with open(os.devnull, "r+b") as devnull:
+            process = subprocess.Popen(
+                command,
+                stdin=devnull,
+                stdout=devnull,
+                stderr=errors,
+                env=environment,
+                start_new_session=True,
+                close_fds=True,
+            )
+    except BaseException:
+        errors.close()
+        raise
+    process.stderr = errors
+    return process
+
+
+def _exit_error(process: subprocess.Popen) -> OSError:
+    """The error to raise for a daemon that exited before listening."""
+    process.stderr.seek(0)
+    output = process.stderr.read().decode(errors="replace").strip()
+    process.stderr.close()
+    message = "The history daemon exited with status %d" % process.returncode
+    if output:
+        message += ":\n" + output
+    return OSError(message)
+
+
+class RemoteHistory(collections.abc.MutableSequence):
+    """Client side history backend served by a :class:`HistoryDaemon`.
+
+    Can be passed as the `history` of
+    :class:`~winreadline.history.OrderedHistory`. Appends are pipelined;
+    they are only waited for by the next read. Iterating fetches
+    :attr:`chunk_size` entries per request. Entries can't be changed or
+    removed through it.
+    """
+
+    #: The daemon skips repeats of the last line, and loads and saves the
+    #: history file itself, so OrderedHistory leaves both to it.
+    shared = True
+    #: Entries fetched per request while iterating.
+    chunk_size = 10000
+
+    def __init__(self, client: HistoryClient):
+        self.client = client
+
+    @classmethod
+    def connect(
+        cls,
+        path: Optional[str] = None,
+        filename: Optional[str] = None,
+        spawn: bool = True,
+        timeout: float = 5.0,
+    ) -> "RemoteHistory":
+        """Connect to the daemon at `path`, starting it first if needed.
+
+        Parameters
+        ----------
+        path : str, optional
+            Defaults to :func:`default_socket_path`.
+        filename : str, optional
+            History file for a daemon started here. Defaults to
+            ``~/.python_history``.
+        spawn : bool, optional
+        timeout : float, optional
+            Seconds to wait for a freshly started daemon.
+        """
+        if path is None:
+            path = default_socket_path()
+        try:
+            return cls(HistoryClient(path))
+        except (FileNotFoundError, ConnectionRefusedError):
+            if not spawn:
+                raise
+        if filename is None:
+            filename = os.path.expanduser("~/.python_history")
+        process = spawn_daemon(path, filename)
+        deadline = time.monotonic() + timeout
+        delay = 0.005
+        while True:
+            try:
+                client = HistoryClient(path)
+            except (FileNotFoundError, ConnectionRefusedError):
+                if process.poll() is not None:
+                    raise _exit_error(process)
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(delay)
+                delay = min(delay * 2, 0.2)
+            else:
+                process.stderr.close()
+                return cls(client)
+
+    def __repr__(self):
+        return "<%s: %s>" % (self.__class__.__name__, self.client.path)
+
+    def __len__(self):
+        return self.client.call("len")
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            if index.step not in (None, 1):
+                return self.client.call("get", start=None, stop=None)[index]
+            return self.client.call("get", start=index.start, stop=index.stop)
+        try:
+            return self.client.call("get", index=index)
+        except ProtocolError as error:
+            if str(error).startswith("IndexError"):
+                raise IndexError(index)
+            raise
+
+    def __iter__(self):
+        return self.iter_range()
+
+    def iter_range(self, start: int = 0, stop: Optional[int] = None) -> Iterator[str]:
+        """Yield the entries from `start` to `stop`, in chunks.
+
+        Both are non negative. `stop` defaults to the current length.
+        """
+        if stop is None:
+            stop = len(self)
+        for chunk in range(start, stop, self.chunk_size):
+            yield from self.client.call(
+                "get", start=chunk, stop=min(chunk + self.chunk_size, stop))
+
+    def __setitem__(self, index, value):
+        raise TypeError("Entries of a remote history are read only.")
+
+    def __delitem__(self, index):
+        raise TypeError("Entries of a remote history are read only.")
+
+    def insert(self, index, value):
+        if index != len(self):
+            raise TypeError("A remote history can only be appended to.")
+        self.append(value)
+
+    def append(self, value):
+        self.client.send("add", line=value)
+
+    def extend(self, values):
+        for value in values:
+            self.append(value)
+
+    def search(self, query: str, limit: int = 50, prefix: bool = False) -> List[str]:
+        """Entries matching `query`, newest first. See the module docs."""
+        return self.client.call("search", query=query, limit=limit, prefix=prefix)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m winreadline.daemon",
+        description="Serve one readline history to every local session.",
+    )
+    parser.add_argument("--socket", default=default_socket_path())
+    parser.add_argument(
+        "--history-file", default=os.path.expanduser("~/.python_history")
+    )
+    parser.add_argument(
+        "--timestamps",
+        action="store_true",
+        help="Write #<epoch> lines to the history file, as bash does.",
+    )
+    parser.add_argument(
+        "--history-length",
+        type=int,
+        default=100,
+        help="Most entries kept in the history file; negative keeps all.",
+    )
+    args = parser.parse_args(argv)
+    server = HistoryDaemon(
+        args.socket, args.history_file, args.timestamps, args.history_length
+    )
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
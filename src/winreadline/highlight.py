@@ -0,0 +1,316 @@
+# -*- coding: utf-8 -*-
+"""Incremental Python syntax highlighting of the line being edited.
+
+Running :mod:`tokenize` over a pasted multi-kilobyte line after every key
+press is too slow, and it gives up on the incomplete code found in a line
+being typed. :class:`Highlighter` uses a forgiving regular expression
+lexer and keeps the tokens it found last time:
+
+1. The first character that changed is found by comparing the new text
+   with the old one.
+2. Lexing restarts at the last token before that character that the edit
+   can't have changed. Tokens before it are kept as they are.
+3. Once past the edited region, lexing stops as soon as a token has the
+   same kind and extent as a cached one. The remaining tokens are reused,
+   shifted by the change in length.
+
+Typing in the middle of a long line therefore costs a few tokens, not the
+whole line. An update may also spend no more than `budget` seconds. If it
+runs out, the rest of the line is left unstyled until the next update
+finishes it.
+
+:meth:`Highlighter.runs` gives the part of the line on screen as a compact
+list of ``(start, stop, style)`` runs, adjacent tokens of the same style
+merged, and :meth:`Highlighter.render` turns it into text with SGR escape
+codes for the redisplay.
+
+"""
+import bisect
+import builtins
+import keyword
+import re
+import time
+from array import array
+from typing import Dict, List, Optional, Tuple
+
+from .wcwidth import _common_prefix_length
+
+__all__ = [
+    "DEFAULT_STYLES",
+    "STYLES",
+    "Highlighter",
+]
+
+_KINDS = (
+    "text",
+    "whitespace",
+    "comment",
+    "string",
+    "number",
+    "keyword",
+    "builtin",
+    "definition",
+    "name",
+    "operator",
+    "error",
+)
+(TEXT, WHITESPACE, COMMENT, STRING, NUMBER, KEYWORD, BUILTIN, DEFINITION,
+ NAME, OPERATOR, ERROR) = range(len(_KINDS))
+
+# No token depends on more than the character after it, which is what
+# lets an update keep the tokens ending before the change. Half typed
+# numbers and strings are therefore still numbers and strings.
+_TOKEN = re.compile(
+    r"""
+    (?P<whitespace>\s+)
+  | (?P<comment>\#[^\n]*)
+  | (?P<string>
+        (?:[rRbBuUfF]{1,2})?
+        (?: '''[\s\S]*?(?:'''|\Z)
+          | \"\"\"[\s\S]*?(?:\"\"\"|\Z)
+          | '(?:[^'\\\n]|\\(?:[\s\S]|\Z))*(?:'|(?=\n)|\Z)
+          | "(?:[^"\\\n]|\\(?:[\s\S]|\Z))*(?:"|(?=\n)|\Z)
+        )
+    )
+  | (?P<number>
+        0[xX][0-9a-fA-F_]* | 0[oO][0-7_]* | 0[bB][01_]*
+      | (?:\d[\d_]*\.?[\d_]*|\.\d[\d_]*)(?:[eE][-+]?\d*)?[jJ]?
+    )
+  | (?P<name>[^\W\d]\w*)
+  | (?P<operator>
+        ->|:=|\*\*=?|//=?|<<=?|>>=?|[-+*/%&|^@=<>!]=?|[~:;,.()\[\]{}]
+    )
+  | (?P<error>.)
+    """,
+    re.VERBOSE | re.DOTALL,
+)
+_GROUP_KINDS = {
+    "whitespace": WHITESPACE,
+    "comment": COMMENT,
+    "string": STRING,
+    "number": NUMBER,
+    "operator": OPERATOR,
+    "error": ERROR,
+}
+_KEYWORDS = frozenset(keyword.kwlist) | frozenset(getattr(keyword, "softkwlist", ()))
+_BUILTINS = frozenset(dir(builtins))
+
+#: Style names given to each kind of token. Plain tokens have no style.
+STYLES = {
+    COMMENT: "comment",
+    STRING: "string",
+    NUMBER: "number",
+    KEYWORD: "keyword",
+    BUILTIN: "builtin",
+    DEFINITION: "definition",
+    ERROR: "error",
+}
+
+#: SGR escape codes for each style name.
+DEFAULT_STYLES = {
+    "comment": "\x1b[2;37m",
+    "string": "\x1b[32m",
+    "number": "\x1b[36m",
+    "keyword": "\x1b[1;34m",
+    "builtin": "\x1b[35m",
+    "definition": "\x1b[1;33m",
+    "error": "\x1b[31m",
+}
+
+# Kinds sharing a style map to one byte, and whitespace to its own, so
+# that a run is a byte and any repeats of it or whitespace.
+_STYLE_OF_KIND = bytes(
+    kind if kind in STYLES or kind == WHITESPACE else TEXT for kind in range(256))
+_RUN = re.compile(rb"%(w)s*(.)(?:\1|%(w)s)*|%(w)s+" % {b"w": re.escape(bytes([WHITESPACE]))},
+                  re.DOTALL)
+
+# Tokens lexed between two looks at the clock.
+_CHECK_EVERY = 64
+
+Run = Tuple[int, int, Optional[str]]
+
+
+class Highlighter(object):
+    """Tokens of the line buffer, updated incrementally as it is edited.
+
+    Parameters
+    ----------
+    budget : float, optional
+        Seconds an :meth:`update` may spend lexing.
+    styles : dict, optional
+        Style name to SGR code, for :meth:`render`.
+
+    Attributes
+    ----------
+    text : str
+    starts, ends : array.array
+        Extent of every token.
+    kinds : bytearray
+        Kind of every token.
+    complete : bool
+        Whether the last update got to the end of the text in its budget.
+    """
+
+    def __init__(self, budget: float = 0.002, styles: Optional[Dict[str, str]] = None):
+        self.budget = budget
+        self.styles = DEFAULT_STYLES if styles is None else styles
+        self.text = ""
+        self.starts = array("L")
+        self.ends = array("L")
+        self.kinds = bytearray()
+        self.complete = True
+        #: Tokens lexed by the last update, for tests and tuning.
+        self.lexed = 0
+
+    def __repr__(self):
+        return "<%s: %d tokens%s>" % (
+            self.__class__.__name__, len(self.kinds),
+            "" if self.complete else ", incomplete")
+
+    def _restart(self, changed: int) -> int:
+        """Index of the token to lex again from when `changed` changed."""
+        # The token ending right at the change may grow into it. Whether a
+        # name is a definition is read back from the tokens kept before it.
+        return max(0, bisect.bisect_right(self.ends, changed) - 1)
+
+    def update(self, text: str) -> int:
+        """Switch to `text`, lexing again from the first changed token.
+
+        Returns the index from which styles may have changed, for the
+        redisplay to get the :meth:`runs` of what it shows.
+        """
+        old = self.text
+        starts, ends, kinds = self.starts, self.ends, self.kinds
+        if self.complete:
+            changed = _common_prefix_length(old, text)
+            if changed == len(old) == len(text):
+                return changed
+        else:
+            # Pick up after the token the last update stopped at.
+            changed = min(_common_prefix_length(old, text), starts[-1])
+        delta = len(text) - len(old)
+        # Where the edit ends in the new text: past it, the text is old.
+        suffix = _common_prefix_length(old[changed:][::-1], text[changed:][::-1])
+        edit_end = len(text) - suffix
+
+        index = self._restart(changed)
+        position = starts[index] if index < len(starts) else (ends[-1] if ends else 0)
+        restart = position
+        old_starts, old_ends, old_kinds = starts[index:], ends[index:], kinds[index:]
+        del starts[index:], ends[index:], kinds[index:]
+
+        deadline = time.perf_counter() + self.budget
+        previous = self._previous_significant()
+        match = _TOKEN.match
+        lexed = 0
+        complete = True
+        reused = None
+        while position < len(text):
+            if lexed % _CHECK_EVERY == _CHECK_EVERY - 1 and time.perf_counter() > deadline:
+                complete = False
+                break
+            token = match(text, position)
+            group = token.lastgroup
+            end = token.end()
+            if group == "name":
+                word = token.group()
+                if word in _KEYWORDS:
+                    kind = KEYWORD
+                elif previous in ("def", "class"):
+                    kind = DEFINITION
+                elif word in _BUILTINS:
+                    kind = BUILTIN
+                else:
+                    kind = NAME
+            else:
+                kind = _GROUP_KINDS[group]
+            if kind != WHITESPACE:
+                previous = token.group() if kind == KEYWORD else None
+            lexed += 1
+            # Past whitespace the kinds depend on the token before it, so
+            # only a significant token shows the lexer is back in step.
+            if kind != WHITESPACE and position >= edit_end and self._matches_old(
+                old_starts, old_ends, old_kinds, position - delta, end - delta, kind
+            ):
+                reused = bisect.bisect_left(old_starts, position - delta)
+                break
+            starts.append(position)
+            ends.append(end)
+            kinds.append(kind)
+            position = end
+
+        if reused is not None:
+            starts.extend(map(delta.__add__, old_starts[reused:]))
+            ends.extend(map(delta.__add__, old_ends[reused:]))
+            kinds.extend(old_kinds[reused:])
+            # The tail may still end in what an earlier update didn't reach.
+            complete = kinds[-1] != TEXT
+        elif not complete:
+            # Unstyled until the next update gets here.
+            starts.append(position)
+            ends.append(len(text))
+            kinds.append(TEXT)
+        self.text = text
+        self.complete = complete
+        self.lexed = lexed
+        return restart
+
+    def _previous_significant(self) -> Optional[str]:
+        """The keyword before the restart point, if that is the last token."""
+        kinds = self.kinds
+        index = len(kinds) - 1
+        while index >= 0 and kinds[index] == WHITESPACE:
+            index -= 1
+        if index < 0 or kinds[index] != KEYWORD:
+            return None
+        return self.text[self.starts[index]:self.ends[index]]
+
+    @staticmethod
+    def _matches_old(old_starts, old_ends, old_kinds, start, end, kind) -> bool:
+        at = bisect.bisect_left(old_starts, start)
+        return (
+            at < len(old_starts)
+            and old_starts[at] == start
+            and old_ends[at] == end
+            and old_kinds[at] == kind
+        )
+
+    def runs(self, start: int = 0, stop: Optional[int] = None) -> List[Run]:
+        """Style runs covering ``text[start:stop]``, equal styles merged.
+
+        Plain text has the style None. Whitespace takes the style of the
+        token before it.
+        """
+        if stop is None:
+            stop = len(self.text)
+        starts, ends = self.starts, self.ends
+        first = bisect.bisect_right(ends, start)
+        last = bisect.bisect_left(starts, stop)
+        if first >= last:
+            return []
+        # Runs of tokens are found in the kinds, a byte per token, instead
+        # of looking at the tokens one by one.
+        styles = self.kinds[first:last].translate(_STYLE_OF_KIND)
+        runs = [
+            (starts[first + match.start()], ends[first + match.end() - 1],
+             STYLES.get(match.group(1)[0] if match.group(1) else TEXT))
+            for match in _RUN.finditer(styles)
+        ]
+        if runs[0][0] < start:
+            runs[0] = (start,) + runs[0][1:]
+        if runs[-1][1] > stop:
+            runs[-1] = runs[-1][:1] + (stop,) + runs[-1][2:]
+        return runs
+
+    def render(self, start: int = 0, stop: Optional[int] = None) -> str:
+        """``text[start:stop]`` with SGR codes for its styles."""
+        text = self.text
+        reset = "\x1b[0m"
+        parts = []
+        for begin, end, style in self.runs(start, stop):
+            code = self.styles.get(style) if style is not None else None
+            if code:
+                parts.append(code + text[begin:end] + reset)
+            else:
+                parts.append(text[begin:end])
+        return "".join(parts)
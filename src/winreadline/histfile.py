@@ -0,0 +1,665 @@
+# -*- coding: utf-8 -*-
+"""Streaming access to history files of any size.
+
+:class:`~winreadline.history.OrderedHistory` holds every entry in memory.
+Scripts that only need to look at a history file (export, grep, statistics)
+can use :func:`iter_history` instead, which reads the file in fixed size
+blocks and yields one entry at a time, so memory use does not depend on
+the size of the file.
+
+Reading backwards starts at the end of the file, so the last `n` commands
+cost O(n) no matter how long the history is::
+
+    from itertools import islice
+    last_ten = list(islice(iter_history("~/.python_history", reverse=True), 10))
+
+Timestamps
+----------
+Like bash with ``HISTTIMEFORMAT`` set, an entry may be preceded by a
+comment line holding the epoch time it was entered, e.g. ``#1589000000``.
+Such lines are never yielded as entries. :func:`iter_history_records`
+yields ``(timestamp, entry)`` pairs instead, with None for entries that
+have no timestamp.
+
+Merging
+-------
+:func:`merge_history_files` combines the histories of many machines into
+one, holding a single pending entry per input file in memory. It is also
+available from the command line::
+
+    python -m winreadline.history merge -o merged_history host1 host2 ...
+
+Ignored commands and secrets already in a file are removed the same way,
+one entry at a time, by ``python -m winreadline.history filter``. See
+:mod:`winreadline.histfilter`.
+
+Crash safety
+------------
+Files are never truncated in place. :func:`atomic_open` writes to a
+temporary file next to the target and renames it over the target once it
+is complete, so a crash leaves either the old or the new history behind.
+When the data is forced to disk with ``fsync`` is decided by a
+:class:`DurabilityPolicy`.
+
+"""
+import argparse
+import atexit
+import collections
+import contextlib
+import heapq
+import io
+import itertools
+import os
+import re
+import stat
+import sys
+import tempfile
+import threading
+import time
+from typing import (
+    BinaryIO,
+    Callable,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
+
+__all__ = [
+    "BLOCK_SIZE",
+    "DurabilityPolicy",
+    "atomic_open",
+    "iter_history",
+    "iter_history_records",
+    "merge_history_files",
+    "parse_history_buffer",
+    "write_history_records",
+]
+
+Record = Tuple[Optional[float], str]
+
+_TIMESTAMP = re.compile(r"#(\d+(?:\.\d*)?)\Z")
+# Spots a file with timestamps without visiting every line.
+_TIMESTAMP_LINE = re.compile(r"\n[^\S\n]*#\d")
+
+#: Bytes read per system call.
+BLOCK_SIZE = 1 << 16
+
+
+def _entry(raw: bytes, encoding: str) -> str:
+    # Matches what read_history_file stores: no newline, no indentation.
+    return raw.decode(encoding).rstrip("\r").lstrip()
+
+
+def _forward_lines(fp, block_size: int) -> Iterator[bytes]:
+    pending = b""
+    while True:
+        block = fp.read(block_size)
+        if not block:
+            break
+        lines = (pending + block).split(b"\n")
+        pending = lines.pop()
+        yield from lines
+    if pending:
+        yield pending
+
+
+def _reverse_lines(fp, block_size: int) -> Iterator[bytes]:
+    position = fp.seek(0, io.SEEK_END)
+    pending = b""
+    while position > 0:
+        size = min(block_size, position)
+        position -= size
+        fp.seek(position)
+        lines = (fp.read(size) + pending).split(b"\n")
+        # The first piece may continue in the previous block.
+        pending = lines[0]
+        yield from reversed(lines[1:])
+    if pending:
+        yield pending
+
+
+def _records(entries: Iterable[str], reverse: bool) -> Iterator[Record]:
+    if not reverse:
+        timestamp = None
+        for entry in entries:
+            match = _TIMESTAMP.match(entry)
+            if match is not None:
+                timestamp = float(match.group(1))
+                continue
+            yield timestamp, entry
+            timestamp = None
+        return
+    # Backwards, an entry is only complete once the line before it has
+    # been seen, since that might be its timestamp.
+    held = None
+    for entry in entries:
+        match = _TIMESTAMP.match(entry)
+        if match is not None:
+            if held is not None:
+                yield float(match.group(1)), held
+                held = None
+            continue
+        if held is not None:
+            yield None, held
+        held = entry
+    if held is not None:
+        yield None, held
+
+
+def iter_history_records(
+    path: os.PathLike,
+    reverse: bool = False,
+    encoding: Optional[str] = None,
+    block_size: int = BLOCK_SIZE,
+) -> Iterator[Record]:
+    """Lazily yield ``(timestamp, entry)`` pairs of a history file.
+
+    `timestamp` is None for entries that weren't preceded by a ``#<epoch>``
+    line. See :func:`iter_history` for the parameters.
+    """
+    if encoding is None:
+        encoding = sys.getdefaultencoding()
+    path = os.path.expanduser(os.fspath(path))
+    with io.open(path, "rb") as fp:
+        raw_lines = (_reverse_lines if reverse else _forward_lines)(fp, block_size)
+        entries = (_entry(raw, encoding) for raw in raw_lines)
+        yield from _records((entry for entry in entries if entry), reverse)
+
+
+def iter_history(
+    path: os.PathLike,
+    reverse: bool = False,
+    start: Optional[int] = None,
+    filter: Optional[Callable[[str], bool]] = None,
+    encoding: Optional[str] = None,
+    block_size: int = BLOCK_SIZE,
+) -> Iterator[str]:
+    """Lazily yield the entries of a history file.
+
+    Parameters
+    ----------
+    path : os.PathLike
+        History file. ``~`` is expanded.
+    reverse : bool, optional
+        Yield the newest entry first.
+    start : int, optional
+        Number of entries to skip, counted in the direction of iteration,
+        before anything is yielded. Skipped entries aren't passed to
+        `filter`.
+    filter : callable, optional
+        Only entries for which ``filter(entry)`` is true are yielded.
+    encoding : str, optional
+        Defaults to :func:`sys.getdefaultencoding` like
+        :meth:`~winreadline.history.OrderedHistory.read_history_file`.
+    block_size : int, optional
+        Bytes read at a time.
+
+    Yields
+    ------
+    str
+        Entries without their trailing newline. Blank lines and timestamp
+        lines are skipped.
+    """
+    records = iter_history_records(path, reverse, encoding, block_size)
+    entries = (entry for _, entry in records)
+    if start:
+        entries = itertools.islice(entries, start, None)
+    if filter is not None:
+        entries = (entry for entry in entries if filter(entry))
+    yield from entries
+
+
+def parse_history_buffer(
+    data: bytes, encoding: Optional[str] = None
+) -> Tuple[List[str], Optional[List[Optional[float]]]]:
+    """Split the whole contents of a history file into entries at once.
+
+    Gives the same entries as :func:`iter_history_records`, but decodes,
+    strips indentation and carriage returns, and drops blank lines for the
+    whole buffer in a handful of C level passes instead of a Python level
+    step per line.
+
+    Returns
+    -------
+    entries : list of str
+    timestamps : list or None
+        Parallel to `entries`, with None for entries without one. None
+        altogether if the file has no timestamp lines.
+    """
+    if encoding is None:
+        encoding = sys.getdefaultencoding()
+    text = data.decode(encoding)
+    if "\r" in text:
+        text = text.replace("\r\n", "\n").rstrip("\r")
+    lines = list(filter(None, map(str.lstrip, text.split("\n"))))
+    if "#" not in text or not (
+        (lines and _TIMESTAMP.match(lines[0])) or _TIMESTAMP_LINE.search(text)
+    ):
+        return lines, None
+    records = list(_records(lines, reverse=False))
+    return [entry for _, entry in records], [stamp for stamp, _ in records]
+
+
+def write_history_records(
+    fp: BinaryIO, records: Iterable[Record], encoding: Optional[str] = None
+) -> int:
+    """Write ``(timestamp, entry)`` pairs to the binary file `fp`.
+
+    This is the writer behind
+    :meth:`~winreadline.history.OrderedHistory.write_history_file`, so
+    anything written here reads back the same way. Pass None as the
+    timestamp to write the bare entry. Whole seconds are written as bash
+    does, fractions to the microsecond.
+
+    Returns
+    -------
+    int
+        Number of entries written.
+    """
+    if encoding is None:
+        encoding = sys.getdefaultencoding()
+    written = 0
+    for timestamp, entry in records:
+        if timestamp is not None:
+            if timestamp == int(timestamp):
+                fp.write(b"#%d\n" % timestamp)
+            else:
+                fp.write(b"#%.6f\n" % timestamp)
+        fp.write(entry.rstrip("\n").encode(encoding))
+        fp.write(b"\n")
+        written += 1
+    return written
+
+
+class DurabilityPolicy(object):
+    """Decide when written history files are forced to disk.
+
+    Parameters
+    ----------
+    mode : {'never', 'on-exit', 'interval', 'always'}
+        ``'never'`` leaves flushing to the operating system.
+        ``'on-exit'`` syncs every file written during the session once,
+        when the interpreter exits. ``'interval'`` syncs a write if the
+        last sync was at least `interval` seconds ago, and the rest at
+        exit. ``'always'`` syncs every write.
+    interval : float, optional
+        Seconds, only used by ``'interval'``.
+
+    Examples
+    --------
+    >>> DurabilityPolicy.parse("interval=30s")
+    DurabilityPolicy('interval=30s')
+    """
+
+    MODES = ("never", "on-exit", "interval", "always")
+
+    def __init__(self, mode: str = "on-exit", interval: float = 0.0):
+        if mode not in self.MODES:
+            raise ValueError(
+                "Unknown durability mode %r, expected one of %s"
+                % (mode, ", ".join(self.MODES))
+            )
+        self.mode = mode
+        self.interval = interval
+        self._last_sync = float("-inf")
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._registered = False
+
+    @classmethod
+    def parse(cls, spec: Union[str, "DurabilityPolicy"]) -> "DurabilityPolicy":
+        """Build a policy from ``'never'``, ``'on-exit'``, ``'always'`` or
+        ``'interval=N'`` with N in seconds and an optional ``s`` suffix.
+
+        The same spec always gives back the same policy, so the time of the
+        last sync is shared by everything writing under it.
+        """
+        if isinstance(spec, cls):
+            return spec
+        policy = _POLICIES.get(spec)
+        if policy is not None:
+            return policy
+        mode, _, interval = spec.partition("=")
+        mode = mode.strip().lower()
+        if mode == "interval":
+            try:
+                policy = cls(mode, float(interval.strip().rstrip("s")))
+            except ValueError:
+                raise ValueError("Bad durability interval in %r" % spec)
+        elif interval:
+            raise ValueError("Only 'interval' takes a value, got %r" % spec)
+        else:
+            policy = cls(mode)
+        return _POLICIES.setdefault(spec, policy)
+
+    def __repr__(self):
+        return "%s(%r)" % (self.__class__.__name__, str(self))
+
+    def __str__(self):
+        if self.mode == "interval":
+            return "interval=%gs" % self.interval
+        return self.mode
+
+    def commit(self, fp: BinaryIO, path: str) -> bool:
+        """Flush `fp`, which holds the new contents of `path`, and sync it
+        if the policy says it's time.
+
+        Returns
+        -------
+        bool
+            Whether `fp` was synced. Otherwise `path` may be synced at exit.
+        """
+        fp.flush()
+        with self._lock:
+            now = time.monotonic()
+            due = self.mode == "always" or (
+                self.mode == "interval" and now - self._last_sync >= self.interval
+            )
+            if due:
+                self._last_sync = now
+                self._pending.discard(path)
+            elif self.mode != "never":
+                self._pending.add(path)
+                if not self._registered:
+                    atexit.register(self.sync_pending)
+                    self._registered = True
+        if due:
+            os.fsync(fp.fileno())
+        return due
+
+    def sync_pending(self):
+        """Sync every file written but not yet synced under this policy."""
+        with self._lock:
+            pending, self._pending = self._pending, set()
+        for path in pending:
+            try:
+                _fsync_path(path)
+                _fsync_directory(os.path.dirname(path))
+            except OSError:
+                pass
+
+
+_POLICIES = {}  # type: dict
+
+
+def _fsync_path(path: str):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _fsync_directory(directory: str):
+    """Make a rename in `directory` durable. A no op where unsupported."""
+    try:
+        _fsync_path(directory or os.curdir)
+    except OSError:
+        # Windows can't open directories.
+        pass
+
+
+def _copy_owner_and_mode(info: os.stat_result, path: str):
+    if hasattr(os, "chown"):
+        try:
+            os.chown(path, info.st_uid, info.st_gid)
+        except PermissionError:
+            # Only root may give a file away; keep at least the group.
+            try:
+                os.chown(path, -1, info.st_gid)
+            except PermissionError:
+                pass
+    os.chmod(path, stat.S_IMODE(info.st_mode))
+
+
+@contextlib.contextmanager
+def atomic_open(
+    filename: os.PathLike, durability: Union[str, DurabilityPolicy, None] = None
+):
+    """Open a binary file that replaces `filename` once closed cleanly.
+
+    The data goes to a temporary file in the same directory, which is
+    renamed over `filename` with :func:`os.replace` at the end of the
+    ``with`` block. If the block raises, `filename` is left untouched.
+
+    A symlink is followed, so the file it points to is replaced and the
+    link stays a link. The new file gets the mode and, where permitted,
+    the owner and group of the one it replaces.
+
+    Parameters
+    ----------
+    filename : os.PathLike
+    durability : str or DurabilityPolicy, optional
+        Defaults to ``'on-exit'``.
+    """
+    policy = DurabilityPolicy.parse("on-exit" if durability is None else durability)
+    path = os.path.realpath(os.fspath(filename))
+    directory, name = os.path.split(path)
+    fd, temporary = tempfile.mkstemp(
+        prefix="." + name + ".", suffix=".tmp", dir=directory
+    )
+    try:
+        try:
+            info = os.stat(path)
+        except FileNotFoundError:
+            pass
+        else:
+            _copy_owner_and_mode(info, temporary)
+        with io.open(fd, "wb") as fp:
+            yield fp
+            synced = policy.commit(fp, path)
+        os.replace(temporary, path)
+    except BaseException:
+        try:
+            os.remove(temporary)
+        except OSError:
+            pass
+        raise
+    if synced:
+        _fsync_directory(directory)
+
+
+def _keyed(records: Iterator[Record], source: int, order: str):
+    last_timestamp = float("-inf")
+    for position, (timestamp, entry) in enumerate(records):
+        if order == "source":
+            yield (position, source), timestamp, entry
+            continue
+        # Untimed entries keep their place right after the last timed one.
+        if timestamp is not None:
+            last_timestamp = timestamp
+        yield (last_timestamp, source, position), timestamp, entry
+
+
+def merge_history_files(
+    paths: Sequence[os.PathLike],
+    output: BinaryIO,
+    order: str = "timestamp",
+    window: int = 10000,
+    encoding: Optional[str] = None,
+) -> int:
+    """Stream merge many history files into `output`.
+
+    Each input is assumed to already be in chronological order. A heap
+    holds the next entry of every input, so memory grows with the number
+    of files, not with their length.
+
+    Parameters
+    ----------
+    paths : sequence of os.PathLike
+    output : binary file
+        Written with :func:`write_history_records`.
+    order : {'timestamp', 'source'}, optional
+        ``'timestamp'`` interleaves by the ``#<epoch>`` lines.
+        ``'source'`` interleaves by position within each file, taking the
+        files in the order given for ties. Either way every entry keeps
+        its timestamp in the output.
+    window : int, optional
+        An entry is dropped if it equals one of the last `window` distinct
+        entries written. 0 disables deduplication.
+    encoding : str, optional
+
+    Returns
+    -------
+    int
+        Number of entries written.
+    """
+    if order not in ("timestamp", "source"):
+        raise ValueError("order must be 'timestamp' or 'source', got %r" % order)
+    streams = [
+        _keyed(iter_history_records(path, encoding=encoding), source, order)
+        for source, path in enumerate(paths)
+    ]
+    recent = collections.OrderedDict()
+
+    def deduplicated():
+        for _, timestamp, entry in heapq.merge(*streams, key=_first):
+            if window:
+                if entry in recent:
+                    recent.move_to_end(entry)
+                    continue
+                recent[entry] = None
+                if len(recent) > window:
+                    recent.popitem(last=False)
+            yield timestamp, entry
+
+    return write_history_records(output, deduplicated(), encoding)
+
+
+def _first(item):
+    return item[0]
+
+
+@contextlib.contextmanager
+def _unclosed(fp):
+    """Use `fp` in a ``with`` block that leaves it open."""
+    yield fp
+
+
+def _merge_command(args) -> int:
+    if args.output is None or args.output == "-":
+        output = _unclosed(sys.stdout.buffer)
+    else:
+        # Safe even if the output is one of the inputs: it's only replaced
+        # once every input has been read.
+        output = atomic_open(args.output, args.durability)
+    with output as fp:
+        merge_history_files(
+            args.paths,
+            fp,
+            order=args.order,
+            window=args.window,
+            encoding=args.encoding,
+        )
+    return 0
+
+
+def _filter_command(args) -> int:
+    # Imported here: histfilter builds on this module.
+    from .histfilter import SECRET_PATTERNS, HistoryFilter, refilter_history_file
+
+    redact_regex = list(args.redact_regex)
+    if args.secrets:
+        redact_regex.extend(SECRET_PATTERNS)
+    history_filter = HistoryFilter(
+        histignore=args.histignore,
+        ignore=args.ignore,
+        ignore_regex=args.ignore_regex,
+        redact=args.redact,
+        redact_regex=redact_regex,
+    )
+    written = refilter_history_file(
+        args.path, history_filter, args.output, args.durability, args.encoding
+    )
+    print(
+        "%d entries kept, %d dropped, %d redacted"
+        % (written, history_filter.dropped, history_filter.redacted),
+        file=sys.stderr,
+    )
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command line entry point of ``python -m winreadline.history``."""
+    parser = argparse.ArgumentParser(
+        prog="python -m winreadline.history",
+        description="Tools for readline history files.",
+    )
+    commands = parser.add_subparsers(dest="command")
+    merge = commands.add_parser(
+        "merge", help="Merge history files from many machines into one."
+    )
+    merge.add_argument("paths", nargs="+", help="History files to merge.")
+    merge.add_argument(
+        "-o", "--output", help="Where to write the result. Defaults to stdout."
+    )
+    merge.add_argument(
+        "--order",
+        choices=("timestamp", "source"),
+        default="timestamp",
+        help="Interleave by #<epoch> lines or by position in each file.",
+    )
+    merge.add_argument(
+        "--window",
+        type=int,
+        default=10000,
+        help="Drop entries repeating one of the last N distinct entries.",
+    )
+    merge.add_argument("--encoding", default=None)
+    merge.add_argument(
+        "--durability",
+        type=DurabilityPolicy.parse,
+        default="always",
+        help="When to fsync the output: never, on-exit, interval=N or always.",
+    )
+    merge.set_defaults(func=_merge_command)
+    refilter = commands.add_parser(
+        "filter", help="Drop ignored entries and redact secrets in a history file."
+    )
+    refilter.add_argument("path", help="History file, rewritten in place.")
+    refilter.add_argument(
+        "-o", "--output", help="Write the result here instead of over the file."
+    )
+    refilter.add_argument(
+        "--histignore",
+        default=os.environ.get("HISTIGNORE"),
+        help="Colon separated globs in bash syntax. Defaults to $HISTIGNORE.",
+    )
+    refilter.add_argument(
+        "--ignore", action="append", default=[], help="Drop entries containing this."
+    )
+    refilter.add_argument(
+        "--ignore-regex", action="append", default=[], help="Drop entries matching this."
+    )
+    refilter.add_argument(
+        "--redact", action="append", default=[], help="Replace this wherever it appears."
+    )
+    refilter.add_argument(
+        "--redact-regex", action="append", default=[], help="Replace what this matches."
+    )
+    refilter.add_argument(
+        "--secrets",
+        action="store_true",
+        help="Also redact common passwords and tokens.",
+    )
+    refilter.add_argument("--encoding", default=None)
+    refilter.add_argument(
+        "--durability",
+        type=DurabilityPolicy.parse,
+        default="always",
+        help="When to fsync the output: never, on-exit, interval=N or always.",
+    )
+    refilter.set_defaults(func=_filter_command)
+    args = parser.parse_args(argv)
+    if args.command is None:
+        parser.print_help()
+        return 2
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
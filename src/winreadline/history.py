@@ -12,18 +12,35 @@
 # *****************************************************************************
 from __future__ import print_function, unicode_literals, absolute_import
 
+import bisect
 import collections
+import functools
 import io
+import itertools
 import operator
 import os
 import shutil
 import sys
+import threading
+import time
 import traceback
+from array import array
 from inspect import getmro
-from textwrap import dedent
+from pathlib import Path
 from typing import List, Any, AnyStr, Optional, Union, Callable
 
-from pyreadline.lineeditor import touch
+from .compact import CompactHistory
+from .histfile import (
+    DurabilityPolicy,
+    atomic_open,
+    parse_history_buffer,
+    write_history_records,
+)
+from .histfilter import HistoryFilter
+from .isearch import BACKWARD, FORWARD, SearchSession
+from .stats import HistoryStatistics
+from .suggest import Autosuggester, accept_suggestion, accept_suggestion_word
+from .tracing import traced
 
 
 
@@ -63,7 +80,9 @@ def __repr__(self):
         return "<%s: %s>" % (self.__class__.__name__, repr(self.name))
 
     def touch(self, filename: str) -> os.PathLike:
-        return touch(filename)
+        path = Path(filename)
+        path.touch()
+        return path
 
     def readline(self):
         self.lineno = self.lineno + 1
@@ -101,6 +120,96 @@ def __copy__(self, dst, *args, follow_symlinks=True):
         """
         shutil.copy(self, dst, *args, follow_symlinks=follow_symlinks)
 
+class HistorySnapshot(collections.abc.Sequence):
+    """Read only view of an :class:`OrderedHistory` at one point in time.
+
+    A thread safe history only ever appends to the list a snapshot refers
+    to. Every other change copies the list first, so a snapshot stays valid
+    without holding any lock however long a search takes.
+
+    Attributes
+    ----------
+    entries : list of str
+    timestamps : array.array or None
+    length : int
+        Number of leading `entries` that belong to the snapshot.
+    version : int
+    """
+
+    __slots__ = ("entries", "timestamps", "length", "version")
+
+    def __init__(self, entries, timestamps, length, version):
+        self.entries = entries
+        self.timestamps = timestamps
+        self.length = length
+        self.version = version
+
+    def __repr__(self):
+        return "<%s: %d entries, version %d>" % (
+            self.__class__.__name__, self.length, self.version)
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self.entries[slice(*index.indices(self.length))]
+        if index < 0:
+            index += self.length
+        if not 0 <= index < self.length:
+            raise IndexError("history snapshot index out of range")
+        return self.entries[index]
+
+    def __iter__(self):
+        return self.iter_range()
+
+    def iter_range(self, start: int = 0, stop: Optional[int] = None):
+        """Yield the entries from `start` to `stop` without copying them all.
+
+        A backend with an ``iter_range`` of its own, such as a
+        :class:`~winreadline.daemon.RemoteHistory`, is asked for them in
+        bulk rather than one at a time.
+        """
+        start, stop, _ = slice(start, stop).indices(self.length)
+        bulk = getattr(self.entries, "iter_range", None)
+        if bulk is not None:
+            return bulk(start, max(start, stop))
+        return map(self.entries.__getitem__, range(start, stop))
+
+
+def _synchronized(copy_on_write=False):
+    """Serialize a mutating method when the history is thread safe.
+
+    Parameters
+    ----------
+    copy_on_write : bool, optional
+        The method changes entries other than by appending, so published
+        snapshots must not see the list it works on, and `mutations` goes
+        up.
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            if self._lock is None:
+                if copy_on_write:
+                    self.mutations += 1
+                return method(self, *args, **kwargs)
+            with self._lock:
+                if copy_on_write:
+                    self.mutations += 1
+                    # Keep the storage backend, e.g. a CompactHistory.
+                    copy = getattr(self.history, "copy", None)
+                    self.history = list(self.history) if copy is None else copy()
+                    if self.timestamps is not None:
+                        self.timestamps = array("d", self.timestamps)
+                try:
+                    return method(self, *args, **kwargs)
+                finally:
+                    self._publish()
+        return wrapper
+    return decorator
+
+
 # on god `self.assertIsInstance(OrderedHistory(), list)` just failed
 # class OrderedHistory(collections.UserList):
 class OrderedHistory(collections.abc.MutableSequence):
@@ -119,14 +228,24 @@ class OrderedHistory(collections.abc.MutableSequence):
     line_buffer : str
         current line of text the user is editing
         Actually don't make that same mistake. Implement it elsewhere.
+    mutations : int
+        Number of changes other than appends so far. An index taken before
+        it last changed may now point at a different entry.
     """
     lastcommand = None
     last_search_for = ""
+    mutations = 0
 
     def __init__(self,
             history_length: Optional[int] =100,
             history: Optional[List[AnyStr]] =None,
             filename: Optional[os.PathLike] =None,
+            statistics: Optional[HistoryStatistics] =None,
+            timestamps: bool =False,
+            threadsafe: bool =False,
+            durability: Union[str, DurabilityPolicy] ="on-exit",
+            compact: bool =False,
+            history_filter: Optional[HistoryFilter] =None,
         ):
         """Initialize the LineHistory object.
 
@@ -137,15 +256,41 @@ def __init__(self,
             Previously run commands to initialize with.
             If None, (the default), then :meth:`read_history_file` will be called.
         filename : os.PathLike, optional
+        statistics : HistoryStatistics, optional
+            Kept up to date on every :meth:`add_history` and removal so
+            frequency and frecency rankings never rescan the history.
+        timestamps : bool, optional
+            Record when every entry was added. They are kept in
+            :attr:`timestamps`, saved as bash style ``#<epoch>`` lines and
+            queried with :meth:`entries_between`.
+        threadsafe : bool, optional
+            Allow the history to be shared between threads. Writers take
+            turns on a lock while readers work on a :meth:`snapshot`, so
+            searches never wait for an append or a save.
+        durability : str or DurabilityPolicy, optional
+            When saved history files are fsync'ed: ``'never'``,
+            ``'on-exit'`` (the default), ``'interval=N'`` or ``'always'``.
+            Files are always replaced atomically either way.
+        compact : bool, optional
+            Keep the entries in a :class:`~winreadline.compact.CompactHistory`
+            rather than a list, for a fraction of the memory. Ignored if
+            `history` is given.
+        history_filter : HistoryFilter, optional
+            Drops ignored entries and redacts secrets before they are
+            added, inserted, assigned, loaded or saved. Entries in `history`
+            are kept as given.
 
         """
+        self.durability = DurabilityPolicy.parse(durability)
+        self._lock = threading.RLock() if threadsafe else None
+        self._snapshot = None
         self._history_length = history_length
-        # so hold up i assume this means we don't read in the history file
-        # upon initialization. TODO: who does?
-        self.history = [] if history is None else history
-        if len(self.history) == 0:
-            self.read_history_file()
-
+        self.statistics = statistics
+        # One float per entry, parallel to self.history, rather than
+        # (time, line) tuples that would cost an object each.
+        self.timestamps = array("d") if timestamps else None
+        self.suggester = None
+        self.history_filter = history_filter
         try:
             self.filename = (
                 filename
@@ -155,13 +300,27 @@ def __init__(self,
         except PermissionError:
             raise
         except OSError:
-            traceback.print_exc(sys.last_traceback)
+            traceback.print_exc()
             self.filename = io.StringIO()
+        # so hold up i assume this means we don't read in the history file
+        # upon initialization. TODO: who does?
+        if history is None:
+            history = CompactHistory() if compact else []
+        self.history = history
+        if getattr(self.history, "shared", False):
+            # E.g. a RemoteHistory: the daemon loaded the file already.
+            pass
+        elif len(self.history) == 0:
+            self.read_history_file()
+        else:
+            if self.timestamps is not None:
+                self.timestamps.extend([0.0] * len(self.history))
+            if self.statistics is not None:
+                self.statistics.update(self.history)
 
     # Dunders that make this easier to work with: {{{
     def __iter__(self):
-        for i in self.history_length:
-            return self.get_history_item(i)
+        return iter(self.snapshot())
 
     def __reversed__(self):
         for key in self.history:
@@ -199,21 +358,71 @@ def __getitem__(self, index):
         """
         return self.history[index]
 
-    def __setitem__(self, idx, line, *args):
-        if args:
-            self.history[idx] = [line, *args]
+    @_synchronized(copy_on_write=True)
+    def __setitem__(self, idx, line):
+        if isinstance(idx, slice):
+            lines = self._filtered(line)
         else:
-            self.history[idx] = [line]
-
+            removed = [self.history[idx]]
+            lines = self._filtered([line])
+            if lines:
+                self.history[idx] = lines[0]
+                self._removed(removed)
+                self._added(lines)
+                return
+            # Dropped by the filter: nothing takes the entry's place.
+            idx = slice(idx, idx + 1 or None)
+        removed = self.history[idx]
+        self.history[idx] = lines
+        if self.timestamps is not None and len(lines) != len(removed):
+            # Only a plain slice can change the length. Replaced entries
+            # keep their times; new ones borrow the neighbour's.
+            start = idx.indices(len(self.timestamps))[0]
+            neighbour = self.timestamps[start - 1] if 0 < start else 0.0
+            self.timestamps[idx] = array("d", [neighbour]) * len(lines)
+        self._removed(removed)
+        self._added(lines)
+
+    @_synchronized(copy_on_write=True)
     def __delitem__(self, idx):
+        removed = self.history[idx]
+        if not isinstance(idx, slice):
+            removed = [removed]
         del self.history[idx]
+        if self.timestamps is not None:
+            del self.timestamps[idx]
+        self._removed(removed)
 
+    @_synchronized()
     def __add__(self, line):
         if isinstance(line, OrderedHistory):
-            self.history.extend(line)
+            lines = list(line)
+            stamps = line.timestamps
+            if self.history_filter is not None:
+                kept = list(map(self.history_filter, lines))
+                if stamps is not None:
+                    stamps = [stamp for stamp, entry in zip(stamps, kept) if entry is not None]
+                lines = [entry for entry in kept if entry is not None]
+            self.history.extend(lines)
+            if self.timestamps is not None:
+                if stamps is not None:
+                    self.timestamps.extend(self._sorted_after(stamps))
+                else:
+                    self.timestamps.extend([self._last_timestamp()] * len(lines))
+            self._added(lines)
+            if self._lock is not None:
+                # The save reads the published snapshot, so publish first.
+                self._publish()
             self.write_history_file()
         else:
+            if self.history_filter is not None:
+                line = self.history_filter(line)
+                if line is None:
+                    return
             self.history.append(line)
+            if self.timestamps is not None:
+                self.timestamps.append(max(time.time(), self._last_timestamp()))
+            self._added([line])
 
     def __iadd__(self, line):
         self.__add__(line)
@@ -224,24 +433,139 @@ def __iadd__(self, line):
 
     # Implementing the MutableSequence protocol
 
+    @_synchronized(copy_on_write=True)
     def insert(self, item, idx=0):
+        if self.history_filter is not None:
+            item = self.history_filter(item)
+            if item is None:
+                return
         self.history.insert(idx, item)
+        if self.timestamps is not None:
+            # Borrow the neighbour's time so the column stays sorted.
+            neighbour = self.timestamps[idx - 1] if 0 < idx else 0.0
+            self.timestamps.insert(idx, neighbour)
+        self._added([item])
+
+    def _filtered(self, lines) -> List[str]:
+        """`lines` as `history_filter` lets them in, dropped ones left out."""
+        if self.history_filter is None:
+            return list(lines)
+        return [line for line in map(self.history_filter, lines) if line is not None]
+
+    def _added(self, lines):
+        """Tell the statistics and the suggester that `lines` came in."""
+        if self.statistics is not None:
+            self.statistics.update(lines)
+        if self.suggester is not None:
+            for line in lines:
+                self.suggester.add(line)
+
+    def _removed(self, lines):
+        """Tell the statistics and the suggester that `lines` went out."""
+        if self.statistics is not None:
+            for line in lines:
+                self.statistics.evict(line)
+        if self.suggester is not None:
+            # The suggester knows unique commands: keep those still present.
+            for line in set(lines).difference(self.history):
+                self.suggester.discard(line)
 
     # The actual Readline interface
 
-    def add_history(self, line):
+    @_synchronized()
+    def add_history(self, line, timestamp: Optional[float] =None):
         """Append a line to the history buffer, as if it was the last line typed.
 
         Checks to ensure that line is not the same as the last line in history,
-        as well as ensuring that line isn't empty.
+        as well as ensuring that line isn't empty. The line goes through
+        `history_filter` first, if there is one.
+
+        Parameters
+        ----------
+        line : str
+        timestamp : float, optional
+            Seconds since the epoch. Only kept if the history was created
+            with ``timestamps=True``, defaulting to now. A time before the
+            newest entry's is raised to it, keeping the column sorted.
         """
+        if self.history_filter is not None:
+            line = self.history_filter(line)
+            if line is None:
+                return
         if len(line) == 0:
             return
-        elif self.history[-1] == line:
-            return
-        else:
-            self.history.append(line)
+        # A shared backend skips repeats itself, and asking it for the last
+        # line would wait on every append still in flight.
+        if not getattr(self.history, "shared", False):
+            if self.history and self.history[-1] == line:
+                return
+        self.history.append(line)
+        if self.timestamps is not None:
+            if timestamp is None:
+                timestamp = time.time()
+            self.timestamps.append(max(timestamp, self._last_timestamp()))
+        self._added([line])
+
+    @_synchronized()
+    def add_history_many(self, lines, timestamps=None):
+        """Append many lines at once, filtered like :meth:`add_history`.
+
+        Empty lines, lines `history_filter` drops and lines repeating the one
+        before them are dropped in a single pass, and the survivors are
+        appended with one ``extend``.
+
+        Parameters
+        ----------
+        lines : iterable of str
+        timestamps : iterable of float, optional
+            Parallel to `lines`. Only kept if the history was created with
+            ``timestamps=True``, defaulting to now. Like in
+            :meth:`add_history`, times are raised where needed to keep the
+            column sorted.
 
+        Returns
+        -------
+        int
+            Number of lines appended.
+        """
+        previous = self.history[-1] if self.history else None
+        if self.history_filter is not None:
+            # Dropped entries come back as None and go with the empty ones.
+            lines = map(self.history_filter, lines)
+        if self.timestamps is None or timestamps is None:
+            kept = list(filter(None, lines))
+            # Keep each line that differs from the one before it. Repeats
+            # are rare, so a second list is only built if there are any.
+            if any(map(operator.eq, kept, itertools.chain([previous], kept))):
+                before = itertools.chain([previous], kept)
+                kept = list(itertools.compress(kept, map(operator.ne, kept, before)))
+            stamps = None
+        else:
+            pairs = [
+                next(group)
+                for _, group in itertools.groupby(
+                    (pair for pair in zip(lines, timestamps) if pair[0]),
+                    key=operator.itemgetter(0),
+                )
+            ]
+            if pairs and pairs[0][0] == previous:
+                del pairs[0]
+            kept = [line for line, _ in pairs]
+            stamps = self._sorted_after(stamp for _, stamp in pairs)
+        self.history.extend(kept)
+        if self.timestamps is not None:
+            if stamps is None:
+                now = max(time.time(), self._last_timestamp())
+                stamps = array("d", [now]) * len(kept)
+            self.timestamps.extend(stamps)
+        self._added(kept)
+        return len(kept)
+
+    def extend(self, lines):
+        """Append `lines` in bulk. See :meth:`add_history_many`."""
+        self.add_history_many(lines)
+
+    @_synchronized()
     def read_history_file(self, filename=None, encoding=None):
         """Load a readline history file.
 
@@ -260,15 +584,31 @@ def read_history_file(self, filename=None, encoding=None):
         if filename is None:
             filename = self.filename
         try:
-            with io.open(filename, "rt", encoding=encoding) as fd:
-                for line in fd:
-                    self.add_history(dedent(line))
+            with io.open(filename, "rb") as fd:
+                lines, timestamps = parse_history_buffer(fd.read(), encoding)
         except PermissionError:
             raise
+        except FileNotFoundError:
+            # Nothing saved yet, e.g. the first session.
+            return
         except OSError:
-            traceback.print_exc(sys.last_traceback)
+            traceback.print_exc()
         except UnicodeDecodeError:
             raise  # TODO:
+        else:
+            if self.timestamps is not None:
+                # Entries written without a timestamp inherit the previous
+                # one so that the timestamp column stays sorted.
+                last = self._last_timestamp()
+                if timestamps is None:
+                    timestamps = array("d", [last]) * len(lines)
+                else:
+                    for index, timestamp in enumerate(timestamps):
+                        if timestamp is None:
+                            timestamps[index] = last
+                        else:
+                            last = timestamp
+            self.add_history_many(lines, timestamps)
 
     def flush(self, filename: Optional[os.PathLike] =None, full: bool = False):
         """Flush working contents and save to disk.
@@ -279,24 +619,22 @@ def flush(self, filename: Optional[os.PathLike] =None, full: bool = False):
             If True, ignore `history_length` and write the entire session's history
             to the file 'filename'.
         filename : os.PathLike, optional
-            If not given, defaults to :attr:`history_filename` or '$HOME/.python_history'.
+            If not given, defaults to :attr:`filename`, '$HOME/.python_history' by default.
 
         """
         if filename is None:
-            filename = self.history_filename
-        with io.open(filename, "wb") as fp:
-            if full:
-                fp.writelines(self.history)
-            for line in self.history[-self.history_length:]:
-                fp.write(line)
+            filename = self.filename
+        with atomic_open(filename, self.durability) as fp:
+            write_history_records(
+                fp, self._records(0 if full else self._truncated_start())
+            )
 
     def write_history_file(self, filename : Optional[os.PathLike] =None):
         """Save a readline history file."""
         if filename is None:
-            filename = self.history_filename
-        with io.open(filename, "wb") as fp:
-            for line in self.history[-self.history_length:]:
-                fp.write(line)
+            filename = self.filename
+        with atomic_open(filename, self.durability) as fp:
+            write_history_records(fp, self._records(self._truncated_start()))
 
     def append_history_file(self, nelements, filename : Optional[os.PathLike] =None):
         """Append the last nelements items of the history list to file.
@@ -305,14 +643,124 @@ def append_history_file(self, nelements, filename : Optional[os.PathLike] =None)
         Implemented so as to match the standard library addition.
         """
         if filename is None:
-            filename = self.history_filename
-        with io.open(filename, "wb") as fp:
-            for line in self.history[-nelements:]:
-                fp.write(line)
+            filename = self.filename
+        with io.open(filename, "ab") as fp:
+            write_history_records(fp, self._records(-nelements))
+            self.durability.commit(fp, os.path.abspath(filename))
+
+    def _records(self, start: int):
+        """Pair the entries from `start` on with their timestamps, if any."""
+        snapshot = self.snapshot()
+        start, stop, _ = slice(start, None).indices(len(snapshot))
+        # Iterate rather than slice: a save shouldn't copy the whole history.
+        # Entries below the snapshot's length never change under it.
+        lines = snapshot.iter_range(start, stop)
+        if snapshot.timestamps is None:
+            records = ((None, line) for line in lines)
+        else:
+            timestamps = map(snapshot.timestamps.__getitem__, range(start, stop))
+            # A zero timestamp means the entry's time was never known.
+            records = (
+                (timestamp or None, line)
+                for timestamp, line in zip(timestamps, lines)
+            )
+        if self.history_filter is not None:
+            # Entries may predate the filter, or have come in some other way.
+            records = self.history_filter.filter_records(records)
+        return records
+
+    def _truncated_start(self) -> int:
+        """Index of the first entry that fits in `_history_length`."""
+        if self._history_length is None or self._history_length < 0:
+            return 0
+        return max(0, len(self.history) - self._history_length)
+
+    def _publish(self):
+        version = 0 if self._snapshot is None else self._snapshot.version + 1
+        self._snapshot = HistorySnapshot(
+            self.history, self.timestamps, len(self.history), version)
+
+    def snapshot(self) -> HistorySnapshot:
+        """Return a consistent read only view of the history.
+
+        For a thread safe history this is the view published by the last
+        completed write, returned without taking any lock.
+        """
+        if self._lock is None:
+            return HistorySnapshot(
+                self.history, self.timestamps, len(self.history), 0)
+        snapshot = self._snapshot
+        if snapshot is None:
+            with self._lock:
+                self._publish()
+                snapshot = self._snapshot
+        return snapshot
+
+    def _last_timestamp(self) -> float:
+        if self.timestamps:
+            return self.timestamps[-1]
+        return 0.0
+
+    def _sorted_after(self, stamps) -> array:
+        """`stamps`, each raised to at least every time before it.
+
+        :meth:`entries_between` bisects the column, so it must stay sorted
+        even when times come from files written by skewed clocks.
+        """
+        running = itertools.accumulate(
+            itertools.chain([self._last_timestamp()], stamps), max)
+        next(running)
+        return array("d", running)
 
+    def entries_between(self, t0: float, t1: float) -> List[str]:
+        """Return the entries added between `t0` and `t1`, inclusive.
+
+        Both are seconds since the epoch. Answered with two bisections of
+        the timestamp column, which every change keeps sorted, so the cost
+        is O(log n + k) for k matches.
+
+        Raises
+        ------
+        ValueError
+            If the history wasn't created with ``timestamps=True``.
+        """
+        snapshot = self.snapshot()
+        if snapshot.timestamps is None:
+            raise ValueError("Timestamps aren't recorded for this history.")
+        lo = bisect.bisect_left(snapshot.timestamps, t0, 0, len(snapshot))
+        hi = bisect.bisect_right(snapshot.timestamps, t1, lo, len(snapshot))
+        return snapshot[lo:hi]
+
+    @_synchronized(copy_on_write=True)
     def clear_history(self):
         """Clear readline history."""
         self.history[:] = []
+        if self.timestamps is not None:
+            del self.timestamps[:]
+        if self.statistics is not None:
+            self.statistics.clear()
+        if self.suggester is not None:
+            self.suggester = Autosuggester(
+                statistics=self.statistics, budget=self.suggester.budget
+            )
+
+    def enable_autosuggestions(self, budget: float = 0.001) -> Autosuggester:
+        """Start indexing the history for fish style inline suggestions.
+
+        Parameters
+        ----------
+        budget : float, optional
+            Seconds a single keystroke's lookup may take.
+
+        Returns
+        -------
+        :class:`~winreadline.suggest.Autosuggester`
+            Kept up to date by :meth:`add_history` from now on.
+        """
+        self.suggester = Autosuggester(
+            self.history, statistics=self.statistics, budget=budget
+        )
+        return self.suggester
 
     def get_current_history_length(self):
         """Return the number of lines currently in the history.
@@ -326,12 +774,14 @@ def get_history_item(self, index : int):
         """Return the current contents of history item at index
 
         **NO LONGER STARTS AT 1! Python is a 0-indexed language.
+
+        Raises
+        ------
+        IndexError
+            If there is no item at `index`.
         """
         # log("get_history_item: index:%d item:%r" % (index, item))
-        try:
-            return self.history[index]
-        except IndexError:
-            raise StopIteration  # right?
+        return self.history[index]
 
     def get_history_slice(self, start=0, stop=None, step=1):
         return slice(self.history[start], self.history[stop], step)
@@ -340,11 +790,28 @@ def __slice__(self, start=0, stop=None, step=1):
         return self.get_history_slice(start, stop, step)
 
     @property
+    def history_length(self) -> int:
+        """The maximum number of lines that will be written to `filename`.
+
+        A negative length is used to inhibit history truncation.
+
+        Raises
+        ------
+        TypeError
+            When set to anything but an int.
+        """
+        return self._history_length
+
+    @history_length.setter
+    def history_length(self, value: int):
+        if not isinstance(value, int):
+            raise TypeError("history length must be an int, got %r" % (value,))
+        self._history_length = value
+
     def get_history_length(self) -> int:
         """Return the maximum number of lines that will be written to `filename`."""
-        return self._history_length
+        return self.history_length
 
-    @_history_length.setter
     def set_history_length(self, value: int):
         """Set the new history length.
 
@@ -357,15 +824,21 @@ def set_history_length(self, value: int):
         TypeError
             When not provided an int.
         """
-        if not isinstance(value, int):
-            raise TypeError
-        self._history_length = value
+        self.history_length = value
 
 
 class ACompletelyDifferentClass(OrderedHistory):
 
+    #: Index of the entry shown, None past the newest one.
+    history_cursor = None
+    #: The incremental search in progress, see :meth:`_any_search`.
+    isearch = None
+    _isearch_cursor = None
+    _isearch_mutations = None
+
     # Bindable Commands: {{{
 
+    @traced("command")
     def previous_history(self, current):  # (C-p)
         """Move back through the history list, fetching the previous command. """
         if self.history_cursor == len(self.history):
@@ -378,70 +851,86 @@ def previous_history(self, current):  # (C-p)
             current.set_line(self.history[self.history_cursor].get_line_text())
             current.point = lineobj.EndOfLine
 
+    @traced("command")
     def next_history(self, current):  # (C-n)
         """Move forward through the history list, fetching the next command. """
         if self.history_cursor < len(self.history) - 1:
             self.history_cursor += 1
             current.set_line(self.history[self.history_cursor].get_line_text())
 
+    @traced("command")
     def beginning_of_history(self):  # (M-<)
         """Move to the first line in the history."""
         self.history_cursor = 0
         if len(self.history) > 0:
             self.l_buffer = self.history[0]
 
+    @traced("command")
     def end_of_history(self, current):  # (M->)
         """Move to the end of the input history."""
         self.history_cursor = len(self.history)
         current.set_line(self.history[-1].get_line_text())
 
-    def _any_search(self, searchfor, startpos=None):
-
-        for idx, line in enumerate(self.history):
-            if searchfor in line:
-                startpos = idx
-                return self.history[startpos].get_line_text()
-
-        if self.history:
-            result = self.history[startpos].get_line_text()
+    @traced("command")
+    def accept_autosuggestion(self, current):  # (C-e at end of line)
+        """Replace the line with the whole autosuggestion shown after it."""
+        if self.suggester is None:
+            return
+        line = current.get_line_text()
+        line = accept_suggestion(line, self.suggester.suggest(line))
+        current.set_line(line)
+        current.point = len(line)
+
+    @traced("command")
+    def accept_autosuggestion_word(self, current):  # (M-f at end of line)
+        """Take the next word of the autosuggestion shown after the line."""
+        if self.suggester is None:
+            return
+        line = current.get_line_text()
+        line = accept_suggestion_word(line, self.suggester.suggest(line))
+        current.set_line(line)
+        current.point = len(line)
+
+    def _any_search(self, searchfor, direction, startpos=None):
+        """Take one step of an incremental search and return the hit.
+
+        The :class:`~winreadline.isearch.SearchSession` of the previous step
+        is carried on as long as the cursor hasn't moved and the history has
+        only been appended to since, so a repeated search resumes from the
+        last hit and a longer query only filters the earlier hits. An empty
+        string means there is no hit.
+        """
+        snapshot = self.snapshot()
+        session = self.isearch
+        if (
+            session is None
+            or startpos is not None
+            or self.history_cursor != self._isearch_cursor
+            or self.mutations != self._isearch_mutations
+            or not session.resume(snapshot)
+        ):
+            start = self.history_cursor if startpos is None else startpos
+            session = self.isearch = SearchSession(snapshot, start)
+        if session.position is not None and searchfor == session.query:
+            # Same query again: someone pushed ctrl-r (or ctrl-s).
+            session.next(direction)
         else:
-            result = lineobj.ReadLineTextBuffer("")
-        self.history_cursor = startpos
+            session.set_query(searchfor, direction)
+        if session.position is not None:
+            self.history_cursor = session.position
+        self._isearch_cursor = self.history_cursor
+        self._isearch_mutations = self.mutations
         self.last_search_for = searchfor
+        match = session.match
+        return "" if match is None else match
 
-        return result
-
+    @traced("command")
     def reverse_search_history(self, searchfor, startpos=None):
-        if startpos is None:
-            startpos = self.history_cursor
-        # If we get a new search without change in search term it means
-        # someone pushed ctrl-r and we should find the next match
-        if self.last_search_for == searchfor and startpos > 0:
-            startpos -= 1
-            for idx, line in reversed(enumerate(self.history)):
-                if searchfor in line:
-                    startpos = idx
-                    break
-        return self._any_search(searchfor, startpos=startpos)
+        return self._any_search(searchfor, BACKWARD, startpos)
 
+    @traced("command")
     def forward_search_history(self, searchfor, startpos=None):
-        if startpos is None:
-            startpos = min(
-                self.history_cursor, max(
-                    0, self.get_current_history_length() - 1)
-            )
-        # If we get a new search without change in search term it means
-        # someone pushed ctrl-r and we should find the next match
-        if (
-            self.last_search_for == searchfor
-            and startpos < self.get_current_history_length() - 1
-        ):
-            startpos += 1
-            for idx, line in enumerate(self.history):
-                if searchfor in line:
-                    startpos = idx
-                    break
-        return self._any_search(searchfor, startpos=startpos)
+        return self._any_search(searchfor, FORWARD, startpos)
 
     def _search(self, direction, partial):
         if len(self.history) == 0:
@@ -492,6 +981,7 @@ def _search(self, direction, partial):
                 else:
                     return lineobj.ReadLineTextBuffer(partial, point=partial.point)
 
+    @traced("command")
     def history_search_forward(self, partial):  # ()
         """Search for 'partial' between the start of the line and the point.
 
@@ -499,6 +989,7 @@ def history_search_forward(self, partial):  # ()
         """
         return self._search(1, partial)
 
+    @traced("command")
     def history_search_backward(self, partial):  # ()
         """Search backward for 'partial' between the line and the point.
 
@@ -506,3 +997,8 @@ def history_search_backward(self, partial):  # ()
         """
         return self._search(-1, partial)
 
+
+if __name__ == "__main__":
+    from .histfile import main
+
+    sys.exit(main())
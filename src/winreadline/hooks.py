@@ -0,0 +1,308 @@
+# -*- coding: utf-8 -*-
+"""Timed startup and pre-input hooks.
+
+The standard library's :func:`readline.set_startup_hook` and
+:func:`readline.set_pre_input_hook` take a single function each, run
+before every prompt. A slow one, say a hook checking ``git status``,
+delays every prompt and nothing says why.
+
+:class:`HookRegistry` keeps any number of hooks per event and runs them
+in the order they were added. Every call is timed, and the running
+numbers are kept per hook in :class:`HookStats`. A hook taking longer
+than `budget` is reported through :mod:`logging`. With
+``on_slow="disable"`` it is also switched off once it has been slow
+`strikes` times in a row.
+
+A hook that doesn't need to finish before the prompt shows can be added
+with ``background=True``. It then runs on a small thread pool instead,
+isn't held to the budget, and is skipped for as long as its previous call
+is still running.
+
+Usage::
+
+    from winreadline.hooks import HookRegistry
+    hooks = HookRegistry(budget=0.02, on_slow="disable")
+    hooks.add("startup", lambda: readline.insert_text(indent))
+    hooks.add("pre_input", refresh_git_status, background=True)
+    ...
+    hooks.run("startup")  # by the editor, before each prompt
+    for hook in hooks.hooks("pre_input"):
+        print(hook.name, hook.stats)
+
+"""
+import concurrent.futures
+import logging
+import time
+from typing import Callable, Dict, List, Optional
+
+__all__ = [
+    "EVENTS",
+    "Hook",
+    "HookRegistry",
+    "HookStats",
+]
+
+#: Events hooks can be added to.
+EVENTS = ("startup", "pre_input")
+
+logger = logging.getLogger(name=__name__)
+
+_clock = time.perf_counter
+
+
+class HookStats(object):
+    """Latency of every call of one hook so far.
+
+    Attributes
+    ----------
+    calls : int
+    total, worst, last : float
+        Seconds.
+    slow : int
+        Calls over the registry's budget.
+    failures : int
+        Calls that raised.
+    """
+
+    __slots__ = ("calls", "total", "worst", "last", "slow", "failures")
+
+    def __init__(self):
+        self.calls = 0
+        self.total = 0.0
+        self.worst = 0.0
+        self.last = 0.0
+        self.slow = 0
+        self.failures = 0
+
+    def __repr__(self):
+        return "<%s: %d calls, mean %.2f ms, worst %.2f ms, %d slow>" % (
+            self.__class__.__name__, self.calls, self.mean * 1e3,
+            self.worst * 1e3, self.slow)
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.calls if self.calls else 0.0
+
+    def record(self, duration: float):
+        self.calls += 1
+        self.total += duration
+        self.last = duration
+        if duration > self.worst:
+            self.worst = duration
+
+
+class Hook(object):
+    """One function added to a :class:`HookRegistry`.
+
+    Attributes
+    ----------
+    function : callable
+        Called without arguments.
+    name : str
+    background : bool
+        Run on the registry's thread pool rather than before the prompt.
+    enabled : bool
+        False once disabled for being slow. Set it back to re-enable.
+    stats : HookStats
+    """
+
+    def __init__(self, function: Callable[[], object], name: str, background: bool):
+        self.function = function
+        self.name = name
+        self.background = background
+        self.enabled = True
+        self.stats = HookStats()
+        # Slow calls in a row, towards `strikes`.
+        self._streak = 0
+        self._future = None  # type: Optional[concurrent.futures.Future]
+
+    def __repr__(self):
+        return "<%s: %s%s%s>" % (
+            self.__class__.__name__, self.name,
+            ", background" if self.background else "",
+            "" if self.enabled else ", disabled")
+
+    def running(self) -> bool:
+        """Whether a background call is still in progress."""
+        return self._future is not None and not self._future.done()
+
+
+class HookRegistry(object):
+    """Ordered, timed hooks for each of :data:`EVENTS`.
+
+    Parameters
+    ----------
+    budget : float, optional
+        Seconds a hook may take before it counts as slow.
+    on_slow : {'warn', 'disable'}, optional
+        What happens to a slow hook. Either way a warning is logged.
+    strikes : int, optional
+        Slow calls in a row before ``on_slow="disable"`` disables a hook.
+    max_workers : int, optional
+        Threads running background hooks.
+    """
+
+    def __init__(
+        self,
+        budget: float = 0.05,
+        on_slow: str = "warn",
+        strikes: int = 3,
+        max_workers: int = 2,
+    ):
+        if on_slow not in ("warn", "disable"):
+            raise ValueError("on_slow must be 'warn' or 'disable', got %r" % (on_slow,))
+        self.budget = budget
+        self.on_slow = on_slow
+        self.strikes = strikes
+        self.max_workers = max_workers
+        self._hooks = {event: [] for event in EVENTS}  # type: Dict[str, List[Hook]]
+        self._executor = None  # type: Optional[concurrent.futures.ThreadPoolExecutor]
+
+    def __repr__(self):
+        return "<%s: %s>" % (
+            self.__class__.__name__,
+            ", ".join("%d %s" % (len(hooks), event) for event, hooks in self._hooks.items()))
+
+    def _event(self, event: str) -> List[Hook]:
+        try:
+            return self._hooks[event]
+        except KeyError:
+            raise ValueError("unknown hook event %r, expected one of %s" % (event, EVENTS))
+
+    def add(
+        self,
+        event: str,
+        function: Callable[[], object],
+        background: bool = False,
+        name: Optional[str] = None,
+    ) -> Hook:
+        """Run `function` after the hooks already added for `event`.
+
+        `name` defaults to the function's qualified name.
+        """
+        if not callable(function):
+            raise TypeError("hook must be callable, got %r" % (function,))
+        if name is None:
+            name = getattr(function, "__qualname__", None) or repr(function)
+        hook = Hook(function, name, background)
+        self._event(event).append(hook)
+        return hook
+
+    def remove(self, event: str, function: Callable[[], object]):
+        """Remove every hook of `event` calling `function`.
+
+        Raises
+        ------
+        ValueError
+            If there is none.
+        """
+        hooks = self._event(event)
+        kept = [hook for hook in hooks if hook.function is not function]
+        if len(kept) == len(hooks):
+            raise ValueError("%r is not a %s hook" % (function, event))
+        hooks[:] = kept
+
+    def clear(self, event: Optional[str] = None):
+        """Remove the hooks of `event`, or of every event."""
+        for name in EVENTS if event is None else (event,):
+            del self._event(name)[:]
+
+    def hooks(self, event: str) -> List[Hook]:
+        """The hooks of `event`, in the order they run."""
+        return list(self._event(event))
+
+    def stats(self) -> Dict[str, HookStats]:
+        """:class:`HookStats` of every hook, by ``"event:name"``."""
+        return {
+            "%s:%s" % (event, hook.name): hook.stats
+            for event, hooks in self._hooks.items()
+            for hook in hooks
+        }
+
+    def _set_only(self, event: str, function):
+        if function is not None and not callable(function):
+            raise TypeError("set_%s_hook(func): func must be callable" % event)
+        self.clear(event)
+        if function is not None:
+            self.add(event, function)
+
+    def set_startup_hook(self, function=None):
+        """Set or remove the startup hook, replacing any others.
+
+        Like :func:`readline.set_startup_hook`, for code that expects a
+        single hook.
+        """
+        self._set_only("startup", function)
+
+    def set_pre_input_hook(self, function=None):
+        """Set or remove the pre-input hook, replacing any others.
+
+        Like :func:`readline.set_pre_input_hook`, for code that expects a
+        single hook.
+        """
+        self._set_only("pre_input", function)
+
+    def run(self, event: str) -> float:
+        """Call the enabled hooks of `event` in order.
+
+        A hook raising is logged and doesn't stop the ones after it.
+
+        Returns
+        -------
+        float
+            Seconds spent before returning, i.e. not counting background
+            hooks.
+        """
+        started = _clock()
+        for hook in self._event(event):
+            if not hook.enabled:
+                continue
+            if hook.background:
+                if not hook.running():
+                    hook._future = self._submit(self._call, event, hook)
+                continue
+            duration = self._call(event, hook)
+            if duration > self.budget:
+                self._slow(event, hook, duration)
+            else:
+                hook._streak = 0
+        return _clock() - started
+
+    def _submit(self, *args) -> concurrent.futures.Future:
+        if self._executor is None:
+            self._executor = concurrent.futures.ThreadPoolExecutor(
+                self.max_workers, thread_name_prefix="winreadline-hook")
+        return self._executor.submit(*args)
+
+    def _call(self, event: str, hook: Hook) -> float:
+        start = _clock()
+        try:
+            hook.function()
+        except Exception:
+            hook.stats.failures += 1
+            logger.exception("%s hook %s failed", event, hook.name)
+        duration = _clock() - start
+        hook.stats.record(duration)
+        return duration
+
+    def _slow(self, event: str, hook: Hook, duration: float):
+        hook.stats.slow += 1
+        hook._streak += 1
+        if self.on_slow == "disable" and hook._streak >= self.strikes:
+            hook.enabled = False
+            hook._streak = 0
+            logger.warning(
+                "Disabled %s hook %s: over the %.0f ms budget %d times in a row, "
+                "last %.0f ms", event, hook.name, self.budget * 1e3, self.strikes,
+                duration * 1e3)
+        elif hook.stats.slow == 1:
+            # Once per hook, rather than before every prompt.
+            logger.warning(
+                "%s hook %s took %.0f ms, over the %.0f ms budget",
+                event, hook.name, duration * 1e3, self.budget * 1e3)
+
+    def shutdown(self, wait: bool = True):
+        """Stop the thread pool, waiting for running background hooks."""
+        if self._executor is not None:
+            self._executor.shutdown(wait)
+            self._executor = None
@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+"""Incremental history search that picks up where it left off.
+
+During a Ctrl-R search every key press used to scan the history again from
+one end. A :class:`SearchSession` instead only ever looks at entries it
+hasn't looked at yet for the current query:
+
+* Entries are scanned outwards from where the search started, and a scan
+  stops at the first hit. The entries scanned so far form one contiguous
+  range, and every hit inside it is kept.
+* Pressing Ctrl-R or Ctrl-S again bisects the hits already found, and only
+  scans past the ends of the range once they run out.
+* Typing another character only filters the hits found so far, since an
+  entry containing the longer query must contain the shorter one. The
+  range stays scanned.
+* Backspace pops the previous query, hits and position off a stack, with
+  no search at all.
+
+The first key press of a search therefore costs as much as the distance to
+the nearest hit, not the length of the history.
+
+"""
+import bisect
+from array import array
+from typing import Iterator, Optional, Sequence
+
+__all__ = [
+    "SearchSession",
+]
+
+BACKWARD = -1
+FORWARD = 1
+
+
+class SearchSession(object):
+    """State of one incremental search through a fixed history.
+
+    Parameters
+    ----------
+    history : sequence of str
+        Typically a :class:`~winreadline.history.HistorySnapshot`. It must
+        not change while the session is in use.
+    start : int, optional
+        Entry the search starts at, included. Defaults to the newest.
+
+    Attributes
+    ----------
+    query : str
+    position : int or None
+        Index of the entry shown, None before the first hit.
+    failed : bool
+        The last search found nothing new; `position` is the previous hit.
+    """
+
+    def __init__(self, history: Sequence[str], start: Optional[int] = None):
+        self.history = history
+        # Length when last (re)started on, to tell appends from removals.
+        self._length = len(history)
+        last = len(history) - 1
+        self.start = last if start is None else min(start, last)
+        self.query = ""
+        self.position = None  # type: Optional[int]
+        self.failed = False
+        # Entries lo to hi - 1 have been scanned for the query. The hits
+        # below the start are kept negated, in the order they were found,
+        # so that both lists only ever grow at the end and stay sorted.
+        self._lo = self._hi = self.start + 1
+        self._below = array("l")
+        self._above = array("l")
+        self._stack = []  # type: list
+
+    def __repr__(self):
+        return "<%s: %r at %r>" % (self.__class__.__name__, self.query, self.position)
+
+    @property
+    def match(self) -> Optional[str]:
+        """The entry shown, if any."""
+        if self.position is None:
+            return None
+        return self.history[self.position]
+
+    @property
+    def candidates(self) -> Optional[array]:
+        """Ascending indices of the entries found to contain `query` so far.
+
+        None while the query is empty, meaning every entry.
+        """
+        if not self.query:
+            return None
+        found = array("l", [-index for index in reversed(self._below)])
+        found.extend(self._above)
+        return found
+
+    def is_over(self, history: Sequence[str]) -> bool:
+        """Whether `history` is the one searched, possibly with entries appended."""
+        if len(history) < self._length:
+            return False
+        # Snapshots of an unchanged history are new objects over the same list.
+        return getattr(history, "entries", history) is getattr(
+            self.history, "entries", self.history)
+
+    def resume(self, history: Sequence[str]) -> bool:
+        """Carry on over `history` if :meth:`is_over` it.
+
+        Entries appended since lie past everything scanned, so what was
+        found so far stays valid. Returns whether the session carries on.
+        """
+        if not self.is_over(history):
+            return False
+        self.history = history
+        self._length = len(history)
+        return True
+
+    def _hits(self, start: int, stop: int, direction: int) -> Iterator[int]:
+        """Indices of entries containing the query, from `start` up to `stop`."""
+        query = self.query
+        backend = getattr(self.history, "entries", self.history)
+        if hasattr(backend, "search"):
+            # A CompactHistory finds hits without decoding every entry.
+            for index in backend.search(query, start, reverse=direction == BACKWARD):
+                if (stop - index) * direction <= 0:
+                    return
+                yield index
+            return
+        for index in range(start, stop, direction):
+            if query in backend[index]:
+                yield index
+
+    def _cover(self, index: int):
+        """Scan every entry between the scanned range and `index`."""
+        if index < self._lo:
+            self._below.extend(-hit for hit in self._hits(self._lo - 1, index - 1, BACKWARD))
+            self._lo = index
+        elif index >= self._hi:
+            self._above.extend(self._hits(self._hi, index + 1, FORWARD))
+            self._hi = index + 1
+
+    def _find(self, direction: int, origin: int, inclusive: bool) -> Optional[int]:
+        """The nearest hit from `origin` in `direction`."""
+        first = origin if inclusive else origin + direction
+        if not 0 <= first < len(self.history):
+            return None
+        if not self.query:
+            return first
+        self._cover(first)
+        below, above = self._below, self._above
+        if direction == BACKWARD:
+            at = bisect.bisect_right(above, first)
+            if at:
+                return above[at - 1]
+            at = bisect.bisect_left(below, -first)
+            if at < len(below):
+                return -below[at]
+            # Nothing known below `first`: scan on down to the next hit.
+            for hit in self._hits(self._lo - 1, -1, BACKWARD):
+                below.append(-hit)
+                self._lo = hit
+                return hit
+            self._lo = 0
+            return None
+        at = bisect.bisect_right(below, -first)
+        if at:
+            return -below[at - 1]
+        at = bisect.bisect_left(above, first)
+        if at < len(above):
+            return above[at]
+        length = len(self.history)
+        for hit in self._hits(self._hi, length, FORWARD):
+            above.append(hit)
+            self._hi = hit + 1
+            return hit
+        self._hi = length
+        return None
+
+    def _move(self, found: Optional[int]) -> Optional[int]:
+        self.failed = found is None
+        if found is not None:
+            self.position = found
+        return found
+
+    def extend(self, text: str, direction: int = BACKWARD) -> Optional[int]:
+        """Add `text` to the query and return the new hit, None if none.
+
+        The current entry stays shown if it still matches.
+        """
+        if not text:
+            return self.position
+        self._stack.append((
+            self.query, self._lo, self._hi, self._below, self._above,
+            self.position, self.failed,
+        ))
+        had_query = bool(self.query)
+        self.query += text
+        if had_query:
+            # The scanned range stays scanned: only earlier hits can match.
+            query = self.query
+            backend = getattr(self.history, "entries", self.history)
+            self._below = array("l", [i for i in self._below if query in backend[-i]])
+            self._above = array("l", [i for i in self._above if query in backend[i]])
+        else:
+            self._lo = self._hi = self.start + 1
+            self._below = array("l")
+            self._above = array("l")
+        origin = self.start if self.position is None else self.position
+        return self._move(self._find(direction, origin, inclusive=True))
+
+    def backspace(self) -> Optional[int]:
+        """Undo the last :meth:`extend`, restoring the earlier hit.
+
+        Each key press extends the query by one character, so this is what
+        backspace does.
+        """
+        if not self._stack:
+            return self.position
+        (self.query, self._lo, self._hi, self._below, self._above,
+         self.position, self.failed) = self._stack.pop()
+        return self.position
+
+    def set_query(self, query: str, direction: int = BACKWARD) -> Optional[int]:
+        """Go to `query` by as few backspaces and extensions as possible."""
+        # The empty query at the bottom of the stack is a prefix of anything.
+        while not query.startswith(self.query):
+            self.backspace()
+        return self.extend(query[len(self.query):], direction)
+
+    def next(self, direction: int = BACKWARD) -> Optional[int]:
+        """The next hit past the current one, None if there is none."""
+        if self.position is None:
+            return self._move(self._find(direction, self.start, inclusive=True))
+        return self._move(self._find(direction, self.position, inclusive=False))
@@ -0,0 +1,244 @@
+# -*- coding: utf-8 -*-
+"""Complete file system paths without listing directories over and over.
+
+:class:`PathCompleter` is a completer for ``set_completer``. Listings are
+made with :func:`os.scandir`, kept sorted in an LRU cache, and reused for
+as long as the directory's mtime doesn't change. A prefix is then
+answered with two bisections, however large the directory.
+
+A directory with 100k entries on a network mount can take seconds to list.
+A scan is allowed `budget` seconds per Tab press. Whatever was listed by
+then is offered, and the next Tab carries on from where the scan stopped.
+
+Hidden entries and plain files are sorted into their own lists while
+scanning. The hidden-file and directories-only filters then pick lists
+instead of filtering names.
+
+Usage::
+
+    import readline
+    from winreadline.pathcomplete import PathCompleter
+    readline.set_completer(PathCompleter())
+    # Complete whole paths, not the text after the last slash.
+    readline.set_completer_delims(" \\t\\n;")
+
+"""
+import bisect
+import collections
+import heapq
+import os
+import time
+from typing import Iterator, List, Optional
+
+__all__ = [
+    "DirectoryListing",
+    "PathCompleter",
+]
+
+# Entries looked at between two checks of the clock.
+_CHUNK = 512
+
+
+class DirectoryListing(object):
+    """Sorted names of one directory, possibly still being scanned.
+
+    Attributes
+    ----------
+    path : str
+    mtime : int
+        The directory's ``st_mtime_ns`` when the scan started.
+    files, dirs, hidden_files, hidden_dirs : list of str
+        Sorted names. Hidden names start with a dot.
+    complete : bool
+        Whether the whole directory has been scanned.
+    """
+
+    def __init__(self, path: str, mtime: int):
+        self.path = path
+        self.mtime = mtime
+        self.files = []  # type: List[str]
+        self.dirs = []  # type: List[str]
+        self.hidden_files = []  # type: List[str]
+        self.hidden_dirs = []  # type: List[str]
+        self._scanner = os.scandir(path)
+        self.complete = False
+
+    def __repr__(self):
+        return "<%s: %s, %d entries%s>" % (
+            self.__class__.__name__,
+            self.path,
+            len(self.files) + len(self.dirs) + len(self.hidden_files) + len(self.hidden_dirs),
+            "" if self.complete else ", incomplete",
+        )
+
+    def close(self):
+        if self._scanner is not None:
+            self._scanner.close()
+            self._scanner = None
+
+    def scan(self, deadline: Optional[float] = None):
+        """Read entries until the directory is done or `deadline` passes.
+
+        `deadline` is a :func:`time.perf_counter` value; None scans it all.
+        """
+        if self.complete:
+            return
+        lists = {
+            (False, False): [],
+            (False, True): [],
+            (True, False): [],
+            (True, True): [],
+        }
+        scanner = self._scanner
+        try:
+            while True:
+                for _ in range(_CHUNK):
+                    entry = next(scanner, None)
+                    if entry is None:
+                        self.complete = True
+                        break
+                    try:
+                        is_dir = entry.is_dir()
+                    except OSError:
+                        is_dir = False
+                    lists[entry.name.startswith("."), is_dir].append(entry.name)
+                if self.complete or (
+                    deadline is not None and time.perf_counter() >= deadline
+                ):
+                    break
+        finally:
+            if self.complete:
+                self.close()
+            for (hidden, is_dir), names in lists.items():
+                if names:
+                    target = self._list(hidden, is_dir)
+                    # Two sorted runs: timsort merges them in linear time.
+                    names.sort()
+                    target.extend(names)
+                    target.sort()
+
+    def _list(self, hidden: bool, is_dir: bool) -> List[str]:
+        if hidden:
+            return self.hidden_dirs if is_dir else self.hidden_files
+        return self.dirs if is_dir else self.files
+
+    def _range(self, names: List[str], prefix: str) -> List[str]:
+        start = bisect.bisect_left(names, prefix)
+        # Every name starting with prefix sorts below prefix + U+10FFFF.
+        stop = bisect.bisect_left(names, prefix + "\U0010ffff", start)
+        return names[start:stop]
+
+    def starting_with(
+        self, prefix: str, hidden: bool = False, dirs_only: bool = False
+    ) -> Iterator[str]:
+        """Names starting with `prefix` in sorted order, dirs with a slash.
+
+        Hidden names are included if `hidden` is true or the prefix starts
+        with a dot, as in bash.
+        """
+        hidden = hidden or prefix.startswith(".")
+        ranges = [[name + os.sep for name in self._range(self.dirs, prefix)]]
+        if hidden:
+            ranges.append([name + os.sep for name in self._range(self.hidden_dirs, prefix)])
+        if not dirs_only:
+            ranges.append(self._range(self.files, prefix))
+            if hidden:
+                ranges.append(self._range(self.hidden_files, prefix))
+        return heapq.merge(*ranges)
+
+
+class PathCompleter(object):
+    """A ``completer(text, state)`` for file system paths.
+
+    Parameters
+    ----------
+    cache_size : int, optional
+        Directory listings kept.
+    budget : float, optional
+        Seconds a single completion may spend scanning a directory.
+    show_hidden : bool, optional
+        Offer dot files even when the prefix doesn't start with a dot.
+    dirs_only : bool, optional
+        Only complete directory names, e.g. for ``cd``.
+    """
+
+    def __init__(
+        self,
+        cache_size: int = 64,
+        budget: float = 0.05,
+        show_hidden: bool = False,
+        dirs_only: bool = False,
+    ):
+        self.cache_size = cache_size
+        self.budget = budget
+        self.show_hidden = show_hidden
+        self.dirs_only = dirs_only
+        self._cache = collections.OrderedDict()  # type: collections.OrderedDict
+        self._text = None  # type: Optional[str]
+        self._matches = []  # type: List[str]
+
+    def __repr__(self):
+        return "<%s: %d listings cached>" % (self.__class__.__name__, len(self._cache))
+
+    def clear(self):
+        """Drop every cached listing."""
+        for listing in self._cache.values():
+            listing.close()
+        self._cache.clear()
+
+    def listing(self, directory: str) -> Optional[DirectoryListing]:
+        """The cached listing of `directory`, scanned for up to `budget` more.
+
+        A new scan starts if the directory changed since it was cached.
+        None if it can't be listed.
+        """
+        deadline = time.perf_counter() + self.budget
+        key = os.path.abspath(directory)
+        try:
+            mtime = os.stat(key).st_mtime_ns
+        except OSError:
+            return None
+        listing = self._cache.get(key)
+        if listing is not None and listing.mtime != mtime:
+            listing.close()
+            listing = None
+        if listing is None:
+            try:
+                listing = DirectoryListing(key, mtime)
+            except OSError:
+                return None
+            self._cache[key] = listing
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)[1].close()
+        else:
+            self._cache.move_to_end(key)
+        try:
+            listing.scan(deadline)
+        except OSError:
+            # Vanished or unreadable part way through: offer what was read.
+            listing.complete = True
+            listing.close()
+        return listing
+
+    def matches(self, text: str) -> List[str]:
+        """Every completion of `text`, sorted."""
+        head, prefix = os.path.split(text)
+        if head:
+            head = os.path.join(head, "")
+        directory = os.path.expanduser(head) if head else os.curdir
+        listing = self.listing(directory)
+        if listing is None:
+            return []
+        return [
+            head + name
+            for name in listing.starting_with(prefix, self.show_hidden, self.dirs_only)
+        ]
+
+    def __call__(self, text: str, state: int) -> Optional[str]:
+        if state == 0 or text != self._text:
+            self._text = text
+            self._matches = self.matches(text)
+        try:
+            return self._matches[state]
+        except IndexError:
+            return None
@@ -153,7 +153,8 @@
 import sys
 import time
 
-from .logging import log
+from .completion import CompletionDisplay
+from .hooks import HookRegistry
 from .history import OrderedHistory
 
 # here's the end goal
@@ -215,6 +216,16 @@
 
 # del rl
 
+# Completion:
+completion_display = CompletionDisplay()
+set_completion_display_matches_hook = (
+    completion_display.set_completion_display_matches_hook
+)
+
+# Startup and pre-input hooks:
+hooks = HookRegistry()
+set_startup_hook = hooks.set_startup_hook
+set_pre_input_hook = hooks.set_pre_input_hook
 
 # get_line_buffer = rl.get_line_buffer
 # set_completer = rl.set_completer
@@ -225,8 +236,6 @@
 # redisplay = rl.redisplay
 
 # set_completer_delims = rl.set_completer_delims
-# set_pre_input_hook = rl.set_pre_input_hook
-# set_startup_hook = rl.set_startup_hook
 
 # insert_text = rl.insert_text
 # get_completer_delims = rl.get_completer_delims
@@ -0,0 +1,260 @@
+# -*- coding: utf-8 -*-
+"""Incrementally maintained frequency and recency statistics for history.
+
+:class:`HistoryStatistics` is fed one command at a time from
+:meth:`~winreadline.history.OrderedHistory.add_history`, so ranking
+suggestions never needs to rescan the whole history.
+
+Frecency
+--------
+Every use of a command contributes ``exp(-rate * age)`` to its score, where
+``age`` is the number of commands entered since. Rather than decaying every
+score on every command, each score is stored anchored to position zero in
+log space: ``log(sum(exp(rate * position)))``. The ordering of anchored
+scores never changes as time moves on, so the same lazy heap that serves
+:meth:`HistoryStatistics.most_common` also serves
+:meth:`HistoryStatistics.most_frecent`.
+
+"""
+import array
+import heapq
+import math
+from typing import Callable, Iterable, List, Optional, Tuple
+from zlib import crc32
+
+__all__ = [
+    "CountMinSketch",
+    "HistoryStatistics",
+    "normalize_command",
+]
+
+
+def normalize_command(line: str) -> str:
+    """Collapse runs of whitespace so trivially different spellings match."""
+    return " ".join(line.split())
+
+
+class CountMinSketch(object):
+    """Approximate counter with memory fixed at ``width * depth`` cells.
+
+    Estimates never undercount. With the defaults the overcount is at most
+    ``e / width`` of the total with probability ``1 - exp(-depth)``.
+    """
+
+    def __init__(self, width: int = 1 << 16, depth: int = 4):
+        self.width = width
+        self.depth = depth
+        self._rows = [array.array("L", [0]) * width for _ in range(depth)]
+        self._seeds = [crc32(str(i).encode("ascii")) for i in range(depth)]
+
+    def __repr__(self):
+        return "<%s: %dx%d>" % (self.__class__.__name__, self.width, self.depth)
+
+    def _cells(self, key: str):
+        data = key.encode("utf-8", "surrogatepass")
+        for row, seed in zip(self._rows, self._seeds):
+            yield row, crc32(data, seed) % self.width
+
+    def add(self, key: str, count: int = 1):
+        for row, col in self._cells(key):
+            row[col] += count
+
+    def discard(self, key: str, count: int = 1):
+        for row, col in self._cells(key):
+            row[col] = max(0, row[col] - count)
+
+    def estimate(self, key: str) -> int:
+        return min(row[col] for row, col in self._cells(key))
+
+    def clear(self):
+        for row in self._rows:
+            row[:] = array.array("L", [0]) * self.width
+
+
+class HistoryStatistics(object):
+    """Frequency, last use and frecency of every normalized command.
+
+    Parameters
+    ----------
+    half_life : float, optional
+        Number of commands after which a use counts half as much towards
+        frecency.
+    normalize : callable, optional
+        Maps a history line to the key it is counted under. Defaults to
+        :func:`normalize_command`.
+    sketch : CountMinSketch, optional
+        If given, counts come from the sketch and only the `max_tracked`
+        heaviest commands are kept exactly, bounding memory for huge
+        archives.
+    max_tracked : int, optional
+        Only consulted together with `sketch`.
+
+    Attributes
+    ----------
+    position : int
+        Number of commands added so far. Used as the clock for recency.
+    """
+
+    def __init__(
+        self,
+        half_life: float = 200.0,
+        normalize: Optional[Callable[[str], str]] = None,
+        sketch: Optional[CountMinSketch] = None,
+        max_tracked: int = 10000,
+    ):
+        self.rate = math.log(2) / half_life
+        self.normalize = normalize_command if normalize is None else normalize
+        self.sketch = sketch
+        self.max_tracked = max_tracked
+        self.clear()
+
+    def __repr__(self):
+        return "<%s: %d commands, position=%d>" % (
+            self.__class__.__name__,
+            len(self.counts),
+            self.position,
+        )
+
+    def __len__(self):
+        return len(self.counts)
+
+    def __contains__(self, line):
+        return self.normalize(line) in self.counts
+
+    def clear(self):
+        self.position = 0
+        self.counts = {}  # type: dict
+        self.last_use = {}  # type: dict
+        self._anchored = {}  # type: dict
+        # Lazy max-heaps. Entries go stale when a key is updated and are
+        # discarded when they surface.
+        self._count_heap = []  # type: List[Tuple[int, str]]
+        self._frecency_heap = []  # type: List[Tuple[float, str]]
+        if self.sketch is not None:
+            self.sketch.clear()
+
+    # Updates
+
+    def add(self, line: str):
+        """Record one use of `line`."""
+        key = self.normalize(line)
+        if not key:
+            return
+        position = self.position
+        self.position += 1
+        if self.sketch is not None:
+            self.sketch.add(key)
+            count = self.sketch.estimate(key)
+        else:
+            count = self.counts.get(key, 0) + 1
+        self.counts[key] = count
+        self.last_use[key] = position
+        exponent = self.rate * position
+        previous = self._anchored.get(key)
+        anchored = exponent if previous is None else _logaddexp(previous, exponent)
+        self._anchored[key] = anchored
+        heapq.heappush(self._count_heap, (-count, key))
+        heapq.heappush(self._frecency_heap, (-anchored, key))
+        if self.sketch is not None and len(self.counts) > 2 * self.max_tracked:
+            self._prune()
+        self._maybe_compact()
+
+    def update(self, lines: Iterable[str]):
+        for line in lines:
+            self.add(line)
+
+    def evict(self, line: str):
+        """Forget one use of `line`, e.g. when it drops out of the history.
+
+        The evicted use is assumed to be the oldest one, whose decayed
+        contribution to frecency is negligible, so only the count changes
+        unless it reaches zero.
+        """
+        key = self.normalize(line)
+        if self.sketch is not None:
+            self.sketch.discard(key)
+        count = self.counts.get(key)
+        if count is None:
+            return
+        if count <= 1:
+            self._forget(key)
+            return
+        self.counts[key] = count - 1
+        heapq.heappush(self._count_heap, (1 - count, key))
+
+    def _forget(self, key: str):
+        del self.counts[key]
+        del self.last_use[key]
+        del self._anchored[key]
+
+    def _prune(self):
+        keep = heapq.nlargest(self.max_tracked, self.counts.items(), key=_second)
+        for key in set(self.counts).difference(k for k, _ in keep):
+            self._forget(key)
+
+    def _maybe_compact(self):
+        limit = 2 * len(self.counts) + 64
+        if len(self._count_heap) > limit:
+            self._count_heap = [(-c, k) for k, c in self.counts.items()]
+            heapq.heapify(self._count_heap)
+        if len(self._frecency_heap) > limit:
+            self._frecency_heap = [(-a, k) for k, a in self._anchored.items()]
+            heapq.heapify(self._frecency_heap)
+
+    # Queries
+
+    def count(self, line: str) -> int:
+        key = self.normalize(line)
+        if key in self.counts:
+            return self.counts[key]
+        if self.sketch is not None:
+            return self.sketch.estimate(key)
+        return 0
+
+    def frecency(self, line: str, now: Optional[int] = None) -> float:
+        """Decayed use score of `line` as of position `now`."""
+        anchored = self._anchored.get(self.normalize(line))
+        if anchored is None:
+            return 0.0
+        if now is None:
+            now = self.position - 1
+        return math.exp(anchored - self.rate * now)
+
+    def most_common(self, k: int) -> List[Tuple[str, int]]:
+        """The `k` most frequently used commands, most frequent first."""
+        return [
+            (key, -neg)
+            for neg, key in self._top(self._count_heap, k, self.counts)
+        ]
+
+    def most_frecent(self, k: int) -> List[Tuple[str, float]]:
+        """The `k` commands with the highest frecency, highest first."""
+        now = self.position - 1
+        return [
+            (key, math.exp(-neg - self.rate * now))
+            for neg, key in self._top(self._frecency_heap, k, self._anchored)
+        ]
+
+    @staticmethod
+    def _top(heap, k, current):
+        """Pop `k` live entries off a lazy heap and push them back."""
+        found = []
+        seen = set()
+        while heap and len(found) < k:
+            neg, key = heapq.heappop(heap)
+            if key not in seen and current.get(key) == -neg:
+                seen.add(key)
+                found.append((neg, key))
+        for item in found:
+            heapq.heappush(heap, item)
+        return found
+
+
+def _second(item):
+    return item[1]
+
+
+def _logaddexp(a: float, b: float) -> float:
+    if a < b:
+        a, b = b, a
+    return a + math.log1p(math.exp(b - a))
@@ -0,0 +1,302 @@
+# -*- coding: utf-8 -*-
+"""Fish style inline autosuggestions taken from the history.
+
+As the user types, :meth:`Autosuggester.suggest` returns the most likely
+full line starting with what has been typed so far. The part after the
+cursor is drawn as ghost text and can be taken with the bindable
+:func:`accept_suggestion` and :func:`accept_suggestion_word` actions.
+
+Every lookup runs against a time budget:
+
+* The unique commands are kept sorted, so the block of candidates sharing
+  the typed prefix is found with two bisections.
+* A small block is scanned completely and the best ranked candidate wins.
+* A large block means the prefix is common, so instead the commands are
+  walked from most to least recently used and the first few matches are
+  ranked. That walk ends quickly for exactly the prefixes that made the
+  block large.
+* Typing the next character of the current suggestion reuses it without
+  a lookup.
+
+"""
+import bisect
+import collections
+import itertools
+import re
+import time
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from .stats import HistoryStatistics
+
+__all__ = [
+    "Autosuggester",
+    "PrefixIndex",
+    "accept_suggestion",
+    "accept_suggestion_word",
+]
+
+_clock = time.perf_counter
+
+_MAX_CHAR = chr(0x10FFFF)
+
+_NEXT_WORD = re.compile(r"\s*\S+")
+
+
+class _SortedKeys(object):
+    """Sorted strings kept in chunks of about `load` each.
+
+    Adding or removing a string shifts the rest of its chunk only, rather
+    than every string after it as :func:`bisect.insort` on one list would.
+    Positions are found through the chunk lengths, summed again after a
+    change, which is a pass over ``len / load`` chunks.
+    """
+
+    def __init__(self, values: Iterable[str] = (), load: int = 1000):
+        values = sorted(values)
+        self._load = load
+        self._chunks = [values[i:i + load] for i in range(0, len(values), load)]
+        self._maxes = [chunk[-1] for chunk in self._chunks]
+        self._len = len(values)
+        self._starts = None  # type: Optional[List[int]]
+
+    def __len__(self):
+        return self._len
+
+    def __iter__(self) -> Iterator[str]:
+        return itertools.chain.from_iterable(self._chunks)
+
+    def __repr__(self):
+        return "<%s: %d keys in %d chunks>" % (
+            self.__class__.__name__, self._len, len(self._chunks))
+
+    def _offsets(self) -> List[int]:
+        if self._starts is None:
+            self._starts = [0]
+            self._starts.extend(itertools.accumulate(map(len, self._chunks)))
+        return self._starts
+
+    def add(self, value: str):
+        maxes = self._maxes
+        if not maxes:
+            self._chunks.append([value])
+            maxes.append(value)
+        else:
+            i = bisect.bisect_left(maxes, value)
+            if i == len(maxes):
+                i -= 1
+                self._chunks[i].append(value)
+                maxes[i] = value
+            else:
+                bisect.insort(self._chunks[i], value)
+            chunk = self._chunks[i]
+            if len(chunk) > 2 * self._load:
+                half = len(chunk) // 2
+                self._chunks[i:i + 1] = [chunk[:half], chunk[half:]]
+                maxes[i:i + 1] = [chunk[half - 1], chunk[-1]]
+        self._len += 1
+        self._starts = None
+
+    def remove(self, value: str):
+        i = bisect.bisect_left(self._maxes, value)
+        chunk = self._chunks[i]
+        del chunk[bisect.bisect_left(chunk, value)]
+        if chunk:
+            self._maxes[i] = chunk[-1]
+        else:
+            del self._chunks[i]
+            del self._maxes[i]
+        self._len -= 1
+        self._starts = None
+
+    def bisect_left(self, value: str, lo: int = 0) -> int:
+        """Like :func:`bisect.bisect_left` on the sorted list of keys."""
+        i = bisect.bisect_left(self._maxes, value)
+        if i == len(self._chunks):
+            return self._len
+        return max(lo, self._offsets()[i] + bisect.bisect_left(self._chunks[i], value))
+
+    def __getitem__(self, index):
+        starts = self._offsets()
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self._len)
+            if step != 1:
+                return list(self)[index]
+            found = []
+            i = bisect.bisect_right(starts, start) - 1
+            while start < stop:
+                chunk = self._chunks[i]
+                found.extend(chunk[start - starts[i]:stop - starts[i]])
+                i += 1
+                start = starts[i]
+            return found
+        if index < 0:
+            index += self._len
+        if not 0 <= index < self._len:
+            raise IndexError("key index out of range")
+        i = bisect.bisect_right(starts, index) - 1
+        return self._chunks[i][index - starts[i]]
+
+
+class PrefixIndex(object):
+    """Sorted unique commands plus their order of last use.
+
+    Attributes
+    ----------
+    keys : sequence of str
+        Every unique command, sorted. Indexed and sliced like a list.
+    recent : collections.OrderedDict
+        Maps every command to the position it was last used at, least
+        recently used first.
+    """
+
+    def __init__(self, lines: Iterable[str] = ()):
+        self.recent = collections.OrderedDict()
+        self.position = 0
+        for line in lines:
+            self._touch(line)
+        self.keys = _SortedKeys(self.recent)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, line):
+        return line in self.recent
+
+    def _touch(self, line: str):
+        self.recent[line] = self.position
+        self.recent.move_to_end(line)
+        self.position += 1
+
+    def add(self, line: str):
+        if line not in self.recent:
+            self.keys.add(line)
+        self._touch(line)
+
+    def discard(self, line: str):
+        if line not in self.recent:
+            return
+        del self.recent[line]
+        self.keys.remove(line)
+
+    def prefix_range(self, prefix: str) -> Tuple[int, int]:
+        """Return ``(lo, hi)`` such that ``keys[lo:hi]`` start with `prefix`."""
+        lo = self.keys.bisect_left(prefix)
+        hi = self.keys.bisect_left(prefix + _MAX_CHAR, lo)
+        return lo, hi
+
+
+class Autosuggester(object):
+    """Suggest the completion of the current line from previous commands.
+
+    Parameters
+    ----------
+    lines : iterable of str, optional
+        The history to suggest from, oldest first.
+    statistics : HistoryStatistics, optional
+        If given, candidates are ranked by frecency. Otherwise the most
+        recently used candidate wins.
+    budget : float, optional
+        Seconds a single lookup may take. When the budget runs out the best
+        candidate seen so far is returned.
+    scan_limit : int, optional
+        Prefix blocks up to this size are ranked exhaustively.
+    walk_matches : int, optional
+        How many recent matches are ranked for larger blocks.
+    """
+
+    def __init__(
+        self,
+        lines: Iterable[str] = (),
+        statistics: Optional[HistoryStatistics] = None,
+        budget: float = 0.001,
+        scan_limit: int = 2048,
+        walk_matches: int = 16,
+    ):
+        self.index = PrefixIndex(lines)
+        self.statistics = statistics
+        self.budget = budget
+        self.scan_limit = scan_limit
+        self.walk_matches = walk_matches
+        self._last_line = None  # type: Optional[str]
+        self._last_suggestion = None  # type: Optional[str]
+
+    def __repr__(self):
+        return "<%s: %d commands>" % (self.__class__.__name__, len(self.index))
+
+    def add(self, line: str):
+        """Make `line` the most recent command."""
+        self.index.add(line)
+        self._last_line = None
+
+    def discard(self, line: str):
+        self.index.discard(line)
+        self._last_line = None
+
+    def suggest(self, line: str) -> Optional[str]:
+        """Return the suggested full line for `line`, or None."""
+        if not line:
+            return None
+        last_line, last = self._last_line, self._last_suggestion
+        if last_line is not None and line.startswith(last_line):
+            # Typing along the current suggestion keeps it. A prefix that
+            # had no match can't gain one by growing either.
+            if last is None or (last.startswith(line) and len(last) > len(line)):
+                self._last_line = line
+                return last
+        suggestion = self._lookup(line)
+        self._last_line, self._last_suggestion = line, suggestion
+        return suggestion
+
+    def ghost_text(self, line: str) -> str:
+        """The part of the suggestion that is drawn after the cursor."""
+        suggestion = self.suggest(line)
+        return "" if suggestion is None else suggestion[len(line):]
+
+    def _lookup(self, line: str) -> Optional[str]:
+        deadline = _clock() + self.budget
+        lo, hi = self.index.prefix_range(line)
+        if hi - lo <= self.scan_limit:
+            candidates = self.index.keys[lo:hi]
+        else:
+            candidates = self._recent_matches(line, deadline)
+        best, best_score = None, -1.0
+        for i, candidate in enumerate(candidates):
+            if candidate == line:
+                continue
+            if self.statistics is not None:
+                score = self.statistics.frecency(candidate)
+            else:
+                score = self.index.recent[candidate]
+            if score > best_score:
+                best, best_score = candidate, score
+            if not i & 255 and _clock() > deadline:
+                break
+        return best
+
+    def _recent_matches(self, line: str, deadline: float) -> List[str]:
+        matches = []
+        for i, candidate in enumerate(reversed(self.index.recent)):
+            if candidate.startswith(line) and candidate != line:
+                matches.append(candidate)
+                if len(matches) >= self.walk_matches:
+                    break
+            if not i & 255 and _clock() > deadline:
+                break
+        return matches
+
+
+def accept_suggestion(line: str, suggestion: Optional[str]) -> str:
+    """Bindable action: take the whole suggestion."""
+    if suggestion is None or not suggestion.startswith(line):
+        return line
+    return suggestion
+
+
+def accept_suggestion_word(line: str, suggestion: Optional[str]) -> str:
+    """Bindable action: take the suggestion up to the end of its next word."""
+    if suggestion is None or not suggestion.startswith(line):
+        return line
+    match = _NEXT_WORD.match(suggestion, len(line))
+    if match is None:
+        return suggestion
+    return suggestion[: match.end()]
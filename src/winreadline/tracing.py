@@ -0,0 +1,317 @@
+# -*- coding: utf-8 -*-
+"""Opt-in per-keystroke latency tracing.
+
+Spans are recorded for the stages between a key arriving and the screen
+updating: input decode, key dispatch, command execution, completion and
+redisplay.
+
+Records are written into a ring buffer that is allocated once, up front,
+so tracing a long session never grows memory. When tracing is disabled
+the instrumented functions pay for exactly one attribute check.
+
+Usage::
+
+    from winreadline.tracing import tracer
+    tracer.enable()
+    ...  # use the prompt
+    tracer.export_chrome_trace("keystrokes.json")
+    tracer.print_histograms()
+
+The exported file can be loaded into ``chrome://tracing`` or Perfetto.
+
+"""
+import array
+import functools
+import io
+import json
+import sys
+import threading
+import time
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+__all__ = [
+    "CATEGORIES",
+    "Tracer",
+    "tracer",
+    "traced",
+]
+
+#: Stages of the keystroke pipeline a span can belong to.
+CATEGORIES = ("decode", "dispatch", "command", "completion", "redisplay")
+
+_CATEGORY_INDEX = {name: idx for idx, name in enumerate(CATEGORIES)}
+
+_clock = time.perf_counter
+
+
+class _NullSpan(object):
+    """Returned by :meth:`Tracer.span` when tracing is off."""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span(object):
+    __slots__ = ("tracer", "name", "category", "start")
+
+    def __init__(self, tracer, name, category):
+        self.tracer = tracer
+        self.name = name
+        self.category = category
+
+    def __enter__(self):
+        self.start = _clock()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.tracer.record(self.name, self.category, self.start, _clock())
+        return False
+
+
+class Tracer(object):
+    """Fixed capacity recorder of timed spans.
+
+    Attributes
+    ----------
+    enabled : bool
+        Checked by every instrumented call site. Nothing is recorded
+        while False.
+    capacity : int
+        Number of spans kept. Once full the oldest span is overwritten.
+    """
+
+    def __init__(self, capacity: int = 65536):
+        if capacity <= 0:
+            raise ValueError("capacity must be positive, got %r" % capacity)
+        self.enabled = False
+        self.capacity = capacity
+        self._lock = threading.Lock()
+        # Columns rather than a list of tuples so recording a span
+        # allocates nothing.
+        self._starts = array.array("d", bytes(8 * capacity))
+        self._durations = array.array("d", bytes(8 * capacity))
+        self._categories = array.array("B", bytes(capacity))
+        self._threads = array.array("Q", bytes(8 * capacity))
+        self._names = [None] * capacity  # type: List[Optional[str]]
+        self._cursor = 0
+        self._count = 0
+        self._epoch = _clock()
+
+    def __repr__(self):
+        return "<%s: %d/%d spans, enabled=%s>" % (
+            self.__class__.__name__,
+            self._count,
+            self.capacity,
+            self.enabled,
+        )
+
+    def __len__(self):
+        return self._count
+
+    def enable(self):
+        """Start recording spans."""
+        self.enabled = True
+
+    def disable(self):
+        """Stop recording spans. Already recorded spans are kept."""
+        self.enabled = False
+
+    def clear(self):
+        """Drop every recorded span."""
+        with self._lock:
+            self._cursor = 0
+            self._count = 0
+            self._epoch = _clock()
+
+    def record(self, name: str, category: str, start: float, end: float):
+        """Store one finished span.
+
+        Parameters
+        ----------
+        name : str
+            Usually the command name, e.g. ``reverse_search_history``.
+        category : str
+            One of :data:`CATEGORIES`.
+        start, end : float
+            :func:`time.perf_counter` readings.
+        """
+        with self._lock:
+            idx = self._cursor
+            self._starts[idx] = start
+            self._durations[idx] = end - start
+            self._categories[idx] = _CATEGORY_INDEX[category]
+            self._threads[idx] = threading.get_ident()
+            self._names[idx] = name
+            self._cursor = (idx + 1) % self.capacity
+            if self._count < self.capacity:
+                self._count += 1
+
+    def span(self, name: str, category: str = "command"):
+        """Context manager timing the enclosed block.
+
+        Examples
+        --------
+        >>> with tracer.span("redisplay", "redisplay"):
+        ...     pass
+        """
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name, category)
+
+    def spans(self) -> Iterator[Tuple[str, str, float, float, int]]:
+        """Yield ``(name, category, start, duration, thread)`` oldest first."""
+        with self._lock:
+            count = self._count
+            first = (self._cursor - count) % self.capacity
+            rows = []
+            for offset in range(count):
+                idx = (first + offset) % self.capacity
+                rows.append(
+                    (
+                        self._names[idx],
+                        CATEGORIES[self._categories[idx]],
+                        self._starts[idx],
+                        self._durations[idx],
+                        self._threads[idx],
+                    )
+                )
+        return iter(rows)
+
+    # Exporters
+
+    def to_chrome_trace(self) -> Dict:
+        """Return the recorded spans in Chrome's trace-event format.
+
+        Every span becomes a complete (``"ph": "X"``) event with timestamps
+        in microseconds relative to the last :meth:`clear`.
+        """
+        events = []
+        for name, category, start, duration, thread in self.spans():
+            events.append(
+                {
+                    "name": name,
+                    "cat": category,
+                    "ph": "X",
+                    "ts": (start - self._epoch) * 1e6,
+                    "dur": duration * 1e6,
+                    "pid": 0,
+                    "tid": thread,
+                }
+            )
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def export_chrome_trace(self, filename):
+        """Write :meth:`to_chrome_trace` as JSON to `filename`."""
+        with io.open(filename, "wt", encoding="utf-8") as fp:
+            json.dump(self.to_chrome_trace(), fp)
+
+    def latencies(self) -> Dict[str, List[float]]:
+        """Map each span name to its sorted durations in seconds."""
+        per_name = {}  # type: Dict[str, List[float]]
+        for name, _, _, duration, _ in self.spans():
+            per_name.setdefault(name, []).append(duration)
+        for durations in per_name.values():
+            durations.sort()
+        return per_name
+
+    def percentiles(self) -> Dict[str, Dict[str, float]]:
+        """Return count, p50, p99 and max latency in seconds per span name."""
+        summary = {}
+        for name, durations in self.latencies().items():
+            summary[name] = {
+                "count": len(durations),
+                "p50": _percentile(durations, 50),
+                "p99": _percentile(durations, 99),
+                "max": durations[-1],
+            }
+        return summary
+
+    def print_histograms(self, file=None, width: int = 40):
+        """Print p50/p99 and a log2 latency histogram for each span name.
+
+        Buckets are powers of two in microseconds.
+        """
+        if file is None:
+            file = sys.stdout
+        for name, durations in sorted(self.latencies().items()):
+            print(
+                "%s: n=%d p50=%.1fus p99=%.1fus max=%.1fus"
+                % (
+                    name,
+                    len(durations),
+                    _percentile(durations, 50) * 1e6,
+                    _percentile(durations, 99) * 1e6,
+                    durations[-1] * 1e6,
+                ),
+                file=file,
+            )
+            buckets = _log2_buckets(durations)
+            peak = max(buckets.values())
+            for upper in sorted(buckets):
+                bar = "#" * max(1, int(width * buckets[upper] / peak))
+                print(
+                    "  <= %8dus | %-*s %d" % (upper, width, bar, buckets[upper]),
+                    file=file,
+                )
+
+
+def _percentile(ordered: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not ordered:
+        return 0.0
+    rank = int(round(pct / 100.0 * (len(ordered) - 1)))
+    return ordered[rank]
+
+
+def _log2_buckets(durations: List[float]) -> Dict[int, int]:
+    buckets = {}  # type: Dict[int, int]
+    for duration in durations:
+        upper = 1
+        micros = duration * 1e6
+        while upper < micros:
+            upper <<= 1
+        buckets[upper] = buckets.get(upper, 0) + 1
+    return buckets
+
+
+#: The process wide tracer every instrumented call site reports to.
+tracer = Tracer()
+
+
+def traced(category: str, name: Optional[str] = None) -> Callable:
+    """Decorate a function so each call is recorded as a span.
+
+    Parameters
+    ----------
+    category : str
+        One of :data:`CATEGORIES`.
+    name : str, optional
+        Defaults to the function's ``__name__``.
+    """
+    if category not in _CATEGORY_INDEX:
+        raise ValueError("Unknown trace category: %r" % category)
+
+    def decorator(func):
+        label = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not tracer.enabled:
+                return func(*args, **kwargs)
+            start = _clock()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                tracer.record(label, category, start, _clock())
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+"""Translate between terminal input bytes and :class:`~.keyboard_enum.Keys`.
+
+A terminal sends a key press as a single control character or as an escape
+sequence. :class:`KeyDecoder` turns the bytes read from a terminal into
+keys as they arrive, and :func:`encode_keys` turns keys back into what a
+terminal would send, e.g. to script a session.
+
+Typed text comes out of the decoder as plain strings, one per run of
+printable characters, so a large paste doesn't become one object per
+character.
+
+"""
+import codecs
+import re
+from typing import Iterable, List, Union
+
+from .keyboard_enum import Keys
+from .tracing import traced
+
+__all__ = [
+    "KeyDecoder",
+    "SEQUENCES",
+    "encode_keys",
+]
+
+#: Input sequences of an xterm compatible terminal.
+SEQUENCES = {
+    "\x1b": Keys.Escape,
+    "\x00": Keys.ControlAt,
+    "\x01": Keys.ControlA,
+    "\x02": Keys.ControlB,
+    "\x03": Keys.ControlC,
+    "\x04": Keys.ControlD,
+    "\x05": Keys.ControlE,
+    "\x06": Keys.ControlF,
+    "\x07": Keys.ControlG,
+    "\x08": Keys.ControlH,
+    "\x09": Keys.ControlI,
+    "\x0a": Keys.ControlJ,
+    "\x0b": Keys.ControlK,
+    "\x0c": Keys.ControlL,
+    "\x0d": Keys.ControlM,
+    "\x0e": Keys.ControlN,
+    "\x0f": Keys.ControlO,
+    "\x10": Keys.ControlP,
+    "\x11": Keys.ControlQ,
+    "\x12": Keys.ControlR,
+    "\x13": Keys.ControlS,
+    "\x14": Keys.ControlT,
+    "\x15": Keys.ControlU,
+    "\x16": Keys.ControlV,
+    "\x17": Keys.ControlW,
+    "\x18": Keys.ControlX,
+    "\x19": Keys.ControlY,
+    "\x1a": Keys.ControlZ,
+    "\x1c": Keys.ControlBackslash,
+    "\x1d": Keys.ControlSquareClose,
+    "\x1e": Keys.ControlCircumflex,
+    "\x1f": Keys.ControlUnderscore,
+    # Most terminals send DEL for the backspace key.
+    "\x7f": Keys.Backspace,
+    "\x1b[A": Keys.Up,
+    "\x1b[B": Keys.Down,
+    "\x1b[C": Keys.Right,
+    "\x1b[D": Keys.Left,
+    "\x1b[H": Keys.Home,
+    "\x1b[F": Keys.End,
+    "\x1bOA": Keys.Up,
+    "\x1bOB": Keys.Down,
+    "\x1bOC": Keys.Right,
+    "\x1bOD": Keys.Left,
+    "\x1bOH": Keys.Home,
+    "\x1bOF": Keys.End,
+    "\x1b[1~": Keys.Home,
+    "\x1b[2~": Keys.Insert,
+    "\x1b[3~": Keys.Delete,
+    "\x1b[4~": Keys.End,
+    "\x1b[5~": Keys.PageUp,
+    "\x1b[6~": Keys.PageDown,
+    "\x1b[Z": Keys.BackTab,
+    "\x1bOP": Keys.F1,
+    "\x1bOQ": Keys.F2,
+    "\x1bOR": Keys.F3,
+    "\x1bOS": Keys.F4,
+    "\x1b[15~": Keys.F5,
+    "\x1b[17~": Keys.F6,
+    "\x1b[18~": Keys.F7,
+    "\x1b[19~": Keys.F8,
+    "\x1b[20~": Keys.F9,
+    "\x1b[21~": Keys.F10,
+    "\x1b[23~": Keys.F11,
+    "\x1b[24~": Keys.F12,
+    "\x1b[1;5A": Keys.ControlUp,
+    "\x1b[1;5B": Keys.ControlDown,
+    "\x1b[1;5C": Keys.ControlRight,
+    "\x1b[1;5D": Keys.ControlLeft,
+    "\x1b[1;5H": Keys.ControlHome,
+    "\x1b[1;5F": Keys.ControlEnd,
+    "\x1b[3;5~": Keys.ControlDelete,
+    "\x1b[5;5~": Keys.ControlPageUp,
+    "\x1b[6;5~": Keys.ControlPageDown,
+    "\x1b[1;2A": Keys.ShiftUp,
+    "\x1b[1;2B": Keys.ShiftDown,
+    "\x1b[1;2C": Keys.ShiftRight,
+    "\x1b[1;2D": Keys.ShiftLeft,
+    "\x1b[1;2H": Keys.ShiftHome,
+    "\x1b[1;2F": Keys.ShiftEnd,
+    "\x1b[3;2~": Keys.ShiftDelete,
+    "\x1b[1;6A": Keys.ControlShiftUp,
+    "\x1b[1;6B": Keys.ControlShiftDown,
+    "\x1b[1;6C": Keys.ControlShiftRight,
+    "\x1b[1;6D": Keys.ControlShiftLeft,
+}  # type: dict
+
+# The first sequence listed for a key is the one sent for it.
+_ENCODE = {}  # type: dict
+for _sequence, _key in SEQUENCES.items():
+    _ENCODE.setdefault(_key, _sequence)
+del _sequence, _key
+
+# Every proper prefix of an escape sequence: more input is needed to decide.
+_PREFIXES = frozenset(
+    sequence[:end]
+    for sequence in SEQUENCES
+    for end in range(1, len(sequence))
+)
+_LONGEST = max(map(len, SEQUENCES))
+
+_TEXT = re.compile(r"[^\x00-\x1f\x7f]+")
+
+
+def encode_keys(keys: Iterable[Union[Keys, str]], encoding: str = "utf-8") -> bytes:
+    """What a terminal sends for `keys`.
+
+    Members of :class:`Keys` become their input sequence, any other string
+    is typed as is.
+    """
+    return "".join(
+        _ENCODE[key] if isinstance(key, Keys) else key for key in keys
+    ).encode(encoding)
+
+
+class KeyDecoder(object):
+    """Incrementally decode terminal input into keys and text.
+
+    Bytes are fed as they are read; a multibyte character or escape
+    sequence split between two reads is held back until it is complete.
+    A lone escape is ambiguous until more input arrives or the caller
+    decides none will and calls :meth:`flush`.
+
+    Examples
+    --------
+    >>> decoder = KeyDecoder()
+    >>> decoder.feed(b"ab\\x1b[")
+    ['ab']
+    >>> decoder.feed(b"A\\r")
+    [<Keys.Up: 'up'>, <Keys.ControlM: 'c-m'>]
+    """
+
+    def __init__(self, encoding: str = "utf-8"):
+        self._decoder = codecs.getincrementaldecoder(encoding)("replace")
+        self._pending = ""
+
+    def __repr__(self):
+        return "<%s: pending=%r>" % (self.__class__.__name__, self._pending)
+
+    @property
+    def pending(self) -> bool:
+        """Whether input is held back waiting for the rest of a sequence."""
+        return bool(self._pending)
+
+    @traced("decode")
+    def feed(self, data: bytes) -> List[Union[Keys, str]]:
+        """Decode `data` and return the keys completed by it."""
+        text = self._pending + self._decoder.decode(data)
+        keys = []  # type: List[Union[Keys, str]]
+        index = 0
+        end = len(text)
+        while index < end:
+            run = _TEXT.match(text, index)
+            if run is not None:
+                keys.append(run.group())
+                index = run.end()
+                continue
+            if text[index] != "\x1b":
+                keys.append(SEQUENCES[text[index]])
+                index += 1
+                continue
+            if end - index < _LONGEST and text[index:] in _PREFIXES:
+                # Could still grow into a longer sequence.
+                break
+            length = self._match(text, index)
+            keys.append(SEQUENCES[text[index:index + length]])
+            index += length
+        self._pending = text[index:]
+        return keys
+
+    @staticmethod
+    def _match(text: str, index: int) -> int:
+        """Length of the longest sequence at `index`, at least a lone escape."""
+        for length in range(min(_LONGEST, len(text) - index), 1, -1):
+            if text[index:index + length] in SEQUENCES:
+                return length
+        return 1
+
+    @traced("decode")
+    def flush(self) -> List[Union[Keys, str]]:
+        """Give up waiting: decode whatever is held back as is."""
+        pending, self._pending = self._pending, ""
+        if not pending:
+            return []
+        length = self._match(pending, 0)
+        keys = [SEQUENCES[pending[:length]]]  # type: List[Union[Keys, str]]
+        if pending[length:]:
+            # What follows an escape in a partial sequence is printable.
+            keys.append(pending[length:])
+        return keys
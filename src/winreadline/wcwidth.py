@@ -0,0 +1,205 @@
+# -*- coding: utf-8 -*-
+"""Terminal column widths of text, for cursor placement and wrapping.
+
+Most characters take one column. East Asian wide and fullwidth characters,
+most emoji among them, take two. Combining marks, format characters and
+other zero width characters take none.
+
+Asking :mod:`unicodedata` about every character of a long line on every
+repaint is slow, so the answers are kept three ways:
+
+* a table of the widths of every codepoint, filled in 256 codepoints at
+  a time the first time one of them is asked about, so the first
+  keystroke outside ASCII scans one block rather than all of Unicode;
+* a fast path for printable ASCII, which never touches the table;
+* :class:`LineWidths`, the running column of every index of the line
+  being edited. After an edit, only the part after the change is
+  recomputed. Index to column is then a lookup, and column to index is a
+  bisection.
+
+Control characters are given no width. A redisplay shows them escaped,
+e.g. as ``^A``, and accounts for that itself.
+
+"""
+import bisect
+import itertools
+import re
+import unicodedata
+from array import array
+from typing import List, Tuple
+
+__all__ = [
+    "LineWidths",
+    "char_width",
+    "str_width",
+]
+
+# Planes 4 to 13 are unassigned and plane 15 and 16 are private use; the
+# only zero width characters past plane 3 are the tags and variation
+# selectors of plane 14.
+_SCANNED = (range(0x0, 0x40000), range(0xE0000, 0xE1000))
+
+_BLOCK_BITS = 8
+_BLOCK_MASK = (1 << _BLOCK_BITS) - 1
+_ONE_COLUMN = bytes([1]) * (1 << _BLOCK_BITS)
+
+# Text that is one column per character. str.isascii is new in 3.7.
+_PRINTABLE_ASCII = re.compile(r"[\x20-\x7e]*\Z").match
+
+# Widths of every codepoint of a block, by block number.
+_blocks = {}  # type: dict
+
+
+def _scan_width(codepoint: int) -> int:
+    char = chr(codepoint)
+    category = unicodedata.category(char)
+    if category in ("Mn", "Me", "Cc") or (category == "Cf" and codepoint != 0xAD):
+        return 0
+    if 0x1160 <= codepoint <= 0x11FF or codepoint == 0x200B:
+        # Hangul medial vowels and final consonants join the syllable.
+        return 0
+    if unicodedata.east_asian_width(char) in ("W", "F"):
+        return 2
+    return 1
+
+
+def _block(number: int) -> bytes:
+    """Widths of the codepoints of block `number`, scanned on first use."""
+    start = number << _BLOCK_BITS
+    if any(start in scanned for scanned in _SCANNED):
+        block = bytes(map(_scan_width, range(start, start + len(_ONE_COLUMN))))
+    else:
+        block = _ONE_COLUMN
+    # Two threads may both scan a block; they store the same bytes.
+    _blocks[number] = block
+    return block
+
+
+def char_width(char: str) -> int:
+    """Columns taken by a single character."""
+    codepoint = ord(char)
+    if 0x20 <= codepoint < 0x7F:
+        return 1
+    number = codepoint >> _BLOCK_BITS
+    block = _blocks.get(number)
+    if block is None:
+        block = _block(number)
+    return block[codepoint & _BLOCK_MASK]
+
+
+def str_width(text: str) -> int:
+    """Columns taken by `text`."""
+    if _PRINTABLE_ASCII(text):
+        return len(text)
+    return sum(map(char_width, text))
+
+
+def _common_prefix_length(a: str, b: str) -> int:
+    """Length of the common prefix, by bisecting on slice comparisons."""
+    lo, hi = 0, min(len(a), len(b))
+    if a[:hi] == b[:hi]:
+        return hi
+    while lo < hi:
+        middle = (lo + hi + 1) // 2
+        if a[:middle] == b[:middle]:
+            lo = middle
+        else:
+            hi = middle - 1
+    return lo
+
+
+class LineWidths(object):
+    """Columns of every position of a line, kept up to date across edits.
+
+    Attributes
+    ----------
+    text : str
+    prefix : array.array
+        ``prefix[i]`` is the width of ``text[:i]``; it has one more item
+        than `text` has characters.
+    """
+
+    def __init__(self, text: str = ""):
+        self.text = ""
+        self.prefix = array("L", [0])
+        self.set_text(text)
+
+    def __repr__(self):
+        return "<%s: %d chars, %d columns>" % (
+            self.__class__.__name__, len(self.text), self.width)
+
+    def __len__(self):
+        return len(self.text)
+
+    @property
+    def width(self) -> int:
+        return self.prefix[-1]
+
+    def set_text(self, text: str) -> int:
+        """Switch to `text`, recomputing from the first changed character.
+
+        Returns the index of that character.
+        """
+        start = _common_prefix_length(self.text, text)
+        prefix = self.prefix
+        del prefix[start + 1:]
+        tail = text[start:]
+        base = prefix[start]
+        if _PRINTABLE_ASCII(tail):
+            prefix.extend(range(base + 1, base + len(tail) + 1))
+        else:
+            running = itertools.accumulate(
+                itertools.chain((base,), map(char_width, tail)))
+            prefix.extend(itertools.islice(running, 1, None))
+        self.text = text
+        return start
+
+    def column(self, index: int) -> int:
+        """Column at which the character at `index` starts."""
+        return self.prefix[index]
+
+    def index_at(self, column: int) -> int:
+        """Index of the character covering `column`, or the end of the line.
+
+        A column in the middle of a wide character maps to that character.
+        """
+        prefix = self.prefix
+        if column >= prefix[-1]:
+            return len(self.text)
+        # The last index starting at or before column. Zero width characters
+        # share their start with the character after them, which wins.
+        return bisect.bisect_right(prefix, column) - 1
+
+    def rows(self, width: int, offset: int = 0) -> List[int]:
+        """Indices at which each screen row starts when wrapped at `width`.
+
+        `offset` columns of the first row are taken, e.g. by the prompt. A
+        wide character that doesn't fit at the end of a row moves to the
+        next one, and zero width characters stay with what they follow.
+        """
+        prefix = self.prefix
+        end = len(self.text)
+        starts = [0]
+        limit = width - offset
+        while True:
+            start = starts[-1]
+            stop = bisect.bisect_right(prefix, prefix[start] + max(limit, 0), start) - 1
+            if stop >= end:
+                return starts
+            if stop <= start:
+                # Wider than a row: give it a row of its own.
+                stop += 1
+            starts.append(stop)
+            limit = width
+
+    def cursor(self, index: int, width: int, offset: int = 0) -> Tuple[int, int]:
+        """Screen row and column of `index` when wrapped at `width`."""
+        rows = self.rows(width, offset)
+        row = bisect.bisect_right(rows, index) - 1
+        column = self.prefix[index] - self.prefix[rows[row]]
+        if row == 0:
+            column += offset
+        if column >= width:
+            # Just past a full last row: the cursor waits on the next one.
+            return row + 1, 0
+        return row, column